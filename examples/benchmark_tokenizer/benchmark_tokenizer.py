@@ -0,0 +1,56 @@
+"""Tokenizer throughput over the formulas of a serialized model.
+
+Run from the repository root:
+
+    python examples/benchmark_tokenizer/benchmark_tokenizer.py [model.json]
+
+The model defaults to the model.json of the repository root.
+"""
+import argparse
+import json
+import os
+import timeit
+
+from xlcalculator.tokenizer import ExcelParser
+
+MODEL_JSON = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'model.json')
+
+
+def model_formulas(path=MODEL_JSON):
+    with open(path) as model_file:
+        cells = json.load(model_file)['cells']
+    return [
+        cell['formula']['formula'] for cell in cells.values()
+        if cell.get('formula')
+    ]
+
+
+def tokenize_all(formulas):
+    for formula in formulas:
+        ExcelParser().getTokens(formula)
+
+
+def throughput(formulas, repeat=5, number=20):
+    seconds = min(timeit.repeat(
+        lambda: tokenize_all(formulas), repeat=repeat, number=number))
+    return len(formulas) * number / seconds
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument(
+        'model', nargs='?', default=MODEL_JSON,
+        help='serialized model (default: the root model.json)')
+    args = arg_parser.parse_args()
+
+    formulas = model_formulas(args.model)
+    print(f'{os.path.basename(args.model)}: {len(formulas)} formulas, '
+          f'{throughput(formulas):,.0f} formulas/s')
+
+    # The time per character stays flat as formulas get longer.
+    for terms in (100, 1000, 10000):
+        formula = '=' + '+'.join(f'Sheet1!$A${row}' for row in range(terms))
+        per_char = 1 / throughput([formula], repeat=3, number=3) / len(
+            formula)
+        print(f'{len(formula):>7} characters: {per_char * 1e9:.0f} ns/char')
@@ -97,6 +97,9 @@ setuptools.setup(
         build=[
             'pip-tools',
         ],
+        numpy=[
+            'numpy',
+        ],
     ),
     python_requires='>=3.9',
     tests_require=TESTS_REQUIRE,
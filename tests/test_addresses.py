@@ -0,0 +1,34 @@
+import unittest
+
+from xlcalculator import addresses
+
+
+class AddressCodecTest(unittest.TestCase):
+
+    def test_encode(self):
+        codec = addresses.AddressCodec()
+        key = codec.encode('Sheet1!B22', add=True)
+        self.assertEqual((0, 22, 2), addresses.unpack(key))
+        self.assertEqual(key, addresses.pack(0, 22, 2))
+        self.assertEqual('Sheet1!B22', codec.decode(key))
+        self.assertEqual(key, codec.encode("'Sheet1'!B22"))
+
+        key = codec.encode('My Sheet!XFD1048576', add=True)
+        self.assertEqual((1, 1048576, 16384), addresses.unpack(key))
+        self.assertEqual('My Sheet!XFD1048576', codec.decode(key))
+        self.assertEqual(['Sheet1', 'My Sheet'], codec.sheets)
+
+    def test_encode_invalid(self):
+        codec = addresses.AddressCodec()
+        for address in ('Sheet1!A1:B2', 'A1', 'Sheet1!A', 'Sheet1!1',
+                        'Sheet1!$A$1', 'Sheet1!A0', None):
+            with self.assertRaises(KeyError):
+                codec.encode(address, add=True)
+        # Unknown sheets are only added if asked for.
+        with self.assertRaises(KeyError):
+            codec.encode('Sheet1!A1')
+        self.assertEqual([], codec.sheets)
+
+    def test_split_address(self):
+        self.assertEqual(
+            ('Sheet 1', 'AB', 12), addresses.split_address("'Sheet 1'!AB12"))
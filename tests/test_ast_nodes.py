@@ -49,8 +49,8 @@ class ASTNodeTest(unittest.TestCase):
         node1 = self.create_node()
         node2 = self.create_node()
         self.assertEqual(node1, node1)
-        # Even though the two nodes have the same token values, each token has
-        # a UUID that is used for comparison.
+        # Even though the two nodes have the same token values, tokens compare
+        # by identity.
         self.assertNotEqual(node1, node2)
 
     def test_eval(self):
@@ -95,6 +95,15 @@ class OperandNodeTest(unittest.TestCase):
         self.assertIsInstance(
             node.eval(context('A1')), xlerrors.ValueExcelError)
 
+    def test_compile(self):
+        node = self.create_node()
+        self.assertEqual(node.compile()(context('A1')), 1)
+
+    def test_compile_error(self):
+        node = self.create_node('#VALUE!', 'error')
+        self.assertIsInstance(
+            node.compile()(context('A1')), xlerrors.ValueExcelError)
+
     def test_eval_error_with_nonstandard_error_value(self):
         node = self.create_node('ERR:504', 'error')
         self.assertIsInstance(
@@ -153,6 +162,12 @@ class RangeNodeTest(unittest.TestCase):
         node = self.create_node('A1')
         self.assertEqual(node.eval(context('Sh1!C1', self.model)), 0)
 
+    def test_compile(self):
+        node = self.create_node('Sh1!B1')
+        self.assertEqual(node.compile()(context('Sh1!C1', self.model)), 2)
+        node = self.create_node('B2')
+        self.assertEqual(node.compile()(context('Sh1!C1', self.model)), 3)
+
     def test_str(self):
         node = self.create_node('A1:B2')
         self.assertEqual(str(node), 'A1:B2')
@@ -187,6 +202,17 @@ class OperatorNodeTest(unittest.TestCase):
             f_token(tvalue='1', ttype='operand', tsubtype='number'))
         self.assertEqual(node.eval(context('A1')), 0.01)
 
+    def test_compile(self):
+        node = self.create_node()
+        self.assertEqual(node.compile()(context('A1')), 3)
+
+    def test_compile_prefix(self):
+        node = ast_nodes.OperatorNode(
+            f_token(tvalue='-', ttype='operator-prefix', tsubtype='math'))
+        node.right = ast_nodes.OperandNode(
+            f_token(tvalue='1', ttype='operand', tsubtype='number'))
+        self.assertEqual(node.compile()(context('A1')), -1)
+
     def test_eval_unknown_type(self):
         node = ast_nodes.OperatorNode(
             f_token(tvalue='-', ttype='operator', tsubtype='math'))
@@ -275,6 +301,41 @@ class FunctionNodeTest(unittest.TestCase):
         ]
         self.assertEqual(node.eval(context('A1')), True)
 
+    def test_compile(self):
+        node = self.create_node()
+        self.assertEqual(node.compile()(context('A1')), 1)
+
+    def test_compile_var_positional(self):
+        node = ast_nodes.FunctionNode(
+            f_token(tvalue='SUM', ttype='function', tsubtype='start'))
+        node.args = [
+            ast_nodes.OperandNode(
+                f_token(tvalue='3', ttype='operand', tsubtype='number')),
+            ast_nodes.OperandNode(
+                f_token(tvalue='2', ttype='operand', tsubtype='number')),
+        ]
+        self.assertEqual(node.compile()(context('A1')), 5)
+
+    def test_compile_expr(self):
+        node = ast_nodes.FunctionNode(
+            f_token(tvalue='IF', ttype='function', tsubtype='start'))
+        node.args = [
+            ast_nodes.OperandNode(
+                f_token(tvalue='FALSE', ttype='operand', tsubtype='logical')),
+            ast_nodes.OperandNode(
+                f_token(tvalue='3', ttype='operand', tsubtype='number')),
+            ast_nodes.OperandNode(
+                f_token(tvalue='2', ttype='operand', tsubtype='number')),
+        ]
+        self.assertEqual(node.compile()(context('A1')), 2)
+
+    def test_compile_custom_namespace(self):
+        node = self.create_node()
+        code = node.compile()
+        ctx = context('A1')
+        ctx.namespace = {'MOD': lambda number, divisor: 42}
+        self.assertEqual(code(ctx), 42)
+
     def test_str(self):
         node = self.create_node()
         self.assertEqual(str(node), 'MOD(3, 2)')
@@ -0,0 +1,76 @@
+import copy
+import unittest
+
+from xlcalculator import cellstore, evaluator, model, xltypes
+
+
+class CellStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.formula = xltypes.XLFormula('=A1', 'Sheet1')
+        self.store = cellstore.CellStore({
+            'Sheet1!A1': xltypes.XLCell('Sheet1!A1', 1),
+            'Sheet1!B2': xltypes.XLCell('Sheet1!B2', None, self.formula),
+            'Other!XFD1048576': xltypes.XLCell('Other!XFD1048576', 'x'),
+        })
+
+    def test_mapping(self):
+        self.assertEqual(
+            ['Sheet1!A1', 'Sheet1!B2', 'Other!XFD1048576'], list(self.store))
+        self.assertEqual(3, len(self.store))
+        self.assertIn('Sheet1!B2', self.store)
+        self.assertIn("'Other'!XFD1048576", self.store)
+        self.assertNotIn('Sheet1!C3', self.store)
+        self.assertNotIn('Unknown!A1', self.store)
+        self.assertNotIn('Sheet1!A1:B2', self.store)
+        self.assertNotIn(None, self.store)
+
+        del self.store['Sheet1!A1']
+        self.assertNotIn('Sheet1!A1', self.store)
+        with self.assertRaises(KeyError):
+            self.store['Sheet1!A1']
+        with self.assertRaises(ValueError):
+            self.store['Sheet1!A1:B2'] = xltypes.XLCell('Sheet1!A1', 1)
+
+    def test_view(self):
+        cell = self.store['Sheet1!B2']
+        self.assertIsInstance(cell, xltypes.XLCell)
+        self.assertEqual(xltypes.XLCell('Sheet1!B2'), cell)
+        self.assertEqual(
+            ('Sheet1!B2', 'Sheet1', 'B', 2, '2'),
+            (cell.address, cell.sheet, cell.column, cell.column_index,
+             cell.row))
+        self.assertIs(self.formula, cell.formula)
+
+        # Views write through to the store.
+        cell.value = 2
+        cell.defined_names.append('Name')
+        self.assertEqual(2, self.store['Sheet1!B2'].value)
+        self.assertEqual(['Name'], self.store['Sheet1!B2'].defined_names)
+        self.assertEqual({1: ['Name']}, self.store.defined_names)
+
+    def test_copy(self):
+        cell = copy.deepcopy(self.store['Sheet1!A1'])
+        self.assertIs(xltypes.XLCell, type(cell))
+        cell.value = 2
+        self.assertEqual(1, self.store['Sheet1!A1'].value)
+
+
+class CompactModelTest(unittest.TestCase):
+
+    def test_compact_cells(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            'A1': 1,
+            'A2': 2,
+            'B1': '=SUM(A1:A2)',
+        })
+        dict_model.defined_names['First'] = dict_model.cells['Sheet1!A1']
+        dict_model.compact_cells()
+        self.assertIsInstance(dict_model.cells, cellstore.CellStore)
+
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!B1'))
+        dict_evaluator.set_cell_value('First', 5)
+        self.assertEqual(5, dict_model.defined_names['First'].value)
+        self.assertEqual(7, dict_evaluator.evaluate('Sheet1!B1'))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from xlcalculator import compile_cache
+from xlcalculator.evaluator import Evaluator
+from xlcalculator.model import ModelCompiler
+
+from . import testing
+
+
+class CompileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = compile_cache.CompileCache(self.tmp_dir.name)
+        self.file_name = testing.get_resource("reader.xlsm")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def compile(self, **options):
+        return ModelCompiler().read_and_parse_archive(
+            self.file_name, cache=self.cache, **options)
+
+    def test_reuse(self):
+        new_model = self.compile(ignore_sheets=['Eleventh'])
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+
+        cached_model = self.compile(ignore_sheets=['Eleventh'])
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(new_model, cached_model)
+        self.assertEqual(
+            len(new_model.dependency_graph),
+            len(cached_model.dependency_graph))
+
+        evaluator = Evaluator(cached_model)
+        self.assertEqual(1.1, evaluator.evaluate('Fourth!A2'))
+        self.assertEqual(100, evaluator.evaluate('Hundred'))
+
+    def test_options(self):
+        self.compile(ignore_sheets=['Eleventh'])
+        self.compile(ignore_sheets=['Eleventh'], outputs=['Fourth!A2'])
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+
+    def test_options_order(self):
+        self.compile(
+            ignore_sheets=['Eleventh', 'Tenth'],
+            outputs=['Fourth!A2', 'Fourth!A3'])
+        self.compile(
+            ignore_sheets=['Tenth', 'Eleventh'],
+            outputs=['Fourth!A3', 'Fourth!A2'])
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(1, len(os.listdir(self.tmp_dir.name)))
+
+    def test_evict(self):
+        self.compile(ignore_sheets=['Eleventh'])
+        self.compile(ignore_sheets=['Eleventh'], build_code=False)
+        self.assertEqual(2, len(os.listdir(self.tmp_dir.name)))
+
+        self.cache.max_size = 1
+        self.cache.evict()
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+    def test_unreadable(self):
+        key = self.cache.key(self.file_name)
+        with open(self.cache.path(key), 'wb') as fp:
+            fp.write(b'garbage')
+
+        self.assertFalse(self.cache.load(key, ModelCompiler().model))
+        self.assertFalse(os.path.exists(self.cache.path(key)))
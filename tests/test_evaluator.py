@@ -1,6 +1,7 @@
+import concurrent.futures
 import unittest
 
-from xlcalculator import evaluator, model
+from xlcalculator import evaluator, model, xltypes
 from . import testing
 
 
@@ -128,3 +129,241 @@ class TestEvaluator(unittest.TestCase):
         excel_value_03 = add_evaluator.get_cell_value('Sheet1!D1')
         value_03 = add_evaluator.evaluate('Sheet1!D1')
         self.assertEqual(excel_value_03, value_03)
+
+    def test_evaluate_cache(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A2": 2,
+            "B1": "=A1+1",
+            "B2": "=A2+1",
+            "C1": "=B1+B2",
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        self.assertEqual(5, dict_evaluator.evaluate('Sheet1!C1'))
+        self.assertIn('Sheet1!B1', dict_evaluator.values)
+        self.assertIn('Sheet1!B2', dict_evaluator.values)
+
+        # Changing an input only drops its dependents from the cache.
+        dict_model.set_cell_value('Sheet1!A1', 10)
+        self.assertEqual(10, dict_evaluator.evaluate('Sheet1!A1'))
+        self.assertNotIn('Sheet1!B1', dict_evaluator.values)
+        self.assertNotIn('Sheet1!C1', dict_evaluator.values)
+        self.assertIn('Sheet1!B2', dict_evaluator.values)
+        self.assertEqual(14, dict_evaluator.evaluate('Sheet1!C1'))
+
+        dict_evaluator.set_cell_value('Sheet1!A2', 20)
+        self.assertEqual(20, dict_evaluator.evaluate('Sheet1!A2'))
+        self.assertNotIn('Sheet1!C1', dict_evaluator.values)
+        self.assertIn('Sheet1!B1', dict_evaluator.values)
+        self.assertEqual(32, dict_evaluator.evaluate('Sheet1!C1'))
+
+    def test_evaluate_range_cache(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A2": 2,
+            "B1": "=SUM(A1:A2)",
+            "B2": "=MAX(A1:A2)",
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(2, dict_evaluator.evaluate('Sheet1!B2'))
+        array = dict_evaluator.range_values['Sheet1!A1:A2']
+        self.assertIs(array, dict_evaluator.evaluate_range('Sheet1!A1:A2'))
+
+        # Changing a cell of the range drops the range and its readers.
+        dict_evaluator.set_cell_value('Sheet1!A2', 5)
+        self.assertEqual(6, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertIsNot(array, dict_evaluator.range_values['Sheet1!A1:A2'])
+        self.assertEqual(5, dict_evaluator.evaluate('Sheet1!B2'))
+
+    def test_invalidate(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "B1": "=A1+1",
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        self.assertEqual(2, dict_evaluator.evaluate('Sheet1!B1'))
+
+        # Direct assignments are not tracked, until invalidated.
+        dict_model.cells['Sheet1!A1'].value = 5
+        self.assertEqual(2, dict_evaluator.evaluate('Sheet1!B1'))
+        dict_evaluator.invalidate(['Sheet1!A1'])
+        self.assertEqual(6, dict_evaluator.evaluate('Sheet1!B1'))
+
+        dict_model.cells['Sheet1!A1'].value = 7
+        dict_evaluator.invalidate()
+        self.assertEqual(8, dict_evaluator.evaluate('Sheet1!B1'))
+
+    def test_recalculate(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "B1": "=A1+1",
+            "C1": "=B1+A1",
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        self.assertEqual(3, dict_evaluator.recalculate(['Sheet1!C1']))
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!C1'))
+        # Everything is cached now.
+        self.assertEqual(0, dict_evaluator.recalculate(['Sheet1!C1']))
+
+        dict_evaluator.set_cell_value('Sheet1!A1', 2)
+        self.assertEqual(3, dict_evaluator.recalculate(['Sheet1!C1']))
+        self.assertEqual(5, dict_evaluator.evaluate('Sheet1!C1'))
+
+    def test_recalculate_blank_range_cells(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A3": 3,
+            "B1": '=SUM(A1:A3)',
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        self.assertEqual(3, dict_evaluator.recalculate(['Sheet1!B1']))
+        self.assertEqual(4, dict_evaluator.evaluate('Sheet1!B1'))
+        # Blank cells are not evaluated, nor cached.
+        self.assertEqual(
+            {'Sheet1!A1', 'Sheet1!A3', 'Sheet1!B1'},
+            set(dict_evaluator.values))
+
+    def test_recalculate_long_chain(self):
+        input_dict = {"A1": 1}
+        for row in range(2, 3001):
+            input_dict[f"A{row}"] = f"=A{row - 1}+1"
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict(input_dict)
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        self.assertEqual(3000, dict_evaluator.recalculate(['Sheet1!A3000']))
+        self.assertEqual(3000, dict_evaluator.evaluate('Sheet1!A3000'))
+
+    def test_recalculate_cycle(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": "=C1+1",
+            "B1": "=A1+1",
+            "C1": "=B1+1",
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+
+        with self.assertRaises(RuntimeError):
+            dict_evaluator.recalculate(['Sheet1!C1'])
+        self.assertEqual({}, dict_evaluator.values)
+
+    def test_evaluate_compiled(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A2": 2,
+            "B1": '=IF(A1>0, SUM(A1:A2), "none")',
+        }, build_code=False)
+        dict_model.build_code(compiled=True)
+        self.assertIsNotNone(dict_model.cells['Sheet1!B1'].formula.code)
+
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!B1'))
+        dict_evaluator.set_cell_value('Sheet1!A1', -1)
+        self.assertEqual('none', dict_evaluator.evaluate('Sheet1!B1'))
+
+    def test_evaluate_lazy(self):
+        compiler = model.ModelCompiler()
+        inputs = {f'A{row}': row for row in range(1, 5)}
+        inputs.update({f'B{row}': f'=A{row}*2' for row in range(1, 5)})
+        inputs['C1'] = '=SUM(B1:B2)'
+        dict_model = compiler.read_and_parse_dict(inputs, build_code=False)
+        dict_model.build_code(compiled=True, lazy=True)
+        self.assertIsNone(dict_model.cells['Sheet1!C1'].formula.ast)
+
+        def evaluate(address):
+            return evaluator.Evaluator(dict_model).evaluate(address)
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            values = list(executor.map(evaluate, ['Sheet1!C1'] * 8))
+        self.assertEqual([6] * 8, values)
+
+        # Only the evaluated formulas were parsed, once per shape.
+        asts = {
+            address: dict_model.cells[address].formula.ast
+            for address in ('Sheet1!B1', 'Sheet1!B2', 'Sheet1!B3')}
+        self.assertIs(asts['Sheet1!B1'], asts['Sheet1!B2'])
+        self.assertIsNone(asts['Sheet1!B3'])
+        self.assertEqual(8, evaluate('Sheet1!B4'))
+
+    def test_evaluate_blank_range_cells(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A3": 3,
+            "B1": '=SUM(A1:A3)',
+            "C1": '=CONCAT("n=",SUM(A1:A3))',
+        })
+        # Blank cells of ranges are not added to the model.
+        self.assertNotIn('Sheet1!A2', dict_model.cells)
+
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        self.assertEqual(4, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertNotIn('Sheet1!A2', dict_evaluator.values)
+        # Blanks do not turn sums of ints into floats.
+        self.assertEqual('n=4', dict_evaluator.evaluate('Sheet1!C1'))
+
+        # Setting a blank cell drops the ranges containing it.
+        dict_evaluator.set_cell_value('Sheet1!A2', 2)
+        self.assertEqual(6, dict_evaluator.evaluate('Sheet1!B1'))
+
+    def test_evaluate_sparse_range(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A500": 2,
+            "B1": '=SUM(A:A)',
+            "B2": '=SUM(A1:A1000)',
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        # Cells after a long run of blank cells are not dropped.
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!B1'))
+        # Bounded ranges keep their shape.
+        self.assertEqual(3, dict_evaluator.evaluate('Sheet1!B2'))
+        self.assertEqual(
+            (1000, 1), dict_model.ranges['Sheet1!A1:A1000'].value.shape)
+        self.assertEqual(
+            (500, 2), dict_model.get_spatial_index().used_bounds('Sheet1'))
+
+        # Cells set through the model are added to the index.
+        index = dict_model.get_spatial_index()
+        dict_evaluator.set_cell_value('Sheet1!A600', 3)
+        self.assertEqual(6, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertIs(index, dict_model.get_spatial_index())
+
+        # Cells added to the model directly are indexed on invalidation.
+        dict_model.cells['Sheet1!A700'] = xltypes.XLCell('Sheet1!A700', 4)
+        dict_evaluator.invalidate(['Sheet1!A700'])
+        self.assertEqual(10, dict_evaluator.evaluate('Sheet1!B1'))
+        dict_model.cells['Sheet1!A800'] = xltypes.XLCell('Sheet1!A800', 5)
+        dict_evaluator.invalidate()
+        self.assertEqual(15, dict_evaluator.evaluate('Sheet1!B1'))
+
+    def test_evaluate_range_operator(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A2": 2,
+            "A3": 3,
+            "A4": 4,
+            "B1": '=SUM(A1:INDEX(A1:A4, 3))',
+            "B2": '=SUM(OFFSET(A1, 1, 0):A4)',
+            "B3": '=SUM(A2:INDIRECT("A3"))',
+        })
+        dict_evaluator = evaluator.Evaluator(dict_model)
+        self.assertEqual(6, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(9, dict_evaluator.evaluate('Sheet1!B2'))
+        self.assertEqual(5, dict_evaluator.evaluate('Sheet1!B3'))
+
+        dict_evaluator.set_cell_value('Sheet1!A2', 20)
+        self.assertEqual(24, dict_evaluator.evaluate('Sheet1!B1'))
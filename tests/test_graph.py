@@ -0,0 +1,94 @@
+import unittest
+
+from xlcalculator import graph, model
+
+
+class DependencyGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = graph.DependencyGraph()
+        self.graph.add('Sheet1!B1', ['Sheet1!A1'])
+        self.graph.add('Sheet1!C1', ['Sheet1!B1', 'Sheet1!A2'])
+        self.graph.add('Sheet1!D1', ['Sheet1!C1'])
+
+    def test_precedents(self):
+        self.assertEqual(
+            {'Sheet1!B1', 'Sheet1!A2'}, self.graph.precedents['Sheet1!C1'])
+
+    def test_dependents(self):
+        self.assertEqual({'Sheet1!B1'}, self.graph.dependents['Sheet1!A1'])
+        self.assertEqual({'Sheet1!C1'}, self.graph.dependents['Sheet1!A2'])
+
+    def test_transitive_precedents(self):
+        self.assertEqual(
+            {'Sheet1!A1', 'Sheet1!A2', 'Sheet1!B1', 'Sheet1!C1'},
+            self.graph.transitive_precedents(['Sheet1!D1']))
+
+    def test_transitive_dependents(self):
+        self.assertEqual(
+            {'Sheet1!B1', 'Sheet1!C1', 'Sheet1!D1'},
+            self.graph.transitive_dependents(['Sheet1!A1']))
+        self.assertEqual(
+            set(), self.graph.transitive_dependents(['Sheet1!D1']))
+
+    def test_add_replaces_precedents(self):
+        self.graph.add('Sheet1!B1', ['Sheet1!A3'])
+        self.assertNotIn('Sheet1!A1', self.graph.dependents)
+        self.assertEqual({'Sheet1!B1'}, self.graph.dependents['Sheet1!A3'])
+
+    def test_remove(self):
+        self.graph.remove('Sheet1!C1')
+        self.assertNotIn('Sheet1!C1', self.graph.precedents)
+        self.assertNotIn('Sheet1!A2', self.graph.dependents)
+        self.assertNotIn('Sheet1!B1', self.graph.dependents)
+        self.assertEqual({'Sheet1!D1'}, self.graph.dependents['Sheet1!C1'])
+
+
+class ModelDependencyGraphTest(unittest.TestCase):
+
+    def test_read_and_parse_dict(self):
+        compiler = model.ModelCompiler()
+        dict_model = compiler.read_and_parse_dict({
+            "A1": 1,
+            "A2": 2,
+            "B1": "=SUM(A1:A2)",
+            "C1": "=B1*2",
+        })
+        dependency_graph = dict_model.dependency_graph
+
+        self.assertEqual(
+            {'Sheet1!A1', 'Sheet1!A2'},
+            dependency_graph.precedents['Sheet1!B1'])
+        self.assertEqual(
+            {'Sheet1!B1', 'Sheet1!C1'},
+            dependency_graph.transitive_dependents(['Sheet1!A2']))
+
+    def test_defined_names(self):
+        my_model = model.Model()
+        my_model.set_cell_value('Sheet1!A1', 1)
+        my_model.defined_names['one'] = my_model.cells['Sheet1!A1']
+
+        self.assertEqual(['Sheet1!A1'], my_model.resolve_term('Sheet1!one'))
+        self.assertEqual(['Sheet1!A1'], my_model.resolve_term('one'))
+        self.assertEqual(
+            ['Sheet1!A1', 'Sheet1!B1', 'Sheet1!A2', 'Sheet1!B2'],
+            my_model.resolve_term('Sheet1!A1:B2'))
+
+
+class TopologicalOrderTest(unittest.TestCase):
+
+    def test_order(self):
+        dependency_graph = graph.DependencyGraph()
+        dependency_graph.add('Sheet1!C1', ['Sheet1!B1', 'Sheet1!A1'])
+        dependency_graph.add('Sheet1!B1', ['Sheet1!A1'])
+
+        order = dependency_graph.topological_order(['Sheet1!C1'])
+        self.assertEqual(['Sheet1!A1', 'Sheet1!B1', 'Sheet1!C1'], order)
+
+    def test_cycle(self):
+        dependency_graph = graph.DependencyGraph()
+        dependency_graph.add('Sheet1!A1', ['Sheet1!B1'])
+        dependency_graph.add('Sheet1!B1', ['Sheet1!A1'])
+
+        with self.assertRaisesRegex(RuntimeError, 'Cycle detected'):
+            dependency_graph.topological_order(['Sheet1!A1'])
@@ -1,12 +1,17 @@
 
+import io
+import os
+import tempfile
 import unittest
 from copy import deepcopy
 
 from jsonpickle import decode
 
+from xlcalculator import artifact
 from xlcalculator.model import Model, ModelCompiler
 from xlcalculator.xltypes import XLCell, XLFormula, XLRange
 from xlcalculator.tokenizer import f_token
+from xlcalculator.xlfunctions.func_xltypes import BLANK, Number
 from xlcalculator import Evaluator
 
 from . import testing
@@ -125,6 +130,153 @@ class ModelCompilerTest(unittest.TestCase):
             testing.get_resource("reader.xlsm"), ignore_sheets=['Eleventh'])
         self.assertEqual(self.model, new_model)
 
+    def test_read_and_parse_archive_outputs(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_archive(
+            testing.get_resource("reader.xlsm"), streaming=True,
+            outputs=['Fourth!A2', 'Fifth!B2', 'Hundred'])
+
+        # Only the outputs and their precedents are loaded.
+        self.assertEqual(
+            ['Eighth!B1', 'Fifth!B2', 'First!A2', 'First!B2', 'Fourth!A2'],
+            sorted(new_model.cells))
+        self.assertEqual(['Hundred'], list(new_model.defined_names))
+
+        evaluator = Evaluator(new_model)
+        self.assertEqual(1.1, evaluator.evaluate('Fourth!A2'))
+        self.assertEqual(2.2, evaluator.evaluate('Fifth!B2'))
+        self.assertEqual(100, evaluator.evaluate('Hundred'))
+
+    def test_read_and_parse_archive_outputs_streaming(self):
+        model_compiler = ModelCompiler()
+        archives = []
+        read_excel_file = model_compiler.read_excel_file
+
+        def read_and_keep(*args, **kwargs):
+            archives.append(read_excel_file(*args, **kwargs))
+            return archives[-1]
+
+        model_compiler.read_excel_file = read_and_keep
+        new_model = model_compiler.read_and_parse_archive(
+            testing.get_resource("reader.xlsm"), outputs=['Fourth!A2'])
+
+        # Outputs are read with the streaming reader by default.
+        self.assertTrue(archives[0].streaming)
+        self.assertEqual(1.1, Evaluator(new_model).evaluate('Fourth!A2'))
+
+    def test_persist_to_artifact(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_archive(
+            testing.get_resource("reader.xlsm"), ignore_sheets=['Eleventh'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, 'model.xlca')
+            new_model.persist_to_artifact(fname)
+            loaded_model = Model()
+            loaded_model.construct_from_artifact(fname, compiled=True)
+
+        self.assertEqual(new_model, loaded_model)
+        self.assertEqual(new_model.ranges, loaded_model.ranges)
+        self.assertEqual(
+            new_model.defined_names, loaded_model.defined_names)
+        # The ASTs are loaded, not parsed again.
+        self.assertEqual(
+            str(new_model.cells['Fourth!A2'].formula.ast),
+            str(loaded_model.cells['Fourth!A2'].formula.ast))
+        self.assertIsNotNone(loaded_model.cells['Fourth!A2'].formula.code)
+
+        evaluator = Evaluator(loaded_model)
+        self.assertEqual(1.1, evaluator.evaluate('Fourth!A2'))
+        self.assertEqual(2.2, evaluator.evaluate('Fifth!B2'))
+        self.assertEqual(100, evaluator.evaluate('Hundred'))
+
+    def test_artifact_without_ast(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_dict({
+            'A1': 1,
+            'B1': '=A1+1',
+        })
+        fp = io.BytesIO()
+        artifact.dump(new_model, fp, include_ast=False)
+        fp.seek(0)
+
+        loaded_model = Model()
+        self.assertFalse(artifact.load(fp, loaded_model))
+        self.assertIsNone(loaded_model.cells['Sheet1!B1'].formula.ast)
+
+    def test_persist_evaluated_to_artifact(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_dict({
+            'A1': 1,
+            'A2': 'a',
+            'B1': '=A1*2',
+            'B2': '=A2&"b"',
+            'B3': '=A1>0',
+            'B4': '=A3',
+            'B5': '=SUM(A1:A3)',
+        })
+        evaluator = Evaluator(new_model)
+        addresses = [f'Sheet1!B{row}' for row in range(1, 6)]
+        values = [evaluator.evaluate(addr) for addr in addresses]
+        # Evaluated values are `ExcelType`s now.
+        self.assertIsInstance(new_model.cells['Sheet1!B1'].value, Number)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, 'model.xlca')
+            new_model.persist_to_artifact(fname)
+            loaded_model = Model()
+            loaded_model.construct_from_artifact(fname)
+
+        self.assertEqual(
+            [type(value) for value in values],
+            [type(loaded_model.cells[addr].value) for addr in addresses])
+        self.assertEqual(
+            [str(value) for value in values],
+            [str(loaded_model.cells[addr].value) for addr in addresses])
+        self.assertIs(BLANK, loaded_model.cells['Sheet1!B4'].value)
+        loaded_evaluator = Evaluator(loaded_model)
+        self.assertEqual(
+            [str(value) for value in values],
+            [str(loaded_evaluator.evaluate(addr)) for addr in addresses])
+
+    def test_build_ranges_full_references(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_dict({
+            'A1': 1,
+            'A2': 2,
+            'B1': '=SUM(A:A)',
+            'B2': '=SUM(3:3)',
+        })
+        # Full references keep no max bound, their associated cells are
+        # those within the used range.
+        self.assertEqual(
+            (1, 1, None, 1), new_model.ranges['Sheet1!A:A'].cells.bounds)
+        self.assertEqual(
+            {'Sheet1!A1', 'Sheet1!A2'},
+            new_model.cells['Sheet1!B1'].formula.associated_cells)
+        # Artifacts keep them unbounded.
+        fp = io.BytesIO()
+        artifact.dump(new_model, fp)
+        fp.seek(0)
+        loaded_model = Model()
+        artifact.load(fp, loaded_model)
+        self.assertEqual(
+            (1, 1, None, 1), loaded_model.ranges['Sheet1!A:A'].cells.bounds)
+
+        evaluator = Evaluator(new_model)
+        self.assertEqual(3, evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(0, evaluator.evaluate('Sheet1!B2'))
+
+        # Cells written past the used range are read.
+        evaluator.set_cell_value('Sheet1!A5', 100)
+        evaluator.set_cell_value('Sheet1!D3', 4)
+        self.assertEqual(103, evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(4, evaluator.evaluate('Sheet1!B2'))
+
+    def test_artifact_invalid(self):
+        with self.assertRaises(artifact.ArtifactError):
+            artifact.load(io.BytesIO(b'{"cells": {}}'), Model())
+
     def test_build_defined_names(self):
         model_compiler = ModelCompiler()
         archive = model_compiler.read_excel_file(
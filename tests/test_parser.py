@@ -1,6 +1,7 @@
 import unittest
 
-from xlcalculator.model import parser
+from xlcalculator import ast_nodes
+from xlcalculator.parser import FormulaParser
 
 
 class FormulaParserTest(unittest.TestCase):
@@ -11,7 +12,7 @@ class FormulaParserTest(unittest.TestCase):
                 'first': 'A1',
                 'two_by_two': 'A1:B2'
             }
-        ast = parser.FormulaParser().parse(formula, named_ranges)
+        ast = FormulaParser().parse(formula, named_ranges)
         return ast
 
     def test_parse(self):
@@ -72,3 +73,22 @@ class FormulaParserTest(unittest.TestCase):
             self.parse('2*(A1+1')
         with self.assertRaises(IndexError):
             self.parse('2*)')
+
+    def test_parse_range_with_function_end(self):
+        ast = self.parse('SUM(A1:INDEX(A1:B2, 2, 2))')
+        self.assertIsInstance(ast.args[0], ast_nodes.RangeOperatorNode)
+        self.assertEqual(str(ast), 'SUM(A1:INDEX(A1:B2, 2, 2))')
+
+    def test_parse_range_with_function_start(self):
+        ast = self.parse('INDEX(A1:B2, 1, 1):B2')
+        self.assertIsInstance(ast, ast_nodes.RangeOperatorNode)
+        self.assertIsInstance(ast.left, ast_nodes.FunctionNode)
+        self.assertEqual(str(ast), 'INDEX(A1:B2, 1, 1):B2')
+
+    def test_parse_prefix_op_after_infix_op(self):
+        self.assertEqual(
+            str(self.parse('1<=-2*3')), '(1) <= ((- (2)) * (3))')
+
+    def test_parse_unexpected_token(self):
+        with self.assertRaises(SyntaxError):
+            self.parse('SUM(1 2')
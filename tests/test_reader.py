@@ -1,7 +1,7 @@
 import jsonpickle
 import unittest
 
-from xlcalculator import reader, xltypes, tokenizer
+from xlcalculator import reader, streaming, xltypes, tokenizer
 from . import testing
 
 
@@ -52,3 +52,72 @@ class ReaderTest(unittest.TestCase):
             - set(sorted(self.defined_names.keys()))
         )
         self.assertEqual(list(its_a_blank), ['Its_a_blank'])
+
+
+class StreamingReaderTest(unittest.TestCase):
+
+    def read(self, streaming):
+        archive = reader.Reader(
+            testing.get_resource("reader.xlsm"), streaming=streaming)
+        archive.read()
+        cells, formulae, ranges = \
+            archive.read_cells(ignore_sheets=['Eleventh'])
+        return archive, cells, formulae
+
+    def test_read_cells(self):
+        _, cells, _ = self.read(streaming=False)
+        _, streamed_cells, _ = self.read(streaming=True)
+
+        self.assertEqual(list(cells.keys()), list(streamed_cells.keys()))
+        self.assertEqual(
+            [cell.value for cell in cells.values()],
+            [cell.value for cell in streamed_cells.values()])
+
+    def test_read_formulae(self):
+        _, _, formulae = self.read(streaming=False)
+        _, _, streamed_formulae = self.read(streaming=True)
+
+        self.assertEqual(
+            {addr: formula.formula for addr, formula in formulae.items()},
+            {addr: formula.formula
+             for addr, formula in streamed_formulae.items()})
+
+    def test_read_defined_names(self):
+        archive, _, _ = self.read(streaming=False)
+        streamed_archive, _, _ = self.read(streaming=True)
+
+        self.assertEqual(
+            archive.read_defined_names(),
+            streamed_archive.read_defined_names())
+        self.assertEqual(
+            archive.book.sheetnames, streamed_archive.book.sheetnames)
+
+    def test_iter_cells_shared_formula(self):
+        book = streaming.Workbook(testing.get_resource("DATE.xlsx"))
+        shared = {
+            coordinate: (formula, shared_index)
+            for coordinate, value, formula, shared_index
+            in book.iter_cells('Sheet1')
+            if shared_index is not None
+        }
+        # Every cell of a shared formula gets its own translated formula.
+        self.assertEqual(('=DATE(B3,C3,D3)', '0'), shared['A3'])
+        self.assertEqual(('=DATE(B4,C4,D4)', '0'), shared['A4'])
+
+    def test_read_cells_workers(self):
+        for streaming_mode in (False, True):
+            archive = reader.Reader(
+                testing.get_resource("reader.xlsm"),
+                streaming=streaming_mode, workers=2)
+            archive.read()
+            cells, formulae, ranges = \
+                archive.read_cells(ignore_sheets=['Eleventh'])
+            _, serial_cells, serial_formulae = self.read(streaming_mode)
+
+            # Sheets are merged in order, whatever the number of workers.
+            self.assertEqual(list(serial_cells.keys()), list(cells.keys()))
+            self.assertEqual(
+                list(serial_formulae.keys()), list(formulae.keys()))
+            self.assertEqual(
+                [cell.value for cell in serial_cells.values()],
+                [cell.value for cell in cells.values()])
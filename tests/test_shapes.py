@@ -0,0 +1,119 @@
+import unittest
+
+from xlcalculator import (
+    artifact, ast_nodes, evaluator, model, shapes, tokenizer)
+from xlcalculator.shapes import utils
+
+
+class ReferencesTest(unittest.TestCase):
+
+    def test_relative_formula(self):
+        self.assertEqual(
+            '=R[0]C[-1]*2', utils.relative_formula('=A2*2', 2, 2))
+        self.assertEqual(
+            '=SUM(R1C1:R5C[0])',
+            utils.relative_formula('=SUM($A$1:B$5)', 2, 2))
+        # Strings, quoted sheet names and function names are left alone.
+        self.assertEqual(
+            '=LOG10(\'A1\'!R[0]C[0])&"A1"',
+            utils.relative_formula('=LOG10(\'A1\'!B2)&"A1"', 2, 2))
+
+    def test_shift_references(self):
+        self.assertEqual(
+            '=SUM($A$1:C$5)+Sheet1!D4',
+            utils.shift_references('=SUM($A$1:B$5)+Sheet1!C3', 1, 1))
+        self.assertEqual(
+            '=SUM(B:C)+SUM(2:4)',
+            utils.shift_references('=SUM(A:B)+SUM(1:3)', 1, 1))
+        with self.assertRaises(ValueError):
+            utils.shift_references('=A1', -1, 0)
+
+    def test_bind_references(self):
+        parts = utils.reference_parts('=SUM($A$1:B$5)+Sheet1!C3', 3, 4)
+        self.assertEqual(
+            '=SUM(A1:B5)+Sheet1!C3', utils.bind_references(parts, 3, 4))
+        self.assertEqual(
+            '=SUM(A1:C5)+Sheet1!D4', utils.bind_references(parts, 4, 5))
+        parts = utils.reference_parts('=SUM(A:B)+SUM(1:3)', 1, 1)
+        self.assertEqual(
+            '=SUM(B:C)+SUM(2:4)', utils.bind_references(parts, 2, 2))
+        with self.assertRaises(ValueError):
+            utils.bind_references(utils.reference_parts('=A1', 1, 1), 0, 1)
+
+
+class FormulaShapesTest(unittest.TestCase):
+
+    def test_formula(self):
+        formula_shapes = shapes.FormulaShapes()
+        formula_shapes.formula('=$A$1+A1', 'Sheet1', 'Sheet1!B1')
+        formula = formula_shapes.formula('=$A$1+A2', 'Sheet1', 'Sheet1!B2')
+
+        self.assertEqual(1, formula_shapes.hits)
+        # The moved tokens are the tokens of the formula.
+        self.assertEqual(
+            [(token.tvalue, token.ttype, token.tsubtype)
+             for token in tokenizer.ExcelParser().getTokens(
+                 '=$A$1+A2').items],
+            [(token.tvalue, token.ttype, token.tsubtype)
+             for token in formula.tokens])
+        self.assertEqual(['Sheet1!A1', 'Sheet1!A2'], formula.terms)
+
+    def test_fill_down(self):
+        compiler = model.ModelCompiler()
+        inputs = {f'A{row}': row for row in range(1, 6)}
+        inputs.update({
+            f'B{row}': f'=A{row}*$A$5+SUM($A$1:A{row})'
+            for row in range(1, 6)
+        })
+        fill_model = compiler.read_and_parse_dict(inputs)
+
+        formulas = [fill_model.cells[f'Sheet1!B{row}'].formula
+                    for row in range(1, 6)]
+        # All cells share one AST.
+        self.assertEqual(1, len({id(formula.ast) for formula in formulas}))
+
+        fill_evaluator = evaluator.Evaluator(fill_model)
+        for row in range(1, 6):
+            self.assertEqual(
+                row * 5 + sum(range(1, row + 1)),
+                fill_evaluator.evaluate(f'Sheet1!B{row}'))
+
+        # The shared nodes keep no addresses per cell.
+        nodes = [formulas[0].ast]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(artifact.node_children(node))
+            if isinstance(node, ast_nodes.RangeNode):
+                self.assertLessEqual(len(node.full_addresses), 1)
+
+    def test_fill_down_compiled(self):
+        compiler = model.ModelCompiler()
+        inputs = {f'A{row}': row for row in range(1, 6)}
+        inputs.update({
+            f'B{row}': f'=A{row}*$A$5+SUM($A$1:A{row})'
+            for row in range(1, 6)
+        })
+        fill_model = compiler.read_and_parse_dict(inputs, build_code=False)
+        fill_model.build_code(compiled=True)
+
+        fill_evaluator = evaluator.Evaluator(fill_model)
+        for row in range(1, 6):
+            self.assertEqual(
+                row * 5 + sum(range(1, row + 1)),
+                fill_evaluator.evaluate(f'Sheet1!B{row}'))
+
+    def test_different_shapes(self):
+        compiler = model.ModelCompiler()
+        shapes_model = compiler.read_and_parse_dict({
+            'A1': 1,
+            'A2': 2,
+            'B1': '=A1+1',
+            'B2': '=A1+1',
+        })
+        self.assertIsNot(
+            shapes_model.cells['Sheet1!B1'].formula.ast,
+            shapes_model.cells['Sheet1!B2'].formula.ast)
+
+        shapes_evaluator = evaluator.Evaluator(shapes_model)
+        self.assertEqual(2, shapes_evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(2, shapes_evaluator.evaluate('Sheet1!B2'))
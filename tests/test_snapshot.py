@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+
+from xlcalculator import artifact, snapshot
+from xlcalculator.evaluator import Evaluator
+from xlcalculator.model import Model, ModelCompiler
+
+from . import testing
+
+
+class OverlayTest(unittest.TestCase):
+
+    def test_overlay(self):
+        base = {'a': 1, 'b': 2}
+        overlay = snapshot.Overlay(base)
+        overlay['a'] = 3
+        overlay['c'] = 4
+        del overlay['b']
+
+        self.assertEqual({'a': 3, 'c': 4}, dict(overlay))
+        self.assertEqual(2, len(overlay))
+        overlay['c'] = 5
+        overlay['b'] = 6
+        self.assertEqual(3, len(overlay))
+        del overlay['b']
+        self.assertNotIn('b', overlay)
+        self.assertEqual({'a': 1, 'b': 2}, base)
+        with self.assertRaises(KeyError):
+            overlay['b']
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        model_compiler = ModelCompiler()
+        self.model = model_compiler.read_and_parse_archive(
+            testing.get_resource("reader.xlsm"), ignore_sheets=['Eleventh'])
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp_dir.name, 'model.xlcs')
+        self.model.persist_to_snapshot(self.fname)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load(self):
+        with snapshot.Snapshot(self.fname, compiled=True) as shared:
+            loaded_model = Model()
+            loaded_model.construct_from_snapshot(shared)
+
+            self.assertEqual(sorted(self.model.cells), sorted(shared))
+            self.assertEqual(self.model, loaded_model)
+            self.assertEqual(self.model.ranges, loaded_model.ranges)
+            self.assertEqual(
+                self.model.defined_names, loaded_model.defined_names)
+            self.assertIsNotNone(
+                loaded_model.cells['Fourth!A2'].formula.code)
+
+            evaluator = Evaluator(loaded_model)
+            self.assertEqual(1.1, evaluator.evaluate('Fourth!A2'))
+            self.assertEqual(2.2, evaluator.evaluate('Fifth!B2'))
+            self.assertEqual(100, evaluator.evaluate('Hundred'))
+
+    def test_private_models(self):
+        with snapshot.Snapshot(self.fname) as shared:
+            first_model = Model()
+            first_model.construct_from_snapshot(shared)
+            second_model = Model()
+            second_model.construct_from_snapshot(shared)
+
+            # Formulas are shared, cells are not.
+            self.assertIs(
+                first_model.cells['Fourth!A2'].formula,
+                second_model.cells['Fourth!A2'].formula)
+            self.assertIsNot(
+                first_model.cells['Fourth!A2'],
+                second_model.cells['Fourth!A2'])
+
+            first_model.set_cell_value('Fourth!A2', 5)
+            first_model.set_cell_value('Sheet1!Z99', 6)
+            self.assertEqual(5, first_model.cells['Fourth!A2'].value)
+            self.assertIn('Sheet1!Z99', first_model.cells)
+            self.assertEqual(
+                1.1, Evaluator(second_model).evaluate('Fourth!A2'))
+            self.assertNotIn('Sheet1!Z99', second_model.cells)
+            self.assertNotIn('Sheet1!Z99', shared)
+
+    def test_evaluated(self):
+        evaluator = Evaluator(self.model)
+        addresses = ['Fourth!A2', 'Fifth!B2', 'First!B2']
+        values = [evaluator.evaluate(addr) for addr in addresses]
+        self.model.persist_to_snapshot(self.fname)
+
+        with snapshot.Snapshot(self.fname) as shared:
+            loaded_model = Model()
+            loaded_model.construct_from_snapshot(shared)
+            self.assertEqual(
+                [str(value) for value in values],
+                [str(loaded_model.cells[addr].value) for addr in addresses])
+            loaded_evaluator = Evaluator(loaded_model)
+            self.assertEqual(
+                values,
+                [loaded_evaluator.evaluate(addr) for addr in addresses])
+
+    def test_without_ast(self):
+        model_compiler = ModelCompiler()
+        new_model = model_compiler.read_and_parse_archive(
+            testing.get_resource("reader.xlsm"), ignore_sheets=['Eleventh'],
+            build_code=False)
+        new_model.persist_to_snapshot(self.fname)
+
+        with snapshot.Snapshot(self.fname, compiled=True) as shared:
+            loaded_model = Model()
+            loaded_model.construct_from_snapshot(shared)
+            # Formulas are parsed when they are decoded.
+            self.assertIsNotNone(
+                loaded_model.cells['Fourth!A2'].formula.ast)
+            evaluator = Evaluator(loaded_model)
+            self.assertEqual(1.1, evaluator.evaluate('Fourth!A2'))
+            self.assertEqual(100, evaluator.evaluate('Hundred'))
+
+    def test_invalid(self):
+        fname = os.path.join(self.tmp_dir.name, 'model.json')
+        with open(fname, 'w') as fp:
+            fp.write('{"cells": {}}')
+        with self.assertRaises(artifact.ArtifactError):
+            snapshot.Snapshot(fname)
@@ -0,0 +1,46 @@
+import unittest
+
+from xlcalculator import spatial
+
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = spatial.SpatialIndex({
+            'Sheet1!C3': None,
+            'Sheet1!A1': None,
+            'Sheet1!B200': None,
+            'Sheet1!A3': None,
+            'Other!D4': None,
+            'Sheet1!A1:B2': None,
+        })
+
+    def test_used_bounds(self):
+        self.assertEqual((200, 3), self.index.used_bounds('Sheet1'))
+        self.assertEqual((4, 4), self.index.used_bounds('Other'))
+        self.assertEqual((0, 0), self.index.used_bounds('Unknown'))
+
+    def test_cells_within(self):
+        self.assertEqual(
+            [(1, 1, 'Sheet1!A1'), (3, 1, 'Sheet1!A3'), (3, 3, 'Sheet1!C3'),
+             (200, 2, 'Sheet1!B200')],
+            list(self.index.cells_within('Sheet1', (1, 1, 200, 3))))
+        self.assertEqual(
+            [(3, 3, 'Sheet1!C3')],
+            list(self.index.cells_within('Sheet1', (2, 2, 199, 3))))
+        self.assertEqual(
+            [], list(self.index.cells_within('Unknown', (1, 1, 9, 9))))
+
+    def test_add_remove(self):
+        self.index.add("'Sheet1'!B2")
+        self.index.add('Sheet1!E300')
+        self.assertEqual((300, 5), self.index.used_bounds('Sheet1'))
+        self.assertEqual(
+            [(2, 2, "'Sheet1'!B2"), (3, 1, 'Sheet1!A3')],
+            list(self.index.cells_within('Sheet1', (2, 1, 3, 2))))
+
+        self.index.remove('Sheet1!E300')
+        self.index.remove('Sheet1!B200')
+        self.index.remove('Unknown!A1')
+        self.assertEqual((3, 5), self.index.used_bounds('Sheet1'))
+
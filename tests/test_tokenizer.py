@@ -352,3 +352,32 @@ class ExcelParserTest(testing.XlCalculatorTestCase):
                 f_token(tvalue='', ttype='function', tsubtype='stop'),
             ]
         )
+
+    def test_trailing_white_space(self):
+        self.assertASTNodesEqual(
+            self.parse('A1 \n'),
+            [
+                f_token(tvalue='A1', ttype='operand', tsubtype='range')
+            ]
+        )
+
+    def test_trailing_argument_separator(self):
+        self.assertASTNodesEqual(
+            self.parse('SUM(A1,'),
+            [
+                f_token(tvalue='SUM', ttype='function', tsubtype='start'),
+                f_token(tvalue='A1', ttype='operand', tsubtype='range'),
+                f_token(tvalue=',', ttype='argument', tsubtype=''),
+            ]
+        )
+
+    def test_token_state(self):
+        token = f_token(tvalue='A1', ttype='operand', tsubtype='range')
+        restored = f_token(None, None, None)
+        # Tokens persisted by older versions have a UUID.
+        restored.__setstate__(token.__getstate__())
+        restored.unique_identifier = 'da0c035b-f1a8-4cb7-84b9-7a627b87926b'
+        self.assertEqual(
+            ('A1', 'operand', 'range'),
+            (restored.tvalue, restored.ttype, restored.tsubtype))
+        self.assertNotEqual(token, restored)
@@ -0,0 +1,74 @@
+import unittest
+
+from xlcalculator import evaluator, model, tracing
+
+
+class TracerTest(unittest.TestCase):
+
+    def test_enabled(self):
+        tracer = tracing.Tracer()
+        self.assertFalse(tracer.enabled)
+        sink = tracing.ListSink()
+        tracer.add_sink(sink)
+        self.assertTrue(tracer.enabled)
+        tracer.remove_sink(sink)
+        self.assertFalse(tracer.enabled)
+
+    def test_emit(self):
+        sink = tracing.ListSink()
+        tracer = tracing.Tracer([sink])
+        tracer.emit('evaluate', 'Sheet1!A1', value=1)
+        self.assertEqual(
+            [tracing.Event('evaluate', 'Sheet1!A1', {'value': 1})],
+            sink.events)
+
+    def test_timed(self):
+        stats = tracing.StatsSink()
+        tracer = tracing.Tracer([stats])
+        timed = tracer.timed('ABS', abs)
+        self.assertEqual(1, timed(-1))
+        self.assertEqual(1, stats.counts[('function', 'ABS')])
+        self.assertIn(('function', 'ABS'), stats.durations)
+
+
+class EvaluatorTracingTest(unittest.TestCase):
+
+    def setUp(self):
+        compiler = model.ModelCompiler()
+        self.model = compiler.read_and_parse_dict({
+            "A1": -1,
+            "B1": "=ABS(A1)",
+        })
+
+    def test_disabled(self):
+        dict_evaluator = evaluator.Evaluator(self.model)
+        self.assertIs(dict_evaluator.tracer, tracing.tracer)
+        self.assertIs(
+            dict_evaluator.namespace, dict_evaluator._get_namespace())
+
+    def test_events(self):
+        sink = tracing.ListSink()
+        dict_evaluator = evaluator.Evaluator(
+            self.model, tracer=tracing.Tracer([sink]))
+        self.assertEqual(1, dict_evaluator.evaluate('Sheet1!B1'))
+        self.assertEqual(1, dict_evaluator.evaluate('Sheet1!B1'))
+
+        kinds = [(event.kind, event.address) for event in sink.events]
+        self.assertEqual([
+            ('function', None),
+            ('evaluate', 'Sheet1!B1'),
+            ('cache-hit', 'Sheet1!B1'),
+        ], kinds)
+        self.assertEqual('ABS', sink.events[0].data['name'])
+        self.assertEqual(1, sink.events[1].data['value'])
+
+    def test_model_events(self):
+        sink = tracing.ListSink()
+        tracing.tracer.add_sink(sink)
+        try:
+            self.model.set_cell_value('Sheet1!A1', 2)
+        finally:
+            tracing.tracer.remove_sink(sink)
+        self.assertEqual(
+            [tracing.Event('set-cell-value', 'Sheet1!A1', {'value': 2})],
+            sink.events)
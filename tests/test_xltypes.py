@@ -123,3 +123,16 @@ class XLRangeTest(unittest.TestCase):
             xltypes.XLRange('Sheet1!A1:A3').cells,
             [['Sheet1!A1'], ['Sheet1!A2'], ['Sheet1!A3']]
         )
+
+    def test_full_column_cells(self):
+        cells = xltypes.XLRange('Sheet1!B:C').cells
+        # Rows are only built when they are read.
+        self.assertEqual(1048576, len(cells))
+        self.assertEqual(['Sheet1!B1048576', 'Sheet1!C1048576'], cells[-1])
+
+        clipped = cells.clip(3, 1)
+        self.assertEqual(
+            [['Sheet1!B1', 'Sheet1!C1'],
+             ['Sheet1!B2', 'Sheet1!C2'],
+             ['Sheet1!B3', 'Sheet1!C3']],
+            clipped)
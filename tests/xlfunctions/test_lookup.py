@@ -1,3 +1,4 @@
+import mock
 import unittest
 
 from xlcalculator.xlfunctions import lookup, xlerrors, func_xltypes
@@ -28,9 +29,46 @@ class LookupModuleTest(unittest.TestCase):
         ])
         self.assertEqual(lookup.VLOOKUP(102, range1, 2, False), 'Fortana')
 
+    def test_VLOOOKUP_text(self):
+        range1 = func_xltypes.Array([
+            ['a', 1],
+            ['B', 2],
+            ['b', 3],
+        ])
+        self.assertEqual(lookup.VLOOKUP('b', range1, 2, False), 2)
+        self.assertEqual(lookup.VLOOKUP('A', range1, 2, False), 1)
+        self.assertIsInstance(
+            lookup.VLOOKUP('c', range1, 2, False), xlerrors.NaExcelError)
+
+    def test_VLOOOKUP_index_is_built_once(self):
+        range1 = func_xltypes.Array([[101, 'Davis'], [102, 'Fortana']])
+        with mock.patch.object(
+                lookup, 'exact_index', wraps=lookup.exact_index) as index:
+            self.assertEqual(lookup.VLOOKUP(101, range1, 2, False), 'Davis')
+            self.assertEqual(
+                lookup.VLOOKUP(102, range1, 2, False), 'Fortana')
+        self.assertEqual(index.call_count, 1)
+
     def test_VLOOOKUP_with_range_lookup(self):
-        with self.assertRaises(NotImplementedError):
-            lookup.VLOOKUP(1, func_xltypes.Array([[]]), 2, True)
+        range1 = func_xltypes.Array([
+            [1, 'a'],
+            [3, 'b'],
+            [3, 'c'],
+            [5, 'd'],
+            ['x', 'e'],
+        ])
+        self.assertEqual(lookup.VLOOKUP(1, range1, 2, True), 'a')
+        self.assertEqual(lookup.VLOOKUP(4, range1, 2, True), 'c')
+        self.assertEqual(lookup.VLOOKUP(100, range1, 2, True), 'd')
+        self.assertEqual(lookup.VLOOKUP('z', range1, 2, True), 'e')
+        self.assertIsInstance(
+            lookup.VLOOKUP(0, range1, 2, True), xlerrors.NaExcelError)
+        self.assertIsInstance(
+            lookup.VLOOKUP('a', range1, 2, True), xlerrors.NaExcelError)
+
+    def test_VLOOOKUP_with_range_lookup_unsorted(self):
+        range1 = func_xltypes.Array([[5, 'a'], [1, 'b'], [3, 'c']])
+        self.assertEqual(lookup.VLOOKUP(4, range1, 2, True), 'c')
 
     def test_VLOOOKUP_with_oversized_col_index_num(self):
         # Excel Doc example.
@@ -67,3 +105,33 @@ class LookupModuleTest(unittest.TestCase):
         self.assertIsInstance(
             lookup.MATCH(0, range1, 0), xlerrors.NaExcelError
         )
+
+    def test_MATCH_duplicates(self):
+        range1 = func_xltypes.Array([[1], [3], [3], [5]])
+        self.assertEqual(lookup.MATCH(3, range1, 1), 3)
+        self.assertEqual(lookup.MATCH(100, range1, 1), 4)
+        range2 = func_xltypes.Array([[5], [3], [3], [1]])
+        self.assertEqual(lookup.MATCH(2, range2, -1), 3)
+
+    def test_MATCH_exact_text(self):
+        range1 = func_xltypes.Array([['a'], ['B'], ['b']])
+        self.assertEqual(lookup.MATCH('b', range1, 0), 2)
+        self.assertIsInstance(
+            lookup.MATCH('c', range1, 0), xlerrors.NaExcelError)
+
+    def test_MATCH_blank(self):
+        range1 = func_xltypes.Array([[1], [3], [5]])
+        for match_type in (1, -1):
+            self.assertIsInstance(
+                lookup.MATCH(func_xltypes.BLANK, range1, match_type),
+                xlerrors.NaExcelError)
+        range2 = func_xltypes.Array([[5], [3], [1]])
+        self.assertIsInstance(
+            lookup.MATCH(func_xltypes.BLANK, range2, -1),
+            xlerrors.NaExcelError)
+
+    def test_VLOOOKUP_blank(self):
+        range1 = func_xltypes.Array([[1, 'a'], [3, 'b']])
+        self.assertIsInstance(
+            lookup.VLOOKUP(func_xltypes.BLANK, range1, 2, True),
+            xlerrors.NaExcelError)
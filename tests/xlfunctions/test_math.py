@@ -241,6 +241,11 @@ class MathModuleTest(unittest.TestCase):
                 [func_xltypes.Number(3), func_xltypes.Number(4)]
             ])), 8)
 
+    def test_SUM_with_blanks_in_range(self):
+        total = math.SUM(func_xltypes.Array([[1], [None], [2]]))
+        self.assertEqual(total, 3)
+        self.assertIsInstance(total.value, int)
+
     def test_SUM_with_bad_Arg(self):
         self.assertEqual(math.SUM('foo'), 0)
 
@@ -95,3 +95,13 @@ class StatisticsModuleTest(unittest.TestCase):
 
     def test_MIN_with_mixed_types(self):
         self.assertEqual(statistics.MIN(2, 3.0, True), 1)
+
+    def test_MAX_with_mixed_types(self):
+        self.assertEqual(
+            statistics.MAX(func_xltypes.Array([[1, 'a'], [True, 3]]), 2), 3)
+
+    def test_SMALL(self):
+        countRange = func_xltypes.Array([[3, 'a'], [1, 2]])
+        self.assertEqual(statistics.SMALL(countRange, 2), 2)
+        self.assertIsInstance(
+            statistics.SMALL(countRange, 4), xlerrors.NumExcelError)
@@ -120,3 +120,60 @@ class XlModuleTest(unittest.TestCase):
 
         obj = object()
         self.assertEqual(func(obj), obj)
+
+    def test_validate_args_with_keywords(self):
+
+        @xl.validate_args
+        def func(arg: func_xltypes.XlNumber, other=None):
+            return arg, other
+
+        self.assertEqual(func('1', other=2), (1, 2))
+
+    def test_validate_args_bad_arguments(self):
+
+        @xl.validate_args
+        def func(arg: func_xltypes.XlNumber):
+            return arg
+
+        with self.assertRaises(TypeError):
+            func()
+        with self.assertRaises(TypeError):
+            func(1, 2)
+
+
+class SignatureTest(unittest.TestCase):
+
+    def test_get_signature(self):
+
+        def func(arg: func_xltypes.XlNumber, *args: func_xltypes.XlExpr):
+            pass
+
+        sig = xl.get_signature(func)
+        self.assertIs(sig, xl.get_signature(func))
+        self.assertEqual(sig.required, 1)
+        self.assertTrue(sig.accepts(3))
+        self.assertFalse(sig.accepts(0))
+
+    def test_get_signature_wrapped(self):
+
+        @xl.validate_args
+        def func(arg: func_xltypes.XlNumber):
+            pass
+
+        self.assertIs(
+            xl.get_signature(func), xl.get_signature(func.__wrapped__))
+
+    def test_lazy_arguments(self):
+
+        def func(
+                arg: func_xltypes.XlNumber,
+                expr: func_xltypes.XlExpr = None,
+                *args: typing.Tuple[func_xltypes.XlExpr]
+        ):
+            pass
+
+        sig = xl.get_signature(func)
+        self.assertEqual(sig.lazy_arguments(1), (False,))
+        self.assertEqual(sig.lazy_arguments(4), (False, True, True, True))
+        with self.assertRaises(TypeError):
+            sig.lazy_arguments(0)
@@ -1,5 +1,7 @@
 import datetime
+import mock
 import operator
+import pickle
 import unittest
 
 from xlcalculator.xlfunctions import utils, xlerrors, func_xltypes
@@ -15,6 +17,14 @@ class ExcelTypeTest(unittest.TestCase):
         self.assertIsInstance(blank, func_xltypes.ExcelType)
         self.assertEqual(blank.value, None)
 
+    def test_pickle(self):
+        number = pickle.loads(pickle.dumps(func_xltypes.Number(2.5)))
+        self.assertIsInstance(number, func_xltypes.Number)
+        self.assertEqual(2.5, number.value)
+        self.assertIs(
+            func_xltypes.BLANK,
+            pickle.loads(pickle.dumps(func_xltypes.BLANK)))
+
     def test__number__(self):
         self.assertEqual(self.MyType(1).__number__(), 1.0)
 
@@ -637,6 +647,65 @@ class ArrayTest(unittest.TestCase):
             texts.flat,
             ['1', '', '1900-01-05 00:00:00', '4.0', 'True', '6'])
 
+    def test_flat_one_dimensional(self):
+        self.assertEqual(func_xltypes.Array([1, 2, 3]).flat, [1, 2, 3])
+
+    def test_buffer(self):
+        array = func_xltypes.Array([[1, 2], [3, 4]])
+        self.assertIs(array.buffer, array.buffer)
+        self.assertEqual(array.buffer.items, [1, 2, 3, 4])
+
+    def test_buffer_without_numpy(self):
+        with mock.patch.object(func_xltypes, 'numpy', None):
+            self.assertIsNone(func_xltypes.Array([[1, 2]]).buffer)
+
+
+@unittest.skipUnless(func_xltypes.numpy, 'numpy is not installed')
+class ArrayBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        dt = datetime.datetime(1900, 1, 5)
+        self.buffer = func_xltypes.Array([
+            [1, None, dt, 'bad'],
+            ['4', True, 2.5, xlerrors.NaExcelError()]
+        ]).buffer
+
+    def test_kinds(self):
+        Buffer = func_xltypes.ArrayBuffer
+        self.assertEqual(
+            list(self.buffer.kinds),
+            [Buffer.NUMBER, Buffer.BLANK, Buffer.DATETIME, Buffer.TEXT,
+             Buffer.TEXT, Buffer.BOOLEAN, Buffer.NUMBER, Buffer.ERROR])
+
+    def test_numbers(self):
+        castable, values = self.buffer.numbers
+        self.assertEqual(
+            list(castable),
+            [True, True, True, False, True, True, True, False])
+        self.assertEqual(list(values), [1, 0, 5, 0, 4, 1, 2.5, 0])
+
+    def test_sum(self):
+        self.assertEqual(self.buffer.sum(), 13.5)
+        self.assertEqual(self.buffer.sum(where=[True, False, False, True]), 1)
+        self.assertIsInstance(
+            self.buffer.sum(where=[True, False, False, True]), int)
+
+    def test_sum_blanks(self):
+        buffer = func_xltypes.Array([[1], [None], [2]]).buffer
+        self.assertEqual(buffer.sum(), 3)
+        self.assertIsInstance(buffer.sum(), int)
+
+    def test_product(self):
+        self.assertEqual(self.buffer.product(), 2.5)
+
+    def test_min_max_number(self):
+        self.assertEqual(self.buffer.min_number(), 1)
+        self.assertEqual(self.buffer.max_number(), 2.5)
+        self.assertIsNone(func_xltypes.Array([['a']]).buffer.min_number())
+
+    def test_sorted_numbers(self):
+        self.assertEqual(self.buffer.sorted_numbers(), [1, 2.5])
+
 
 class ExprTest(unittest.TestCase):
 
@@ -0,0 +1,84 @@
+"""Integer codec of cell addresses.
+
+`AddressCodec` encodes cell addresses like ``Sheet1!B22`` as integers
+packing a sheet id, the row and the column (see `pack()`), and decodes them
+back. Unlike `utils.resolve_address()`, no regular expression is involved
+and sheet names are interned once per codec.
+"""
+import string
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+
+from . import utils
+
+# Column indexes of openpyxl go up to ZZZ (18278), beyond Excel's XFD.
+COL_BITS = 15
+ROW_BITS = 21
+SHEET_SHIFT = COL_BITS + ROW_BITS
+COL_MASK = (1 << COL_BITS) - 1
+ROW_MASK = (1 << ROW_BITS) - 1
+
+
+def pack(sheet_id, row, col):
+    """The integer key of the cell at (row, col) of a sheet."""
+    return (sheet_id << SHEET_SHIFT) | (row << COL_BITS) | (col - 1)
+
+
+def unpack(key):
+    """The (sheet id, row, column) of an integer key."""
+    return (
+        key >> SHEET_SHIFT, (key >> COL_BITS) & ROW_MASK,
+        (key & COL_MASK) + 1)
+
+
+def split_address(address):
+    """The (sheet, column, row) of a cell address, like
+    `utils.resolve_address()`, with the row as int.
+
+    Raises a `KeyError` if `address` is not a cell address.
+    """
+    if not isinstance(address, str):
+        raise KeyError(address)
+    sheet, _, coordinate = address.rpartition('!')
+    col = coordinate.rstrip(string.digits)
+    row = coordinate[len(col):]
+    if not sheet or not col or not row:
+        raise KeyError(address)
+    if sheet[0] == "'":
+        sheet = utils.resolve_sheet(sheet)
+    return sheet, col, int(row)
+
+
+class AddressCodec:
+    """Encodes cell addresses as integers, and back."""
+
+    def __init__(self):
+        # Sheet names by sheet id, and back.
+        self.sheets = []
+        self.sheet_ids = {}
+
+    def encode(self, address, add=False):
+        """The integer key of `address`.
+
+        Raises a `KeyError` for addresses that are not cell addresses, or
+        of sheets the codec has not seen, unless `add` is set.
+        """
+        sheet, col, row = split_address(address)
+        try:
+            col = column_index_from_string(col)
+        except ValueError:
+            raise KeyError(address)
+        if not 0 < row <= ROW_MASK or col > COL_MASK + 1:
+            raise KeyError(address)
+        sheet_id = self.sheet_ids.get(sheet)
+        if sheet_id is None:
+            if not add:
+                raise KeyError(address)
+            sheet_id = self.sheet_ids[sheet] = len(self.sheets)
+            self.sheets.append(sheet)
+        return pack(sheet_id, row, col)
+
+    def decode(self, key):
+        """The address of an integer key."""
+        sheet_id, row, col = unpack(key)
+        return f'{self.sheets[sheet_id]}!{get_column_letter(col)}{row}'
@@ -0,0 +1,372 @@
+"""Compact binary artifact of a `Model`.
+
+An artifact starts with a header (magic bytes, format version and flags)
+followed by the zlib compressed, `marshal`ed tables of the model:
+
+* a constant table interning all addresses, sheet names, formula texts and
+  token values, which the other tables refer to by index,
+* the cells, formulas (with their tokens), ranges (as bounds where possible)
+  and defined names, shared objects being stored once,
+* optionally the ASTs of the formulas, as a table of nodes, so that loading
+  an artifact needs no tokenizing or parsing.
+
+Compiled closures are not stored; `Model.compile_code()` rebuilds them from
+the ASTs. Like pickles, artifacts must only be loaded from trusted sources.
+"""
+import datetime
+import marshal
+import pickle
+import struct
+import zlib
+
+from xlcalculator.xlfunctions import func_xltypes
+
+from . import ast_nodes, tokenizer, utils, xltypes
+
+MAGIC = b'XLCA'
+VERSION = 2
+HEADER = struct.Struct('<4sHH')
+
+# Header flags.
+FLAG_AST = 1
+
+NONE = -1
+
+# AST node classes by kind, and back.
+NODE_CLASSES = (
+    ast_nodes.OperandNode,
+    ast_nodes.RangeNode,
+    ast_nodes.RelativeRangeNode,
+    ast_nodes.OperatorNode,
+    ast_nodes.RangeOperatorNode,
+    ast_nodes.FunctionNode,
+)
+NODE_KINDS = {cls: kind for kind, cls in enumerate(NODE_CLASSES)}
+
+# Tags of cell values marshal cannot store as they are.
+DATETIME = 'datetime'
+XLTYPE = 'xltype'
+PICKLE = 'pickle'
+
+# Kinds of the objects of `Model.formulae` and `Model.defined_names`.
+CELL = 0
+RANGE = 1
+FORMULA = 2
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+class _Writer:
+
+    def __init__(self, include_ast):
+        self.include_ast = include_ast
+        self.constants = []
+        self.constant_ids = {}
+        self.formulas = []
+        self.formula_ids = {}
+        self.ranges = []
+        self.range_ids = {}
+        self.nodes = []
+        self.node_ids = {}
+
+    def const(self, value):
+        if value is None:
+            return NONE
+        key = (type(value), value)
+        index = self.constant_ids.get(key)
+        if index is None:
+            index = self.constant_ids[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def consts(self, values):
+        return tuple(self.const(value) for value in values)
+
+    def formula(self, formula):
+        if formula is None:
+            return NONE
+        index = self.formula_ids.get(id(formula))
+        if index is not None:
+            return index
+        tokens = []
+        for token in formula.tokens:
+            tokens.extend((
+                self.const(token.tvalue), self.const(token.ttype),
+                self.const(token.tsubtype)))
+        ast = NONE
+        if self.include_ast and formula.ast is not None:
+            ast = self.node(formula.ast)
+        index = self.formula_ids[id(formula)] = len(self.formulas)
+        self.formulas.append((
+            self.const(formula.formula),
+            self.const(formula.sheet_name),
+            self.const(formula.reference),
+            formula.evaluate,
+            tuple(tokens),
+            self.consts(formula.terms),
+            self.consts(sorted(formula.associated_cells)),
+            ast,
+        ))
+        return index
+
+    def range(self, rng):
+        index = self.range_ids.get(id(rng))
+        if index is not None:
+            return index
+        bounds = None
+        if isinstance(rng.cells, utils.RangeCells):
+            # Full rows and columns keep None as max row or column.
+            cells = rng.cells
+            if cells.sheet == rng.sheet:
+                bounds = tuple(cells.bounds)
+        index = self.range_ids[id(rng)] = len(self.ranges)
+        self.ranges.append((
+            self.const(rng.address_str),
+            self.const(rng.name),
+            self.const(rng.sheet) if bounds else NONE,
+            bounds,
+        ))
+        return index
+
+    def entry(self, name, obj):
+        """A cell, range or formula of a model mapping."""
+        if isinstance(obj, xltypes.XLCell):
+            return (self.const(name), CELL, self.const(obj.address))
+        if isinstance(obj, xltypes.XLRange):
+            return (self.const(name), RANGE, self.range(obj))
+        if isinstance(obj, xltypes.XLFormula):
+            return (self.const(name), FORMULA, self.formula(obj))
+        raise ArtifactError(
+            f'Cannot store {name} of type {type(obj).__name__}')
+
+    def node(self, root):
+        """Add the nodes of an AST, children first."""
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in self.node_ids:
+                continue
+            children = node_children(node)
+            if not expanded:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False) for child in children
+                    if child is not None)
+                continue
+            kind = NODE_KINDS.get(type(node))
+            if kind is None:
+                raise ArtifactError(
+                    f'Cannot store AST nodes of type {type(node).__name__}')
+            extra = None
+            if isinstance(node, ast_nodes.RelativeRangeNode):
+                extra = (node.origin[0], node.origin[1],
+                         self.const(node.pattern))
+            self.node_ids[id(node)] = len(self.nodes)
+            self.nodes.append((
+                kind,
+                self.const(node.tvalue), self.const(node.ttype),
+                self.const(node.tsubtype),
+                tuple(
+                    NONE if child is None else self.node_ids[id(child)]
+                    for child in children),
+                extra,
+            ))
+        return self.node_ids[id(root)]
+
+
+def encode_value(value):
+    """A cell value as stored by `marshal`.
+
+    Evaluated cells hold `ExcelType` values; they are stored as their
+    native value, and cast back on load.
+    """
+    if value is None or type(value) in (bool, int, float, str):
+        return value
+    if type(value) is datetime.datetime:
+        return (DATETIME, value.isoformat())
+    if isinstance(value, func_xltypes.ExcelType) and \
+            func_xltypes.NATIVE_TO_XLTYPE.get(type(value.value)) \
+            is type(value):
+        return (XLTYPE, encode_value(value.value))
+    return (PICKLE, pickle.dumps(value))
+
+
+def decode_value(value):
+    if type(value) is tuple:
+        tag, payload = value
+        if tag == DATETIME:
+            return datetime.datetime.fromisoformat(payload)
+        if tag == XLTYPE:
+            value = decode_value(payload)
+            if value is None:
+                return func_xltypes.BLANK
+            return func_xltypes.ExcelType.cast_from_native(value)
+        return pickle.loads(payload)
+    return value
+
+
+def node_children(node):
+    if isinstance(node, ast_nodes.OperatorNode):
+        return (node.left, node.right)
+    if isinstance(node, ast_nodes.FunctionNode):
+        return tuple(node.args or ())
+    return ()
+
+
+def dump(model, fp, include_ast=True):
+    """Write `model` to the binary file `fp`.
+
+    The ASTs of the formulas are stored if `include_ast` is set and they
+    were built.
+    """
+    writer = _Writer(include_ast)
+    const = writer.const
+    cells = tuple(
+        (const(address), encode_value(cell.value),
+         writer.formula(cell.formula), writer.consts(cell.defined_names))
+        for address, cell in model.cells.items()
+    )
+    formulae = tuple(
+        writer.entry(key, formula) for key, formula in model.formulae.items())
+    ranges = tuple(
+        writer.entry(key, rng) for key, rng in model.ranges.items())
+    defined_names = tuple(
+        writer.entry(name, defn)
+        for name, defn in model.defined_names.items())
+
+    flags = FLAG_AST if writer.nodes else 0
+    body = marshal.dumps((
+        tuple(writer.constants),
+        tuple(writer.nodes),
+        tuple(writer.formulas),
+        tuple(writer.ranges),
+        cells,
+        formulae,
+        ranges,
+        defined_names,
+    ))
+    fp.write(HEADER.pack(MAGIC, VERSION, flags))
+    fp.write(zlib.compress(body))
+
+
+def decode_nodes(constants, node_table):
+    """The AST nodes of a node table, in order."""
+    nodes = []
+    for kind, tvalue, ttype, tsubtype, children, extra in node_table:
+        token = tokenizer.f_token(
+            constants[tvalue], constants[ttype], constants[tsubtype])
+        cls = NODE_CLASSES[kind]
+        if cls is ast_nodes.RelativeRangeNode:
+            node = cls(token, (extra[0], extra[1]), constants[extra[2]])
+        else:
+            node = cls(token)
+        children = [
+            None if child == NONE else nodes[child] for child in children]
+        if isinstance(node, ast_nodes.OperatorNode):
+            node.left, node.right = children
+        elif isinstance(node, ast_nodes.FunctionNode):
+            node.args = children
+        nodes.append(node)
+    return nodes
+
+
+def decode_formula(constants, record, get_ast):
+    """The `XLFormula` of a formula record; `get_ast` maps the AST index of
+    the record to its root node."""
+    (text, sheet_name, reference, evaluate, tokens, terms, associated_cells,
+     ast) = record
+    tokens = [
+        tokenizer.f_token(
+            constants[tokens[i]], constants[tokens[i + 1]],
+            constants[tokens[i + 2]])
+        for i in range(0, len(tokens), 3)
+    ]
+    formula = xltypes.XLFormula(
+        constants[text],
+        None if sheet_name == NONE else constants[sheet_name],
+        None if reference == NONE else constants[reference],
+        evaluate, tokens=tokens)
+    # The terms are kept as computed when the model was compiled.
+    formula.terms = [constants[term] for term in terms]
+    formula.associated_cells = {
+        constants[address] for address in associated_cells}
+    if ast != NONE:
+        formula.ast = get_ast(ast)
+    return formula
+
+
+def decode_range(constants, record, cells=None):
+    """The `XLRange` of a range record.
+
+    Ranges stored as bounds get the `cells` given, or cells built from the
+    bounds, without parsing the address.
+    """
+    address, name, sheet, bounds = record
+    name = None if name == NONE else constants[name]
+    if bounds is None:
+        return xltypes.XLRange(constants[address], name)
+    rng = xltypes.XLRange.__new__(xltypes.XLRange)
+    rng.address_str = constants[address]
+    rng.name = name
+    rng.sheet = constants[sheet]
+    rng.cells = cells if cells is not None \
+        else utils.RangeCells(rng.sheet, bounds)
+    rng.value = None
+    return rng
+
+
+def read_header(header, magic=MAGIC, version=VERSION):
+    """The flags of the header of an artifact (or `snapshot`)."""
+    if len(header) < HEADER.size or header[:len(magic)] != magic:
+        raise ArtifactError(f'Not a model {magic.decode()} file')
+    _, file_version, flags = HEADER.unpack_from(header)
+    if file_version > version:
+        raise ArtifactError(
+            f'Model file version {file_version} is not supported, the '
+            f'latest supported version is {version}')
+    return flags
+
+
+def load(fp, model):
+    """Read an artifact written by `dump()` from `fp` into `model`.
+
+    Returns whether the artifact has the ASTs of the formulas.
+    """
+    flags = read_header(fp.read(HEADER.size))
+
+    (constants, node_table, formula_table, range_table, cell_table,
+     formulae, ranges, defined_names) = marshal.loads(
+        zlib.decompress(fp.read()))
+
+    nodes = decode_nodes(constants, node_table)
+    formulas = [
+        decode_formula(constants, record, nodes.__getitem__)
+        for record in formula_table]
+    range_objects = [
+        decode_range(constants, record) for record in range_table]
+
+    model.cells = {}
+    for address, value, formula, names in cell_table:
+        cell = xltypes.XLCell(
+            constants[address], decode_value(value),
+            None if formula == NONE else formulas[formula])
+        cell.defined_names = [constants[name] for name in names]
+        model.cells[cell.address] = cell
+
+    objects = {
+        CELL: lambda index: model.cells[constants[index]],
+        RANGE: range_objects.__getitem__,
+        FORMULA: formulas.__getitem__,
+    }
+    model.formulae = {
+        constants[key]: objects[kind](index)
+        for key, kind, index in formulae}
+    model.ranges = {
+        constants[key]: objects[kind](index) for key, kind, index in ranges}
+    model.defined_names = {
+        constants[name]: objects[kind](index)
+        for name, kind, index in defined_names}
+
+    return bool(flags & FLAG_AST)
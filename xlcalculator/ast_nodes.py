@@ -1,4 +1,4 @@
-import inspect
+from openpyxl.utils.cell import column_index_from_string
 
 from xlcalculator.xlfunctions import (
     xl,
@@ -9,7 +9,7 @@ from xlcalculator.xlfunctions import (
     func_xltypes
 )
 
-from . import utils
+from . import addresses, spatial, utils
 
 PREFIX_OP_TO_FUNC = {
     '-': operator.OP_NEG,
@@ -34,7 +34,8 @@ INFIX_OP_TO_FUNC = {
     "<=": operator.OP_LE,
 }
 
-MAX_EMPTY = 100
+# Functions returning a reference, which can be operands of ":".
+REFERENCE_FUNCTIONS = ('OFFSET', 'INDEX', 'INDIRECT')
 
 
 class EvalContext:
@@ -46,6 +47,8 @@ class EvalContext:
     ref = None
     refsheet = None
     sheet = None
+    # Optional `spatial.SpatialIndex` of the cells.
+    spatial_index = None
 
     def __init__(self, namespace=None, ref=None, seen=None):
         self.seen = seen if seen is not None else []
@@ -56,6 +59,50 @@ class EvalContext:
     def eval_cell(self, addr):
         raise NotImplementedError()
 
+    def eval_range(self, addr):
+        """Evaluate all cells of the range at `addr` into an `Array`.
+
+        Ranges that are not in the model, e.g. built by the ":" operator,
+        are resolved from their address. Cells that are not in the model
+        are blank; they are not evaluated. With a `spatial_index`, only
+        the cells within the range are visited. Full rows and columns end
+        with the used range of the sheet at the time they are read.
+        """
+        rng = self.ranges.get(addr)
+        rows = rng.cells if rng is not None \
+            else utils.resolve_ranges(addr)[1]
+        cells = self.cells if self.cells is not None else {}
+        index = self.spatial_index
+        if isinstance(rows, utils.RangeCells):
+            if index is None and None in rows.bounds:
+                # Without an index, find the used range of the cells.
+                index = spatial.SpatialIndex(cells)
+            if index is not None:
+                rows = rows.clip(*index.used_bounds(rows.sheet))
+        if index is not None and isinstance(rows, utils.RangeCells):
+            range_cells = self._eval_indexed_range(rows, index)
+        else:
+            range_cells = [
+                [
+                    self.eval_cell(col_addr) if col_addr in cells
+                    else func_xltypes.BLANK
+                    for col_addr in range_row
+                ]
+                for range_row in rows
+            ]
+        data = func_xltypes.Array(range_cells)
+        if rng is not None:
+            rng.value = data
+        return data
+
+    def _eval_indexed_range(self, rows, index):
+        blank_row = [func_xltypes.BLANK] * (rows.max_col - rows.min_col + 1)
+        range_cells = [blank_row.copy() for _ in range(len(rows))]
+        for row, col, col_addr in index.cells_within(rows.sheet, rows.bounds):
+            range_cells[row - rows.min_row][col - rows.min_col] = \
+                self.eval_cell(col_addr)
+        return range_cells
+
     def set_sheet(self, sheet=None):
         if sheet is None:
             self.sheet = self.refsheet
@@ -87,6 +134,15 @@ class ASTNode(object):
     def eval(self, context):
         raise NotImplementedError(f'`eval()` of {self}')
 
+    def compile(self):
+        """Compile the node into a callable taking the evaluation context.
+
+        Nodes that can resolve part of their work up front (constants,
+        operator and function lookups, argument binding) return a closure;
+        all others fall back to `eval()`.
+        """
+        return self.eval
+
     def __repr__(self):
         return (
             f"<{self.__class__.__name__} "
@@ -119,6 +175,16 @@ class OperandNode(ASTNode):
         else:
             return func_xltypes.Number.cast(self.tvalue)
 
+    def compile(self):
+        if self.tsubtype == 'error':
+            # Errors mention the cell they occur in.
+            return self.eval
+        try:
+            value = self.eval(None)
+        except xlerrors.ExcelError:
+            return self.eval
+        return lambda context: value
+
     def __str__(self):
         if self.tsubtype == "logical":
             return self.tvalue.title()
@@ -130,6 +196,12 @@ class OperandNode(ASTNode):
 class RangeNode(OperandNode):
     """Represents a spreadsheet cell, range, named_range."""
 
+    def __init__(self, token):
+        super().__init__(token)
+        # Full addresses by sheet, so that evaluations look up the same
+        # address strings, whose hash is computed once.
+        self.full_addresses = {}
+
     def get_cells(self):
         cells = utils.resolve_ranges(self.tvalue, default_sheet='')[1]
         return cells[0] if len(cells) == 1 else cells
@@ -152,41 +224,75 @@ class RangeNode(OperandNode):
                     addr = f"{addr_first[0]}!{addr_first[1]}:{addr_last[1]}" 
                 # print(addr)
             else:
-                addr = f'{context.sheet}!{addr}'
+                sheet = context.sheet
+                full_address = self.full_addresses.get(sheet)
+                if full_address is None:
+                    full_address = self.full_addresses[sheet] = \
+                        f'{sheet}!{addr}'
+                addr = full_address
         return addr
 
+    def reference(self, context):
+        """The full address of the cell or range."""
+        return self.full_address(context)
+
     def eval(self, context):
-        addr = self.full_address(context)
+        return self.eval_address(self.reference(context), context)
+
+    def compile(self):
+        addr = self.address
+        if not isinstance(addr, str) or '!' not in addr:
+            # The address depends on the sheet of the context.
+            return self.eval
+        eval_address = self.eval_address
+        return lambda context: eval_address(addr, context)
+
+    def eval_address(self, addr, context):
         if addr in context.ranges:
-            empty_row = 0
-            empty_col = 0
-            range_cells = []
-            for range_row in context.ranges[addr].cells:
-                row_cells = []
-                for col_addr in range_row:
-                    cell = context.eval_cell(col_addr)
-                    if cell.value == '' or cell.value is None:
-                        empty_col += 1
-                        if empty_col > MAX_EMPTY:
-                            break
-                    else:
-                        empty_col = 0
-                    row_cells.append(cell)
-                if not row_cells:
-                    empty_row += 1
-                    if empty_row > MAX_EMPTY:
-                        break
-                else:
-                    empty_row = 0
-                range_cells.append(row_cells)
-            context.ranges[addr].value = data = func_xltypes.Array(range_cells)
-            return data
+            return context.eval_range(addr)
 
         value = context.eval_cell(addr)
         context.set_sheet()
         return value
 
 
+class RelativeRangeNode(RangeNode):
+    """A range node of a formula shared by several cells.
+
+    The `pattern` is the address as written in the formula of the cell at
+    `origin` (row, column), with "$" marking absolute parts. It is moved to
+    the cell being evaluated (`context.ref`).
+    """
+
+    def __init__(self, token, origin, pattern):
+        super().__init__(token)
+        self.origin = origin
+        self.pattern = pattern
+        # The offsets of the relative parts from `origin`, so that binding
+        # does not parse the pattern again.
+        self.parts = utils.reference_parts(pattern, *origin)
+        self.has_sheet = '!' in pattern
+
+    def bind(self, ref):
+        """The address referenced from the cell at `ref`."""
+        _, col, row = addresses.split_address(ref)
+        return utils.bind_references(
+            self.parts, row, column_index_from_string(col))
+
+    def reference(self, context):
+        # Bound addresses are not kept: the node is shared by all cells of
+        # the shape, which would make the node grow with the shape.
+        addr = self.bind(context.ref)
+        if not self.has_sheet:
+            addr = f'{context.sheet}!{addr}'
+        return addr
+
+    def compile(self):
+        reference = self.reference
+        eval_address = self.eval_address
+        return lambda context: eval_address(reference(context), context)
+
+
 class OperatorNode(ASTNode):
 
     def __init__(self, token):
@@ -213,6 +319,25 @@ class OperatorNode(ASTNode):
         else:
             raise ValueError(f'Invalid operator type: {self.ttype}')
 
+    def compile(self):
+        if self.ttype == 'operator-prefix':
+            op = PREFIX_OP_TO_FUNC[self.tvalue]
+            right = self.right.compile()
+            return lambda context: op(right(context))
+
+        elif self.ttype == 'operator-infix':
+            op = INFIX_OP_TO_FUNC[self.tvalue]
+            left = self.left.compile()
+            right = self.right.compile()
+            return lambda context: op(left(context), right(context))
+
+        elif self.ttype == 'operator-postfix':
+            op = POSTFIX_OP_TO_FUNC[self.tvalue]
+            left = self.left.compile()
+            return lambda context: op(left(context))
+
+        return self.eval
+
     def __str__(self):
         left = f'({self.left}) ' if self.left is not None else ''
         right = f' ({self.right})' if self.right is not None else ''
@@ -225,6 +350,37 @@ class OperatorNode(ASTNode):
         yield self
 
 
+class RangeOperatorNode(OperatorNode):
+    """The ":" operator, joining two references into the range spanning
+    both.
+
+    Operands are cells, ranges, other range operators or the functions of
+    `REFERENCE_FUNCTIONS`, e.g. ``A1:INDEX(B1:B9, 3)``.
+    """
+
+    def reference(self, context):
+        return utils.join_references(
+            node_reference(self.left, context),
+            node_reference(self.right, context))
+
+    def eval(self, context):
+        try:
+            addr = self.reference(context)
+        except ValueError as err:
+            return xlerrors.RefExcelError(str(err))
+        if ':' in addr:
+            return context.eval_range(addr)
+        value = context.eval_cell(addr)
+        context.set_sheet()
+        return value
+
+    def compile(self):
+        return self.eval
+
+    def __str__(self):
+        return f'{self.left}:{self.right}'
+
+
 class FunctionNode(ASTNode):
     """AST node representing a function call"""
 
@@ -237,45 +393,65 @@ class FunctionNode(ASTNode):
         # 1. Remove the BBB namespace, since we are just supporting
         #    everything in one large one.
         func_name = func_name.replace('_XLFN.', '')
-        if func_name == "SUM":
-            s = 1
-        if func_name == "INDIRECT":
-            print(f"INDIRECT function called with: {self.args}")
         # 2. Look up the function to use.
         # TODO - this is another place to raise an error if function does not exist.
         func = context.namespace[func_name]
         # 3. Prepare arguments.
-        sig = inspect.signature(func)
-        bound = sig.bind(*self.args)
-        args = []
-        for pname, pvalue in list(bound.arguments.items()):
-
-            # if pname == 'table_array':          # TEMP
-            #     print(f"pvalue:\n{pvalue}")     # TEMP
-
-            param = sig.parameters[pname]
-            ptype = param.annotation
-            if ptype == func_xltypes.XlExpr:
-                args.append(func_xltypes.Expr(
-                    pvalue.eval, (context,), ref=context.ref, ast=pvalue
-                ))
-            elif (param.kind == param.VAR_POSITIONAL
-                  and func_xltypes.XlExpr in getattr(ptype, '__args__', [])):
-                args.extend([
-                    func_xltypes.Expr(
-                        pitem.eval, (context,), ref=context.ref, ast=pitem
-                    )
-                    for pitem in pvalue
-                ])
-            elif (param.kind == param.VAR_POSITIONAL):
-                args.extend([
-                    pitem.eval(context) for pitem in pvalue
-                ])
-            else:
-                args.append(pvalue.eval(context))
+        lazy = xl.get_signature(func).lazy_arguments(len(self.args))
+        args = [
+            func_xltypes.Expr(
+                pvalue.eval, (context,), ref=context.ref, ast=pvalue)
+            if is_lazy else pvalue.eval(context)
+            for pvalue, is_lazy in zip(self.args, lazy)
+        ]
         # 4. Run function and return result.
         return func(*args)
 
+    def compile(self):
+        func_name = self.tvalue.upper().replace('_XLFN.', '')
+        func = xl.FUNCTIONS.get(func_name)
+        if func is None:
+            # Unknown functions are reported when evaluated.
+            return self.eval
+
+        try:
+            lazy = xl.get_signature(func).lazy_arguments(len(self.args))
+        except TypeError:
+            return self.eval
+
+        # Bind every argument node to a callable producing the argument
+        # value, so that no signature inspection happens at runtime.
+        arg_funcs = [
+            _compile_expr(pvalue) if is_lazy else pvalue.compile()
+            for pvalue, is_lazy in zip(self.args, lazy)
+        ]
+
+        fallback = self.eval
+
+        def call(context):
+            if context.namespace.get(func_name) is not func:
+                # The evaluator uses a different implementation.
+                return fallback(context)
+            return func(*[arg_func(context) for arg_func in arg_funcs])
+
+        return call
+
+    def reference(self, context):
+        """The reference returned by a function of `REFERENCE_FUNCTIONS`."""
+        func_name = self.tvalue.upper().replace('_XLFN.', '')
+        if func_name not in REFERENCE_FUNCTIONS:
+            raise ValueError(f'{self.tvalue}() does not return a reference')
+        if func_name == 'INDIRECT':
+            addr = str(self.args[0].eval(context)).replace('$', '')
+            if '!' not in addr:
+                addr = f'{context.sheet}!{addr}'
+            return addr
+        numbers = [int(arg.eval(context)) for arg in self.args[1:]]
+        addr = node_reference(self.args[0], context)
+        if func_name == 'OFFSET':
+            return utils.offset_reference(addr, *numbers)
+        return utils.index_reference(addr, *numbers)
+
     def __str__(self):
         args = ', '.join(str(arg) for arg in self.args)
         return f'{self.tvalue}({args})'
@@ -285,3 +461,21 @@ class FunctionNode(ASTNode):
         for arg in self.args:
             yield arg
         yield self
+
+
+def node_reference(node, context):
+    """The address `node` refers to, for the ":" operator."""
+    reference = getattr(node, 'reference', None)
+    if reference is None:
+        raise ValueError(f'{node} is not a reference')
+    return reference(context)
+
+
+def _compile_expr(node):
+    """Compile a lazily evaluated argument into an `Expr` factory."""
+    code = node.compile()
+
+    def expr(context):
+        return func_xltypes.Expr(code, (context,), ref=context.ref, ast=node)
+
+    return expr
@@ -0,0 +1,184 @@
+"""Compact store of the cells of a model.
+
+`CellStore` is a mapping of cell addresses to cells, like `Model.cells`, that
+keeps the cells as columns instead of `XLCell` objects: cells are keyed by
+an integer packing their sheet id, row and column (see `addresses`), their
+values are kept in a list and their formulas and defined names, which most
+cells do not have, in dicts by cell index. `XLCell` views of the cells are
+only created when they are read, and write through to the store.
+"""
+import collections.abc
+import copy
+
+from openpyxl.utils.cell import get_column_letter
+
+from . import addresses, xltypes
+
+
+class _DefinedNames(list):
+    """The defined names of a cell that has none yet.
+
+    The list is only added to the store once a name is appended.
+    """
+
+    def __init__(self, store, index):
+        super().__init__()
+        self.store = store
+        self.index = index
+
+    def append(self, name):
+        self.store.defined_names[self.index] = self
+        super().append(name)
+
+    def extend(self, names):
+        self.store.defined_names[self.index] = self
+        super().extend(names)
+
+
+class CellView(xltypes.XLCell):
+    """An `XLCell` reading and writing a cell of a `CellStore`.
+
+    Copies of a view are plain `XLCell`s, detached from the store.
+    """
+
+    def __init__(self, store, key, index):
+        self.__dict__.update(store=store, key=key, index=index)
+
+    @property
+    def address(self):
+        return self.store.codec.decode(self.key)
+
+    @property
+    def sheet(self):
+        return self.store.codec.sheets[addresses.unpack(self.key)[0]]
+
+    @property
+    def row_index(self):
+        return addresses.unpack(self.key)[1]
+
+    @property
+    def row(self):
+        return str(self.row_index)
+
+    @property
+    def column_index(self):
+        return addresses.unpack(self.key)[2]
+
+    @property
+    def column(self):
+        return get_column_letter(self.column_index)
+
+    @property
+    def value(self):
+        return self.store.values[self.index]
+
+    @value.setter
+    def value(self, value):
+        self.store.values[self.index] = value
+
+    @property
+    def formula(self):
+        return self.store.formulas.get(self.index)
+
+    @formula.setter
+    def formula(self, formula):
+        self.store._set(self.store.formulas, self.index, formula)
+
+    @property
+    def defined_names(self):
+        defined_names = self.store.defined_names.get(self.index)
+        if defined_names is None:
+            return _DefinedNames(self.store, self.index)
+        return defined_names
+
+    @defined_names.setter
+    def defined_names(self, defined_names):
+        self.store._set(self.store.defined_names, self.index, defined_names)
+
+    def detach(self):
+        """A plain `XLCell` copy of the cell."""
+        cell = xltypes.XLCell(self.address, self.value, self.formula)
+        cell.defined_names = list(self.defined_names)
+        return cell
+
+    def __eq__(self, other):
+        if not isinstance(other, xltypes.XLCell):
+            return NotImplemented
+        return (self.sheet, self.row_index, self.column_index) == \
+            (other.sheet, other.row_index, other.column_index)
+
+    __hash__ = xltypes.XLCell.__hash__
+
+    def __copy__(self):
+        return self.detach()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.detach(), memo)
+
+    def __reduce__(self):
+        return copy.copy, (self.detach(),)
+
+
+class CellStore(collections.abc.MutableMapping):
+    """The cells of a model, by address, in a compact form.
+
+    Any mapping of addresses to `XLCell`s can be given to fill the store.
+    Cells set in the store are copied into it.
+    """
+
+    def __init__(self, cells=None):
+        self.codec = addresses.AddressCodec()
+        # Cell indexes by key.
+        self.index = {}
+        # Cell values by index.
+        self.values = []
+        # Formulas and defined names of the cells that have them, by index.
+        self.formulas = {}
+        self.defined_names = {}
+        if cells is not None:
+            self.update(cells)
+
+    def _set(self, column, index, value):
+        if value:
+            column[index] = value
+        else:
+            column.pop(index, None)
+
+    def __getitem__(self, address):
+        key = self.codec.encode(address)
+        return CellView(self, key, self.index[key])
+
+    def __setitem__(self, address, cell):
+        try:
+            key = self.codec.encode(address, add=True)
+        except KeyError:
+            raise ValueError(f'{address} is not a cell address')
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = len(self.values)
+            self.values.append(None)
+        self.values[index] = cell.value
+        self._set(self.formulas, index, cell.formula)
+        self._set(self.defined_names, index, cell.defined_names)
+
+    def __delitem__(self, address):
+        index = self.index.pop(self.codec.encode(address))
+        # The slot of the cell is left unused.
+        self.values[index] = None
+        self.formulas.pop(index, None)
+        self.defined_names.pop(index, None)
+
+    def __contains__(self, address):
+        try:
+            return self.codec.encode(address) in self.index
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return map(self.codec.decode, self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({len(self)} cells)'
@@ -0,0 +1,125 @@
+"""On-disk cache of compiled models.
+
+`ModelCompiler.read_and_parse_archive()` stores the models it compiles in a
+`CompileCache` directory when one is given, as artifacts (see `artifact`),
+and reuses them for the same workbook and compile options, even in other
+processes.
+"""
+import hashlib
+import importlib.metadata
+import logging
+import os
+import tempfile
+import zlib
+
+from . import artifact
+
+SUFFIX = '.xlca'
+CHUNK_SIZE = 1 << 20
+
+try:
+    LIBRARY_VERSION = importlib.metadata.version('xlcalculator')
+except importlib.metadata.PackageNotFoundError:
+    LIBRARY_VERSION = None
+
+
+def file_digest(file_name):
+    """The SHA-256 hex digest of the content of a file."""
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """A directory of compiled models.
+
+    Models are keyed by the content of the workbook, the library and
+    artifact format versions and the compile options. When the entries take
+    more than `max_size` bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, directory, max_size=1 << 30):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file_name, **options):
+        """The key of the model compiled from `file_name` with `options`."""
+        digest = hashlib.sha256()
+        digest.update(file_digest(file_name).encode())
+        digest.update(repr(
+            (LIBRARY_VERSION, artifact.VERSION, sorted(options.items()))
+        ).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key, model):
+        """Load the model cached under `key` into `model`.
+
+        Returns whether it was cached. Unreadable entries are removed.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fp:
+                artifact.load(fp, model)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        except (OSError, ValueError, EOFError, zlib.error) as err:
+            logging.warning(f'Removing unreadable cached model {path}: {err}')
+            self._remove(path)
+            self.misses += 1
+            return False
+        # The modification time orders entries for eviction.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        model.build_dependency_graph()
+        self.hits += 1
+        return True
+
+    def store(self, key, model):
+        """Cache `model` under `key`, then evict old entries."""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.directory, suffix=SUFFIX + '.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                artifact.dump(model, fp)
+            # Readers in other processes never see a partial entry.
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries above `max_size`."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= entry_size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,16 +1,17 @@
+import collections
 import sys
+import time
 from functools import lru_cache
 
 from xlcalculator.xlfunctions import xl, func_xltypes
 
-from . import ast_nodes, xltypes
-import traceback
+from . import ast_nodes, tracing, utils, xltypes
 
 
 class EvaluatorContext(ast_nodes.EvalContext):
 
     def __init__(self, evaluator, ref):
-        super().__init__(evaluator.namespace, ref)
+        super().__init__(evaluator._get_namespace(), ref)
         self.evaluator = evaluator
 
     @property
@@ -21,6 +22,10 @@ class EvaluatorContext(ast_nodes.EvalContext):
     def ranges(self):
         return self.evaluator.model.ranges
 
+    @property
+    def spatial_index(self):
+        return self.evaluator.model.get_spatial_index()
+
     @lru_cache(maxsize=None)
     def eval_cell(self, addr):
         # Check for a cycle.
@@ -28,22 +33,67 @@ class EvaluatorContext(ast_nodes.EvalContext):
             raise RuntimeError(
                 f'Cycle detected for {addr}:\n- ' + '\n- '.join(self.seen))
         self.seen.append(addr)
+        # Remember that the cell being evaluated depends on `addr`, so that
+        # a change of `addr` invalidates the cached value of this cell.
+        self.evaluator.dependents[addr].add(self.ref)
 
         return self.evaluator.evaluate(addr, None)
 
+    def eval_range(self, addr):
+        self.evaluator.dependents[addr].add(self.ref)
+        return self.evaluator.evaluate_range(addr)
+
 
 class Evaluator:
-    """Traverses and evaluates a given model."""
+    """Traverses and evaluates a given model.
+
+    Evaluated values are cached across calls to `evaluate()`. When a cell is
+    changed through `set_cell_value()` (on the evaluator or the model), only
+    the cells depending on it are dropped from the cache. Changes made by
+    assigning to `XLCell.value` directly are not tracked; call `invalidate()`
+    in that case.
+
+    Ranges are cached the same way: the `Array` a range evaluates to is
+    reused by all formulas referencing the range, until one of its cells
+    changes. Blank cells of ranges, which are not in the model, are not
+    evaluated; a cached range is dropped when any cell within its bounds
+    changes.
+
+    Evaluations, cache hits, errors and function calls are reported to
+    `tracer` (by default the shared, initially disabled `tracing.tracer`).
+    """
 
-    def __init__(self, model, namespace=None):
+    def __init__(self, model, namespace=None, tracer=None):
         self.model = model
         self.namespace = namespace \
             if namespace is not None else xl.FUNCTIONS.copy()
+        self.tracer = tracer if tracer is not None else tracing.tracer
+        # The namespace with timed functions, for the tracer and namespace
+        # it was built for.
+        self._timed_namespace = (None, None, None)
         self.cache_count = 0
+        # Cached cell values by address.
+        self.values = {}
+        # Cached range values by range address.
+        self.range_values = {}
+        # Cells (by address) that were seen reading a given address.
+        self.dependents = collections.defaultdict(set)
+        # The sheet and bounds of cached ranges, by range address.
+        self.range_bounds = {}
+        self.model_version = model.version
 
     def _get_context(self, ref):
         return EvaluatorContext(self, ref)
 
+    def _get_namespace(self):
+        if not self.tracer.enabled:
+            return self.namespace
+        tracer, namespace, timed = self._timed_namespace
+        if tracer is not self.tracer or namespace is not self.namespace:
+            timed = self.tracer.timed_namespace(self.namespace)
+            self._timed_namespace = (self.tracer, self.namespace, timed)
+        return timed
+
     def resolve_names(self, addr):
         # Although defined names have been resolved in Model.create_node()
         # we need to attempt to resolve defined names as we might have been
@@ -67,51 +117,183 @@ class Evaluator:
                 f"formula and they aren't supported as a cell "
                 f"reference.")
 
+    def invalidate(self, addresses=None):
+        """Drop cached values of `addresses` and all their dependents.
+
+        If no addresses are given, the entire cache is cleared. The spatial
+        index of the model is updated for the cells too, in case they were
+        added to or removed from the model directly.
+        """
+        if addresses is None:
+            self.values.clear()
+            self.range_values.clear()
+            self.dependents.clear()
+            self.model.reindex_cells()
+            return
+
+        addresses = list(addresses)
+        self.model.reindex_cells(addresses)
+        stack = list(addresses)
+        stack.extend(self._ranges_containing(addresses))
+        seen = set()
+        while stack:
+            addr = stack.pop()
+            if addr in seen:
+                continue
+            seen.add(addr)
+            self.values.pop(addr, None)
+            self.range_values.pop(addr, None)
+            stack.extend(self.dependents.pop(addr, ()))
+
+    def _ranges_containing(self, addresses):
+        """The cached ranges containing any of the cells at `addresses`."""
+        positions = []
+        for addr in addresses:
+            try:
+                row, col = utils.cell_position(addr)
+            except (KeyError, TypeError, ValueError):
+                continue
+            positions.append(
+                (utils.resolve_sheet(addr.rpartition('!')[0]), row, col))
+        if not positions:
+            return []
+
+        ranges = []
+        for range_addr in self.range_values:
+            bounds = self.range_bounds.get(range_addr)
+            if bounds is None:
+                bounds = self._range_bounds(range_addr)
+                if bounds is None:
+                    continue
+                self.range_bounds[range_addr] = bounds
+            sheet, (min_row, min_col, max_row, max_col) = bounds
+            if any(
+                    cell_sheet == sheet and min_row <= row <= max_row
+                    and min_col <= col <= max_col
+                    for cell_sheet, row, col in positions):
+                ranges.append(range_addr)
+        return ranges
+
+    def _range_bounds(self, range_addr):
+        """The sheet and bounds of a range. Full rows and columns extend to
+        the end of the sheet, so they contain every cell of it they span."""
+        rng = self.model.ranges.get(range_addr)
+        if rng is not None and isinstance(rng.cells, utils.RangeCells):
+            cells = rng.cells
+            return cells.sheet, (
+                cells.min_row, cells.min_col, cells.max_row, cells.max_col)
+        try:
+            return utils.range_bounds(range_addr)
+        except (TypeError, ValueError):
+            return None
+
+    def _sync_model_changes(self):
+        if self.model_version == self.model.version:
+            return
+        self.invalidate(self.model.changes_since(self.model_version))
+        self.model_version = self.model.version
+
     def evaluate(self, addr, context=None):
         # 1. Resolve the address to a cell.
         addr = self.resolve_names(addr)
 
+        self._sync_model_changes()
+        if addr in self.values:
+            self.cache_count += 1
+            if self.tracer.enabled:
+                self.tracer.emit('cache-hit', addr)
+            return self.values[addr]
+
         if addr not in self.model.cells:
             # Blank cell that has no stored value in the model.
+            self.values[addr] = func_xltypes.BLANK
             return func_xltypes.BLANK
         cell = self.model.cells[addr]
 
         # 2. If there is no formula, we simply return the cell value.
         if (cell.formula is None or cell.formula.evaluate is False):
-            return func_xltypes.ExcelType.cast_from_native(
+            value = func_xltypes.ExcelType.cast_from_native(
                 self.model.cells[addr].value)
+            self.values[addr] = value
+            return value
 
         # 3. Prepare the execution environment and evaluate the formula.
         #    (Note: Range nodes will automatically evaluate all their
         #           dependencies.)
         context = context if context is not None else self._get_context(addr)
+        tracer = self.tracer
+        start = time.perf_counter() if tracer.enabled else None
         try:
 
-            value = cell.formula.ast.eval(context)
-            # print(f"{addr} <= {value}") # TEMP
+            if cell.formula.code is not None:
+                value = cell.formula.code(context)
+            else:
+                value = cell.formula.ast.eval(context)
         except Exception as err:
             # Joel 2024-06-03
             # raise RuntimeError(
             #     f"Problem evaluating cell {addr} formula "
             #     f"{cell.formula.formula}: {repr(err)}"
             # ).with_traceback(sys.exc_info()[2])
-            print(f"Problem evaluating cell {addr} formula "
-                f"{cell.formula.formula}: {repr(err)}")
-            traceback.print_exc()
+            if tracer.enabled:
+                tracer.emit(
+                    'error', addr, formula=cell.formula.formula, error=err)
             raise RuntimeError(
-                f"ERROR: Problem evaluating cell {addr} formula {cell.formula.formula}")
-            
+                f"ERROR: Problem evaluating cell {addr} formula "
+                f"{cell.formula.formula}: {repr(err)}") from err
 
         # 4. Update the cell value.
         #    Note for later: If an array is returned, we should distribute the
-        #    values to the respective cell (known as spilling). 
+        #    values to the respective cell (known as spilling).
         # TODO - Add spilling.
         cell.value = value
-        print(f"{addr} => {cell.value}") #TEMP
+        if start is not None:
+            tracer.emit(
+                'evaluate', addr, value=value,
+                duration=time.perf_counter() - start)
         cell.need_update = False
+        self.values[addr] = value
 
         return value
 
+    def evaluate_range(self, addr):
+        """Evaluate the cells of the range at `addr` into an `Array`."""
+        self._sync_model_changes()
+        if addr in self.range_values:
+            self.cache_count += 1
+            if self.tracer.enabled:
+                self.tracer.emit('cache-hit', addr)
+            return self.range_values[addr]
+
+        # The range is evaluated in a context of its own, so that its cells
+        # are recorded as precedents of the range rather than of the formula
+        # referencing it.
+        context = self._get_context(addr)
+        value = ast_nodes.EvalContext.eval_range(context, addr)
+        self.range_values[addr] = value
+        return value
+
+    def recalculate(self, targets):
+        """Evaluates the given cells without recursing through references.
+
+        The targets and their precedents are sorted topologically using the
+        model's dependency graph and evaluated in that order, so that every
+        reference is already cached when a formula reads it. Cycles are
+        reported before anything is evaluated. Blank cells of ranges, which
+        are not in the model, are skipped.
+
+        Returns the number of cells that had to be evaluated.
+        """
+        self._sync_model_changes()
+        targets = [self.resolve_names(addr) for addr in targets]
+        order = self.model.dependency_graph.topological_order(targets)
+
+        cached = len(self.values)
+        for addr in order:
+            if addr not in self.values and addr in self.model.cells:
+                self.evaluate(addr)
+        return len(self.values) - cached
+
     def set_cell_value(self, address, value):
         """Sets the value of a cell in the model."""
         self.model.set_cell_value(address, value)
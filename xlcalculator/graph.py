@@ -0,0 +1,90 @@
+import collections
+
+
+class DependencyGraph:
+    """Forward and reverse adjacency index over cell addresses.
+
+    `precedents` maps the address of every formula cell to the set of
+    addresses it reads directly (ranges and defined names expanded).
+    `dependents` is the inverse of that mapping.
+    """
+
+    def __init__(self):
+        self.precedents = {}
+        self.dependents = collections.defaultdict(set)
+
+    def __contains__(self, address):
+        return address in self.precedents or address in self.dependents
+
+    def __len__(self):
+        return len(self.precedents)
+
+    def add(self, address, precedents):
+        """Set the direct precedents of the cell at `address`."""
+        self.remove(address)
+        precedents = set(precedents)
+        self.precedents[address] = precedents
+        for precedent in precedents:
+            self.dependents[precedent].add(address)
+
+    def remove(self, address):
+        """Forget about the precedents of the cell at `address`."""
+        for precedent in self.precedents.pop(address, ()):
+            dependents = self.dependents[precedent]
+            dependents.discard(address)
+            if not dependents:
+                del self.dependents[precedent]
+
+    def _closure(self, adjacency, addresses):
+        closure = set()
+        stack = list(addresses)
+        while stack:
+            for address in adjacency.get(stack.pop(), ()):
+                if address not in closure:
+                    closure.add(address)
+                    stack.append(address)
+        return closure
+
+    def transitive_precedents(self, addresses):
+        """All cells the given cells depend on, directly or indirectly."""
+        return self._closure(self.precedents, addresses)
+
+    def transitive_dependents(self, addresses):
+        """All cells depending on the given cells, directly or indirectly."""
+        return self._closure(self.dependents, addresses)
+
+    def topological_order(self, addresses):
+        """Order the given cells and all their precedents, precedents first.
+
+        Raises a `RuntimeError` if the cells are part of a reference cycle.
+        """
+        order = []
+        done = set()
+        for root in addresses:
+            if root in done:
+                continue
+            # Depth-first search with an explicit stack, so that long chains
+            # of references do not hit the recursion limit.
+            path = [root]
+            on_path = {root}
+            stack = [iter(self.precedents.get(root, ()))]
+            while stack:
+                for precedent in stack[-1]:
+                    if precedent in done:
+                        continue
+                    if precedent in on_path:
+                        cycle = path[path.index(precedent):] + [precedent]
+                        raise RuntimeError(
+                            f'Cycle detected for {precedent}:\n- '
+                            + '\n- '.join(cycle))
+                    path.append(precedent)
+                    on_path.add(precedent)
+                    stack.append(iter(self.precedents.get(precedent, ())))
+                    break
+                else:
+                    stack.pop()
+                    address = path.pop()
+                    on_path.discard(address)
+                    done.add(address)
+                    order.append(address)
+        return order
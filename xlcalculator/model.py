@@ -3,9 +3,12 @@ import gzip
 import jsonpickle # TEMP - comment out for production
 import logging
 import os
+import threading
 from dataclasses import dataclass, field
 
-from . import xltypes, reader, parser, tokenizer
+from . import (
+    artifact, cellstore, compile_cache, graph, shapes, snapshot, spatial,
+    tracing, utils, xltypes, reader, tokenizer)
 
 
 @dataclass
@@ -19,13 +22,24 @@ class Model():
         init=False, default_factory=dict, compare=True, hash=True, repr=True)
     defined_names: dict = field(
         init=False, default_factory=dict, compare=True, hash=True, repr=True)
+    # Change journal used by evaluators to invalidate their value caches. It
+    # maps each changed address to the version at which it last changed.
+    version: int = field(init=False, default=0, compare=False, repr=False)
+    changes: dict = field(
+        init=False, default_factory=dict, compare=False, repr=False)
+    dependency_graph: graph.DependencyGraph = field(
+        init=False, default_factory=graph.DependencyGraph, compare=False,
+        repr=False)
+    # Built on first use, see `get_spatial_index()`.
+    spatial_index: spatial.SpatialIndex = field(
+        init=False, default=None, compare=False, repr=False)
 
     def set_cell_value(self, address, value):
         """Sets a new value for a specified cell."""
-        print(f"set_cell_value  address: {address} value: {value}")
+        if tracing.tracer.enabled:
+            tracing.tracer.emit('set-cell-value', str(address), value=value)
 
         if address in self.defined_names:
-            print("Address is a defined name")
             if isinstance(self.defined_names[address], xltypes.XLCell):
                 address = self.defined_names[address].address
 
@@ -34,13 +48,15 @@ class Model():
                 self.cells[address].value = copy.copy(value)
             else:
                 self.cells[address] = xltypes.XLCell(address, copy.copy(value))
+                self._index_cell(address)
 
         elif isinstance(address, xltypes.XLCell):
-            if address.address in self.cells:
-                self.cells[address.address].value = value
+            address = address.address
+            if address in self.cells:
+                self.cells[address].value = value
             else:
-                self.cells[address.address] = xltypes.XLCell
-                (address.address, value)
+                self.cells[address] = xltypes.XLCell(address, value)
+                self._index_cell(address)
 
         else:
             raise TypeError(
@@ -48,11 +64,64 @@ class Model():
                 f"{address}. XLCell or a string is needed."
             )
 
+        self.version += 1
+        self.changes[address] = self.version
+
+    def get_spatial_index(self):
+        """The `spatial.SpatialIndex` of the cells, built on first use.
+
+        Cells added by `set_cell_value()` are added to the index; it is
+        built again when `cells` is replaced. Cells added to or removed from
+        `cells` directly are not tracked, see `reindex_cells()`.
+        """
+        index = self.spatial_index
+        if index is None or index.cells is not self.cells:
+            index = self.spatial_index = spatial.SpatialIndex(self.cells)
+        return index
+
+    def reindex_cells(self, addresses=None):
+        """Update the spatial index for cells added to or removed from
+        `cells` directly, or rebuild it if no addresses are given."""
+        index = self.spatial_index
+        if index is None or index.cells is not self.cells:
+            return
+        if addresses is None:
+            self.spatial_index = None
+            return
+        for address in addresses:
+            if address in self.cells:
+                index.add(address)
+            else:
+                index.remove(address)
+
+    def used_range_cells(self, cells):
+        """The rows of addresses of the range `cells` (`XLRange.cells`),
+        with full rows and columns ending at the used range of their sheet.
+        """
+        if isinstance(cells, utils.RangeCells):
+            return cells.clip(
+                *self.get_spatial_index().used_bounds(cells.sheet))
+        return cells
+
+    def _index_cell(self, address):
+        if self.spatial_index is not None \
+                and self.spatial_index.cells is self.cells:
+            self.spatial_index.add(address)
+
+    def changes_since(self, version):
+        """Returns the addresses of all cells changed after `version`."""
+        if version >= self.version:
+            return []
+        return [
+            address for address, changed in self.changes.items()
+            if changed > version
+        ]
+
     def get_cell_value(self, address):
-        print(f"GET_cell_value  address: {address}")
+        if tracing.tracer.enabled:
+            tracing.tracer.emit('get-cell-value', str(address))
 
         if address in self.defined_names:
-            print(f"GET_cell_value address is defined name")
             if isinstance(self.defined_names[address], xltypes.XLCell):
                 address = self.defined_names[address].address
 
@@ -123,19 +192,148 @@ class Model():
         self.ranges = data['ranges']
         self.formulae = data['formulae']
 
+        self.build_dependency_graph()
+
         if build_code:
             self.build_code()
 
-    def build_code(self):
-        """Define the Python code for all cells in the dict of cells."""
+    def persist_to_artifact(self, fname, include_ast=True):
+        """Writes the model to a compact binary artifact (see `artifact`).
+
+        The ASTs built by `build_code()` are stored too, unless
+        `include_ast` is false.
+        """
+        with open(fname, 'wb') as fp:
+            artifact.dump(self, fp, include_ast=include_ast)
+
+    def construct_from_artifact(self, fname, compiled=False):
+        """Constructs the model from an artifact written by
+        `persist_to_artifact()`.
+
+        Formulas are only parsed if the artifact has no ASTs. If `compiled`
+        is set, the ASTs are compiled into closures (see `compile_code()`).
+        """
+        with open(fname, 'rb') as fp:
+            has_ast = artifact.load(fp, self)
+
+        self.build_dependency_graph()
+
+        if not has_ast:
+            self.build_code(compiled=compiled)
+        elif compiled:
+            self.compile_code()
+
+    def persist_to_snapshot(self, fname):
+        """Writes the model to a read-only snapshot (see `snapshot`)."""
+        snapshot.write(self, fname)
+
+    def construct_from_snapshot(self, shared):
+        """Constructs the model from an opened `snapshot.Snapshot`.
+
+        Cells are decoded from the snapshot when they are first read and
+        changes are only made to this model. The dependency graph is not
+        built, see `snapshot.Snapshot.load()`.
+        """
+        shared.load(self)
+
+    def compact_cells(self):
+        """Move the cells into a compact `cellstore.CellStore`.
+
+        Cells of defined names are replaced by views of the store.
+        """
+        self.cells = cellstore.CellStore(self.cells)
+        for name, defn in self.defined_names.items():
+            if isinstance(defn, xltypes.XLCell) and defn.address in self.cells:
+                self.defined_names[name] = self.cells[defn.address]
+
+    def resolve_term(self, term):
+        """Expand a formula term into the cell addresses it refers to."""
+        if '!' in term:
+            name = term.rsplit('!', 1)[1]
+        else:
+            name = term
+        if name in self.defined_names:
+            defn = self.defined_names[name]
+            if isinstance(defn, xltypes.XLCell):
+                return [defn.address]
+            if isinstance(defn, xltypes.XLRange):
+                return [
+                    address
+                    for row in self.used_range_cells(defn.cells)
+                        for address in row  # noqa: E131
+                ]
+            return []
+
+        if ':' in term:
+            rng = self.ranges.get(term)
+            if rng is None:
+                rng = xltypes.XLRange(term, term)
+            return [
+                address
+                for row in self.used_range_cells(rng.cells)
+                    for address in row  # noqa: E131
+            ]
+
+        return [term]
+
+    def build_dependency_graph(self):
+        """Index the direct precedents and dependents of all formula cells."""
+        self.dependency_graph = graph.DependencyGraph()
+        for address, cell in self.cells.items():
+            if cell.formula is None:
+                continue
+            self.dependency_graph.add(address, [
+                precedent
+                for term in cell.formula.terms
+                    for precedent in self.resolve_term(term)  # noqa: E131
+            ])
+
+    def build_code(self, compiled=False, lazy=False):
+        """Define the Python code for all cells in the dict of cells.
+
+        Formulas of cells filled down or across are parsed once and share
+        their AST (see `shapes.FormulaShapes`).
+
+        If `compiled` is set, the formula ASTs are also compiled into
+        closures (see `compile_code()`).
+
+        If `lazy` is set, formulas are only parsed (and compiled) when they
+        are first evaluated, see `LazyFormulas`.
+        """
+        defined_names = {
+            name: defn.address
+            for name, defn in self.defined_names.items()}
+        formula_shapes = shapes.FormulaShapes(defined_names)
+        if lazy:
+            lazy_formulas = LazyFormulas(formula_shapes, compiled)
+            for addr, cell in self.cells.items():
+                if cell.formula is not None:
+                    cell.formula.code = lazy_formulas.code(
+                        cell.formula, addr)
+            return
+
+        for addr, cell in self.cells.items():
+            if cell.formula is not None:
+                cell.formula.ast = formula_shapes.parse(cell.formula, addr)
+
+        if compiled:
+            self.compile_code()
+
+    def compile_code(self):
+        """Compile the formula ASTs of all cells into Python closures.
 
-        for cell in self.cells:
-            if self.cells[cell].formula is not None:
-                defined_names = {
-                    name: defn.address
-                    for name, defn in self.defined_names.items()}
-                self.cells[cell].formula.ast = parser.FormulaParser().parse(
-                    self.cells[cell].formula.formula, defined_names)
+        Function lookups, signature binding and the wrapping of lazily
+        evaluated arguments are resolved once here instead of on every
+        evaluation. ASTs shared by several cells are compiled once.
+        """
+        compiled = {}
+        for cell in self.cells.values():
+            formula = cell.formula
+            if formula is not None and formula.ast is not None:
+                code = compiled.get(id(formula.ast))
+                if code is None:
+                    code = compiled[id(formula.ast)] = formula.ast.compile()
+                formula.code = code
 
     def __eq__(self, other):
 
@@ -156,6 +354,41 @@ class Model():
             and all(defined_names_comparison)
         )
 
+
+class LazyFormulas:
+    """Parses formulas when they are first evaluated.
+
+    `code()` returns a stand-in for the code of a formula which, on its
+    first call, sets the AST and code of the formula and then evaluates it.
+    Parsing is serialized by a lock, so that models can be evaluated by
+    several threads.
+    """
+
+    def __init__(self, formula_shapes, compiled=False):
+        self.formula_shapes = formula_shapes
+        self.compiled = compiled
+        self.lock = threading.Lock()
+        # Compiled closures by AST id, as ASTs can be shared.
+        self.codes = {}
+
+    def code(self, formula, address):
+        def lazy_code(context):
+            with self.lock:
+                if formula.code is lazy_code:
+                    formula.ast = self.formula_shapes.parse(formula, address)
+                    formula.code = self._compile(formula.ast)
+            return formula.code(context)
+        return lazy_code
+
+    def _compile(self, ast):
+        if not self.compiled:
+            return ast.eval
+        code = self.codes.get(id(ast))
+        if code is None:
+            code = self.codes[id(ast)] = ast.compile()
+        return code
+
+
 def clean_cell_addr(cell_addr:str):
     if "!" in cell_addr:
         sheet, cell = cell_addr.split("!")
@@ -175,35 +408,93 @@ class ModelCompiler:
     def __init__(self):
         self.model = Model()
 
-    def read_excel_file(self, file_name):
-        archive = reader.Reader(file_name)
+    def read_excel_file(self, file_name, streaming=False, workers=1):
+        archive = reader.Reader(
+            file_name, streaming=streaming, workers=workers)
         archive.read()
         return archive
 
-    def parse_archive(self, archive, ignore_sheets=[], ignore_hidden=False):
-        self.model.cells, self.model.formulae, self.model.ranges = \
-            archive.read_cells(ignore_sheets, ignore_hidden)
-        self.defined_names = archive.read_defined_names(
-            ignore_sheets, ignore_hidden)
+    def parse_archive(
+            self, archive, ignore_sheets=[], ignore_hidden=False,
+            outputs=None
+    ):
+        """Build the model from a read archive.
+
+        If `outputs` (cell or range addresses or defined names) are given,
+        only the cells they depend on are loaded, see
+        `Reader.read_reachable_cells()`. Only an archive read with
+        `streaming=True` avoids loading the other sheets.
+        """
+        if outputs is None:
+            self.model.cells, self.model.formulae, self.model.ranges = \
+                archive.read_cells(ignore_sheets, ignore_hidden)
+            self.defined_names = archive.read_defined_names(
+                ignore_sheets, ignore_hidden)
+        else:
+            (self.model.cells, self.model.formulae, self.model.ranges,
+             self.defined_names) = archive.read_reachable_cells(
+                outputs, ignore_sheets, ignore_hidden)
         self.build_defined_names()
         self.link_cells_to_defined_names()
         self.build_ranges()
+        self.model.build_dependency_graph()
 
     def read_and_parse_archive(
             self, file_name=None, ignore_sheets=[], ignore_hidden=False,
-            build_code=True
+            build_code=True, streaming=None, workers=1, outputs=None,
+            cache=None, lazy=False, compact=False
     ):
-        archive = self.read_excel_file(file_name)
+        """Read and compile the workbook `file_name` into the model.
+
+        If `cache` (a `compile_cache.CompileCache` or the path of its
+        directory) is given, a model compiled before from the same workbook
+        with the same options is loaded from it instead, and newly compiled
+        models are stored in it.
+
+        If `lazy` is set, formulas are parsed when they are first evaluated
+        (see `Model.build_code()`). If `compact` is set, the cells are kept
+        in a compact store (see `Model.compact_cells()`).
+
+        `streaming` defaults to the streaming reader if `outputs` are given,
+        since openpyxl loads the whole workbook, and to openpyxl otherwise.
+        """
+        if streaming is None:
+            streaming = outputs is not None
+        if cache is not None:
+            if not isinstance(cache, compile_cache.CompileCache):
+                cache = compile_cache.CompileCache(cache)
+            key = cache.key(
+                file_name, ignore_sheets=sorted(set(ignore_sheets)),
+                ignore_hidden=ignore_hidden, build_code=build_code,
+                outputs=None if outputs is None else sorted(set(outputs)),
+                lazy=lazy)
+            if cache.load(key, self.model):
+                if compact:
+                    self.model.compact_cells()
+                if build_code and lazy:
+                    self.model.build_code(lazy=True)
+                return self.model
+
+        archive = self.read_excel_file(
+            file_name, streaming=streaming, workers=workers)
         self.parse_archive(
-            archive, ignore_sheets=ignore_sheets, ignore_hidden=ignore_hidden)
+            archive, ignore_sheets=ignore_sheets, ignore_hidden=ignore_hidden,
+            outputs=outputs)
+        if compact:
+            self.model.compact_cells()
 
         if build_code:
-            self.model.build_code()
+            self.model.build_code(lazy=lazy)
+
+        if cache is not None:
+            cache.store(key, self.model)
 
         return self.model
 
     def read_and_parse_dict(
             self, input_dict, default_sheet="Sheet1", build_code=True):
+        # Formulas filled down or across are tokenized once.
+        formula_shapes = shapes.FormulaShapes()
         for item in input_dict:
             if "!" in item:
                 cell_address = item
@@ -214,11 +505,8 @@ class ModelCompiler:
                     not isinstance(input_dict[item], (float, int))
                     and input_dict[item][0] == '='
             ):
-                formula = xltypes.XLFormula(
-                    input_dict[item],
-                    sheet_name=default_sheet
-                )
-                print(f"read_and_parse_dict Formula = {formula}") # TEMP
+                formula = formula_shapes.formula(
+                    input_dict[item], default_sheet, cell_address)
                 cell = xltypes.XLCell(
                     cell_address, None,
                     formula=formula)
@@ -230,6 +518,7 @@ class ModelCompiler:
                     cell_address, input_dict[item])
 
         self.build_ranges(default_sheet=default_sheet)
+        self.model.build_dependency_graph()
 
         if build_code:
             self.model.build_code()
@@ -283,8 +572,9 @@ class ModelCompiler:
                 self.model.cells[defn.address].defined_names.append(name)
 
             elif isinstance(defn, xltypes.XLRange):
-                if any(isinstance(el, list) for el in defn.cells):
-                    for column in defn.cells:
+                cells = self.model.used_range_cells(defn.cells)
+                if any(isinstance(el, list) for el in cells):
+                    for column in cells:
                         for row_address in column:
                             try:
                                 self.model.cells[row_address].defined_names.append(name)
@@ -306,8 +596,9 @@ class ModelCompiler:
                 raise ValueError(message)
 
     def build_ranges(self, default_sheet=None):
+        # Full row and column references keep no max row or column; their
+        # associated cells are those within the used range of the sheet.
         for formula in self.model.formulae:
-            print(f"build_ranges formula: {formula}")
             associated_cells = set()
             for range in self.model.formulae[formula].terms:
                 if ":" in range:
@@ -316,19 +607,13 @@ class ModelCompiler:
                     self.model.ranges[range] = xltypes.XLRange(range, range)
                     associated_cells.update([
                         cell
-                        for row in self.model.ranges[range].cells
+                        for row in self.model.used_range_cells(
+                            self.model.ranges[range].cells)
                             for cell in row  # noqa: E131
                     ])
                 else:
                     associated_cells.add(range)
 
-                if range in self.model.ranges:
-                    for row in self.model.ranges[range].cells:
-                        for cell_address in row:
-                            if cell_address not in self.model.cells.keys():
-                                self.model.cells[cell_address] = \
-                                    xltypes.XLCell(cell_address, '')
-
             if formula in self.model.cells:
                 self.model.cells[formula].formula.associated_cells = \
                     associated_cells
@@ -358,10 +643,12 @@ class ModelCompiler:
                         model.cells[defn.address])
 
                 elif isinstance(defn, xltypes.XLRange):
-                    for row in defn.cells:
+                    for row in model.used_range_cells(defn.cells):
                         for column in row:
-                            extracted_model.cells[column] = copy.deepcopy(
-                                model.cells[column])
+                            # Blank cells of the range are not in the model.
+                            if column in model.cells:
+                                extracted_model.cells[column] = \
+                                    copy.deepcopy(model.cells[column])
 
         terms_to_copy = []
         for addr, cell in extracted_model.cells.items():
@@ -377,6 +664,7 @@ class ModelCompiler:
         for term in terms_to_copy:
             extracted_model.cells[term] = copy.deepcopy(model.cells[term])
 
+        extracted_model.build_dependency_graph()
         extracted_model.build_code()
 
         return extracted_model
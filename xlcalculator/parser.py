@@ -1,8 +1,8 @@
-from . import ast_nodes, tokenizer
+from . import ast_nodes, tokenizer, utils
 
 
 class Operator(object):
-    """Small wrapper class to manage operators during shunting yard"""
+    """Precedence and associativity of an operator."""
 
     def __init__(self, value, precedence, associativity):
         self.value = value
@@ -33,19 +33,73 @@ OPERATORS = {
 }
 
 
-class FormulaParser:
-    """Excel Formula Parser"""
+def reference_patterns(formula, tokens):
+    """The references of the range tokens of `formula` as written.
+
+    The tokenizer drops the "$" of absolute references. Returns a list
+    aligned with `tokens`, holding the value of every range token with its
+    references as written in `formula` (and None for other tokens), or None
+    if the references of `formula` cannot be matched to range tokens.
+    """
+    references = utils.find_references(formula)
+    patterns = []
+    position = 0
+    for token in tokens:
+        if token.ttype != "operand" or token.tsubtype != "range":
+            patterns.append(None)
+            continue
+        count = utils.count_references(token.tvalue)
+        if position + count > len(references):
+            return None
+        pattern = utils.replace_references(
+            token.tvalue, references[position:position + count])
+        if pattern.replace('$', '') != token.tvalue:
+            return None
+        patterns.append(pattern)
+        position += count
+    if position != len(references):
+        return None
+    return patterns
+
 
-    def parse(self, formula, named_ranges=None, tokenize_range=False):
+class FormulaParser:
+    """Excel Formula Parser
+
+    A precedence climbing parser building the AST from the token stream in
+    a single pass.
+    """
+
+    # (row, column) of the cell references are relative to, see `parse()`.
+    origin = None
+    # Range tokens (by id) with their references as written in the formula.
+    patterns = {}
+    # Ids of the tokens that were resolved from defined names.
+    named_tokens = frozenset()
+
+    def parse(
+            self, formula, named_ranges=None, tokenize_range=False,
+            origin=None
+    ):
         """Parse formula into evaluable AST.
+
+        If the (row, column) `origin` of the formula's cell is given, cell
+        references become `ast_nodes.RelativeRangeNode`s, so that the AST
+        can be shared by all cells with the same formula in R1C1 form.
         """
         # 1. Parse the formula into syntactic tokens.
-        tokens = self.tokenize(formula)
-        # 2. Organize tokens into reverse polish notation.
-        nodes = self.shunting_yard(tokens, named_ranges)
-        # 3. Construct the AST by connecting the AST nodes.
-        ast = self.build_ast(nodes)
-        return ast
+        tokens = self.tokenize(formula, tokenize_range)
+        self.origin = origin
+        self.patterns = {}
+        if origin is not None:
+            patterns = reference_patterns(formula, tokens)
+            if patterns is not None:
+                self.patterns = {
+                    id(token): pattern
+                    for token, pattern in zip(tokens, patterns)
+                    if pattern is not None
+                }
+        # 2. Build the AST from the tokens.
+        return self.build_ast(tokens, named_ranges)
 
     def tokenize(self, formula, tokenize_range=False):
         # Remove leading "=" sign.
@@ -55,246 +109,173 @@ class FormulaParser:
         excel_parser = tokenizer.ExcelParser(tokenize_range=tokenize_range)
         return excel_parser.parse(formula).items
 
-    def shunting_yard(self, raw_tokens, named_ranges, tokenize_range=False):
-        """Reorganize tokens into proper reverse polish notation.
-
-        Core algorithm taken from wikipedia with varargs extensions from
-
-        http://www.kallisti.net.nz/blog/2008/02/
-            extension-to-the-shunting-yard-algorithm-to-allow-
-            variable-numbers-of-arguments-to-functions/
-
-
-        The ref is the cell address which is passed down to the actual
-        compiled python code.  Range basic operations signature require this
-        reference, so it has to be written during OperatorNode.emit()
-
-          https://github.com/iOiurson/koala/blob/master/koala/ast/graph.py#L292.
-
-        This is needed because Excel range basic operations (+, -, * ...) are
-        applied on matching cells.
-
-        Example:
+    def build_ast(self, tokens, named_ranges=None):
+        """Build the AST of a token stream."""
+        self.tokens = tokens
+        self.position = 0
+        self.named_ranges = named_ranges if named_ranges is not None else {}
+        self.named_tokens = set()
+        ast = self.parse_expression(0)
+        if self.position < len(tokens):
+            raise SyntaxError(
+                f'Unexpected token: {tokens[self.position].tvalue}')
+        return ast
 
-        Cell C2 has the following formula 'A1:A3 + B1:B3'.  The output will
-        actually be A2 + B2, because the formula is relative to cell C2.
-        """
-        # insert tokens for '(' and ')', to make things clearer below
-        tokens = []
-        for token in raw_tokens:
-            if token.ttype == "function" and token.tsubtype == "start":
-                token.tsubtype = ""
-                tokens.append(token)
-                tokens.append(tokenizer.f_token('(', 'arglist', 'start'))
-
-            elif token.ttype == "function" and token.tsubtype == "stop":
-                tokens.append(tokenizer.f_token(')', 'arglist', 'stop'))
-
-            elif token.ttype == "subexpression" and token.tsubtype == "start":
-                token.tvalue = '('
-                tokens.append(token)
-
-            elif token.ttype == "subexpression" and token.tsubtype == "stop":
-                token.tvalue = ')'
-                tokens.append(token)
-
-            elif (token.ttype == "operand" and token.tsubtype == "range"
-                    and token.tvalue in named_ranges):
-                # Resolve the named range once and for all.
-                token.tvalue = named_ranges[token.tvalue]
-                tokens.append(token)
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def advance(self):
+        token = self.peek()
+        if token is None:
+            raise SyntaxError("Missing operand")
+        self.position += 1
+        return token
+
+    def parse_expression(self, min_precedence):
+        """Parse operands joined by operators binding tighter than
+        `min_precedence`."""
+        node = self.parse_primary()
+        while True:
+            token = self.peek()
+            if token is None:
+                return node
+
+            if token.ttype == "operator-infix":
+                precedence = OPERATORS[token.tvalue].precedence
+                if precedence <= min_precedence:
+                    return node
+                self.position += 1
+                if token.tvalue == ':':
+                    operator = ast_nodes.RangeOperatorNode(token)
+                else:
+                    operator = ast_nodes.OperatorNode(token)
+                operator.left = node
+                operator.right = self.parse_expression(precedence)
+                node = operator
+
+            elif self.is_range_end(token):
+                # `INDEX(...):B2` or `INDEX(...):INDEX(...)`, the ":" is
+                # part of the following token.
+                if OPERATORS[':'].precedence <= min_precedence:
+                    return node
+                self.position += 1
+                node = self.range_operator(node, self.parse_primary(
+                    self.split_token(token, 1, len(token.tvalue))))
 
             else:
-                tokens.append(token)
-
-        output = []
-        stack = []
-        were_values = []
-        arg_count = []
-
-        new_tokens = []
-
-        # reconstruct expressions with ':' and replace the corresponding
-        # tokens by the reconstructed expression
-        if not tokenize_range:
-            for index, token in enumerate(tokens):
-                new_tokens.append(token)
-
-                if type(token.tvalue) == str:
-
-                    # example -> :OFFSET( or simply :A10
-                    if token.tvalue.startswith(':'):
-                        depth = 0
-                        expr = ''
-                        rev = reversed(tokens[:index])
-
-                        # going backwards, 'stop' starts, 'start' stops
-                        for reversed_token in rev:
-                            if reversed_token.tsubtype == 'stop':
-                                depth += 1
-
-                            elif (
-                                depth > 0
-                                and reversed_token.tsubtype == 'start'
-                            ):
-                                depth -= 1
-
-                            expr = reversed_token.tvalue + expr
-
-                            new_tokens.pop()
-
-                            if depth == 0:
-                                # these 2 lines are needed to remove INDEX()
-                                new_tokens.pop()
-                                new_tokens.pop()
-                                expr = rev.next().tvalue + expr
-                                break
-
-                        expr += token.tvalue
-
-                        depth = 0
-                        
-                        # Joel 2024-06-03
-                        if token.tvalue[1:] in ['OFFSET', 'INDEX', 'INDIRECT']:
-                            for t in tokens[(index + 1):]:
-                                if t.tsubtype == 'start':
-                                    depth += 1
-
-                                elif depth > 0 and t.tsubtype == 'stop':
-                                    depth -= 1
-
-                                expr += t.tvalue
-                                tokens.remove(t)
-
-                                if depth == 0:
-                                    break
-
-                        new_tokens.append(
-                            tokenizer.f_token(expr, 'operand', 'pointer'))
-
-                    # example -> A1:OFFSET(
-                    elif ':OFFSET' in token.tvalue or ':INDEX' in token.tvalue:
-                        depth = 0
-                        expr = ''
-                        expr += token.tvalue
-
-                        for t in tokens[(index + 1):]:
-                            if t.tsubtype == 'start':
-                                depth += 1
-
-                            elif t.tsubtype == 'stop':
-                                depth -= 1
-
-                            expr += t.tvalue
-                            tokens.remove(t)
-
-                            if depth == 0:
-                                new_tokens.pop()
-                                break
-
-                        new_tokens.append(
-                            tokenizer.f_token(expr, 'operand', 'pointer'))
-
-        tokens = new_tokens if new_tokens else tokens
-
-        for token in tokens:
-            if token.ttype == "operand":
-                output.append(self.create_node(token))
-
-                if were_values:
-                    were_values.pop()
-                    were_values.append(True)
-
-            elif token.ttype == "function":
-                if token.tvalue == "INDIRECT":
-                    print(f"function TOKEN: {token.tvalue} ") # TODO -- potentially raise errors for functions we don't accept.
-
-                stack.append(token)
-                arg_count.append(0)
-
-                if were_values:
-                    were_values.pop()
-                    were_values.append(True)
-
-                were_values.append(False)
-
-            elif token.ttype == "argument":
-
-                while stack and (stack[-1].tsubtype != "start"):
-                    output.append(self.create_node(stack.pop()))
-
-                if were_values.pop():
-                    arg_count[-1] += 1
-                were_values.append(False)
-
-                if not len(stack):
-                    raise ValueError("Mismatched or misplaced parentheses")
-
-            elif token.ttype.startswith('operator'):
-
-                if token.ttype.endswith('-prefix') and token.tvalue == "-":
-                    o1 = OPERATORS['u-']
-
-                else:
-                    o1 = OPERATORS[token.tvalue]
-
-                while stack and stack[-1].ttype.startswith('operator'):
-                    if (
-                            stack[-1].ttype.endswith('-prefix')
-                            and stack[-1].tvalue == "-"
-                    ):
-                        o2 = OPERATORS['u-']
-
-                    else:
-                        o2 = OPERATORS[stack[-1].tvalue]
-
-                    if (
-                            (o1.associativity == "left"
-                             and o1.precedence <= o2.precedence)
-                            or (o1.associativity == "right"
-                                and o1.precedence < o2.precedence)
-                    ):
-                        output.append(
-                            self.create_node(stack.pop()))
-
-                    else:
-                        break
-
-                stack.append(token)
-
-            elif token.tsubtype == "start":
-                stack.append(token)
-
-            elif token.tsubtype == "stop":
-                while stack and stack[-1].tsubtype != "start":
-                    output.append(self.create_node(stack.pop()))
-
-                if not stack:
-                    raise SyntaxError("Mismatched or misplaced parentheses")
-
-                stack.pop()
-
-                if stack and stack[-1].ttype == "function":
-                    f = self.create_node(stack.pop())
-                    a = arg_count.pop()
-                    w = were_values.pop()
-                    if w:
-                        a += 1
-                    f.num_args = a
-                    output.append(f)
-
-        while stack:
-            if (stack[-1].tsubtype == "start" or stack[-1].tsubtype == "stop"):
+                return node
+
+    def parse_primary(self, token=None):
+        """Parse an operand, function call, subexpression or prefix
+        operation."""
+        if token is None:
+            token = self.advance()
+        ttype = token.ttype
+
+        if ttype == "operand":
+            return self.create_node(token)
+
+        if ttype == "operator-prefix":
+            node = ast_nodes.OperatorNode(token)
+            node.right = self.parse_expression(OPERATORS['u-'].precedence)
+            return node
+
+        if ttype == "function" and token.tsubtype == "start":
+            colon = token.tvalue.rfind(':')
+            if colon > 0:
+                # `A1:OFFSET(...)` is tokenized as function `A1:OFFSET`.
+                return self.range_operator(
+                    self.create_node(tokenizer.f_token(
+                        token.tvalue[:colon], "operand", "range")),
+                    self.parse_function(self.split_token(
+                        token, colon + 1, len(token.tvalue))))
+            return self.parse_function(token)
+
+        if ttype == "subexpression" and token.tsubtype == "start":
+            node = self.parse_expression(0)
+            self.expect("subexpression")
+            return node
+
+        raise SyntaxError(f'Unexpected token: {token.tvalue}')
+
+    def parse_function(self, token):
+        token.tsubtype = ""
+        node = ast_nodes.FunctionNode(token)
+        node.args = []
+        while True:
+            next_token = self.peek()
+            if next_token is None:
                 raise SyntaxError("Mismatched or misplaced parentheses")
-
-            output.append(self.create_node(stack.pop()))
-
-        # convert to list
-        return [x for x in output]
+            if next_token.ttype == "function" \
+                    and next_token.tsubtype == "stop":
+                self.position += 1
+                return node
+            if next_token.ttype == "argument":
+                # Empty arguments are left out.
+                self.position += 1
+                continue
+            node.args.append(self.parse_expression(0))
+            next_token = self.peek()
+            if next_token is None:
+                raise SyntaxError("Mismatched or misplaced parentheses")
+            if next_token.ttype == "argument":
+                self.position += 1
+            elif not (next_token.ttype == "function"
+                      and next_token.tsubtype == "stop"):
+                raise SyntaxError(
+                    f'Unexpected token: {next_token.tvalue}')
+
+    def expect(self, ttype):
+        token = self.peek()
+        if token is None or token.ttype != ttype \
+                or token.tsubtype != "stop":
+            raise SyntaxError("Mismatched or misplaced parentheses")
+        self.position += 1
+
+    @staticmethod
+    def is_range_end(token):
+        return (
+            isinstance(token.tvalue, str)
+            and token.tvalue.startswith(':')
+            and len(token.tvalue) > 1
+            and (token.ttype == "operand" and token.tsubtype == "range"
+                 or token.ttype == "function" and token.tsubtype == "start")
+        )
+
+    def split_token(self, token, start, end):
+        """The part of a token before or after a ":" as a token of its own.
+        """
+        part = tokenizer.f_token(
+            token.tvalue[start:end], token.ttype, token.tsubtype)
+        pattern = self.patterns.get(id(token))
+        if pattern is not None and pattern.startswith(':'):
+            self.patterns[id(part)] = pattern[1:]
+        return part
+
+    def range_operator(self, left, right):
+        node = ast_nodes.RangeOperatorNode(
+            tokenizer.f_token(':', "operator-infix", "range"))
+        node.left = left
+        node.right = right
+        return node
 
     def create_node(self, token):
         if token.ttype == "operand":
-            if token.tsubtype in ["range", "pointer"]:
+            if (token.tsubtype == "range"
+                    and token.tvalue in self.named_ranges):
+                # Resolve the named range once and for all.
+                token.tvalue = self.named_ranges[token.tvalue]
+                self.named_tokens.add(id(token))
+            if (
+                    id(token) in self.patterns
+                    and id(token) not in self.named_tokens
+                    and utils.count_references(token.tvalue)
+            ):
+                return ast_nodes.RelativeRangeNode(
+                    token, self.origin, self.patterns[id(token)])
+            if token.tsubtype == "range":
                 return ast_nodes.RangeNode(token)
             else:
                 return ast_nodes.OperandNode(token)
@@ -307,31 +288,3 @@ class FormulaParser:
 
         else:
             raise ValueError('Unknown token type: ' + token.ttype)
-
-    def build_ast(self, nodes):
-        """Update AST nodes to build a proper parse tree.
-
-        XXX: There is really no need for this. The shunting yeard algorithm
-        should jsut take care of it.
-        """
-        stack = []
-
-        for node in nodes:
-            if isinstance(node, ast_nodes.OperatorNode):
-                if node.ttype == "operator-infix":
-                    # Stack has arguments in reverse order.
-                    node.right = stack.pop()
-                    node.left = stack.pop()
-                else:
-                    node.right = stack.pop()
-
-            elif isinstance(node, ast_nodes.FunctionNode):
-                args = []
-                for _ in range(node.num_args):
-                    args.append(stack.pop())
-                # Stack has arguments in reverse order.
-                node.args = list(reversed(args))
-
-            stack.append(node)
-
-        return stack.pop()
@@ -1,18 +1,39 @@
+import concurrent.futures
+
 import openpyxl
+from openpyxl.utils.cell import (
+    coordinate_to_tuple, get_column_letter, range_boundaries)
 
-from . import patch, xltypes
+from . import patch, streaming, tracing, utils, xltypes
 
 
 class Reader():
+    """Reads the cells, formulae and defined names of an Excel file.
+
+    By default the workbook is loaded with openpyxl. With `streaming=True`
+    the worksheets are instead parsed in a single pass straight from the
+    archive (see `streaming.Workbook`), which is considerably faster and
+    lighter on memory for large workbooks.
+
+    `workers` is the number of processes sheets are read in (see
+    `read_cells()`); None uses one per CPU.
+    """
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, streaming=False, workers=1):
         self.excel_file_name = file_name
+        self.streaming = streaming
+        self.workers = workers
 
     def read(self):
+        if self.streaming:
+            self.book = streaming.Workbook(self.excel_file_name)
+            return
         with patch.openpyxl_WorksheetReader_patch():
             self.book = openpyxl.load_workbook(self.excel_file_name)
 
     def read_defined_names(self, ignore_sheets=[], ignore_hidden=False):
+        if self.streaming:
+            return dict(self.book.defined_names)
         return {
             defn.name: defn.value
             for name, defn in self.book.defined_names.items()
@@ -20,35 +41,166 @@ class Reader():
         }
 
     def read_cells(self, ignore_sheets=[], ignore_hidden=False):
-        cells = {}
-        formulae = {}
-        ranges = {}
+        """Read the cells, formulae and ranges of all worksheets.
+
+        With more than one worker, sheets are read and their formulae
+        tokenized in a process pool. Results are merged in sheet order, so
+        the outcome does not depend on the number of workers.
+        """
+        tasks = []
         for sheet_name in self.book.sheetnames:
             if sheet_name in ignore_sheets:
-                print(f"IGNORING sheet: {sheet_name}")
+                if tracing.tracer.enabled:
+                    tracing.tracer.emit('ignore-sheet', sheet_name)
                 continue
+            elif tracing.tracer.enabled:
+                tracing.tracer.emit('load-sheet', sheet_name)
+            if self.streaming:
+                tasks.append((self.book.read_sheet, sheet_name))
             else:
-                print(f"Loading sheet: {sheet_name}")
-            sheet = self.book[sheet_name]
-            for cell in sheet._cells.values():
-                addr = f'{sheet_name}!{cell.coordinate}'
-
-
-                if cell.data_type == 'f':
-                    value = cell.value
-                    if isinstance(
-                            value,
-                            openpyxl.worksheet.formula.ArrayFormula
-                    ):
-                        value = value.text
-                    formula = xltypes.XLFormula(value, sheet_name)
-                    formulae[addr] = formula
-                    value = cell.cvalue
-                else:
-                    formula = None
-                    value = cell.value
+                tasks.append((
+                    streaming.build_cells, sheet_name,
+                    list(self._sheet_records(self.book[sheet_name]))))
 
+        if self.workers == 1 or len(tasks) < 2:
+            results = [func(*args) for func, *args in tasks]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers) as executor:
+                futures = [executor.submit(*task) for task in tasks]
+                results = [future.result() for future in futures]
+
+        cells = {}
+        formulae = {}
+        ranges = {}
+        for sheet_cells, sheet_formulae in results:
+            cells.update(sheet_cells)
+            formulae.update(sheet_formulae)
+
+        return [cells, formulae, ranges]
+
+    def read_reachable_cells(
+            self, outputs, ignore_sheets=[], ignore_hidden=False):
+        """Read only the cells that `outputs` depend on.
+
+        `outputs` are cell or range addresses or defined names. Starting from
+        them, formulae are followed through their references, across sheets;
+        a sheet is only read once one of its cells is reached, and only the
+        reached formulae are tokenized. References built while evaluating
+        (e.g. by ``INDIRECT()`` or ``OFFSET()``) cannot be followed.
+
+        Only the reached sheets are parsed by the streaming reader; openpyxl
+        loads the whole workbook in `read()` regardless.
+
+        Returns the cells, formulae and ranges like `read_cells()`, followed
+        by the defined names that were reached.
+        """
+        all_names = self.read_defined_names(ignore_sheets, ignore_hidden)
+        sheets = {}
+        cells = {}
+        formulae = {}
+        ranges = {}
+        defined_names = {}
+        stack = list(outputs)
+        seen = set()
+        while stack:
+            term = stack.pop()
+            if term in seen:
+                continue
+            seen.add(term)
+
+            sheet_name, ref = term.rsplit('!', 1) if '!' in term \
+                else (None, term)
+            if ref in all_names:
+                defined_names[ref] = all_names[ref]
+                stack.extend(all_names[ref].replace('$', '').split(','))
+                continue
+            if sheet_name is None:
+                continue
+
+            sheet_name = utils.resolve_sheet(sheet_name)
+            if sheet_name not in sheets:
+                sheets[sheet_name] = self._read_sheet_records(
+                    sheet_name, ignore_sheets)
+            records = sheets[sheet_name]
+            if not records:
+                continue
+
+            for coordinate in self._find_coordinates(records, ref):
+                addr = f'{sheet_name}!{coordinate}'
+                if addr in cells:
+                    continue
+                value, formula_text = records[coordinate]
+                formula = None
+                if formula_text is not None:
+                    formula = xltypes.XLFormula(formula_text, sheet_name)
+                    formulae[addr] = formula
+                    stack.extend(formula.terms)
                 cells[addr] = xltypes.XLCell(
                     addr, value=value, formula=formula)
 
-        return [cells, formulae, ranges]
+        return [cells, formulae, ranges, defined_names]
+
+    def _read_sheet_records(self, sheet_name, ignore_sheets):
+        """Map the coordinates of a sheet's cells to (value, formula)."""
+        if sheet_name in ignore_sheets:
+            if tracing.tracer.enabled:
+                tracing.tracer.emit('ignore-sheet', sheet_name)
+            return None
+        if sheet_name not in self.book.sheetnames:
+            return None
+        if tracing.tracer.enabled:
+            tracing.tracer.emit('load-sheet', sheet_name)
+        if self.streaming:
+            return {
+                coordinate: (value, formula)
+                for coordinate, value, formula, _
+                in self.book.iter_cells(sheet_name)
+            }
+        return {
+            coordinate: (value, formula)
+            for coordinate, value, formula
+            in self._sheet_records(self.book[sheet_name])
+        }
+
+    @staticmethod
+    def _find_coordinates(records, ref):
+        """The coordinates of the cells in `records` that `ref` covers."""
+        if ':' not in ref:
+            return [ref] if ref in records else []
+
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or utils.MAX_COL
+        max_row = max_row or utils.MAX_ROW
+        # Walk whichever is smaller: the range or the cells of the sheet.
+        if (max_col - min_col + 1) * (max_row - min_row + 1) <= len(records):
+            coordinates = (
+                f'{get_column_letter(col)}{row}'
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+            )
+            return [
+                coordinate for coordinate in coordinates
+                if coordinate in records
+            ]
+        found = []
+        for coordinate in records:
+            row, col = coordinate_to_tuple(coordinate)
+            if min_row <= row <= max_row and min_col <= col <= max_col:
+                found.append(coordinate)
+        return found
+
+    def _sheet_records(self, sheet):
+        for cell in sheet._cells.values():
+            if cell.data_type == 'f':
+                formula = cell.value
+                if isinstance(
+                        formula,
+                        openpyxl.worksheet.formula.ArrayFormula
+                ):
+                    formula = formula.text
+                yield cell.coordinate, cell.cvalue, formula
+            else:
+                yield cell.coordinate, cell.value, None
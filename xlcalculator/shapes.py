@@ -0,0 +1,98 @@
+"""Formulas shared by cells that were filled down or across.
+
+Such formulas only differ in their relative references: they have the same
+R1C1 form (`utils.relative_formula()`), their shape. `FormulaShapes` tokenizes
+and parses each shape once. Further cells of a shape get the tokens of the
+first cell moved to their own position, and share its AST, whose references
+are resolved relative to the cell being evaluated.
+"""
+from dataclasses import dataclass
+
+from . import ast_nodes, parser, tokenizer, utils, xltypes
+
+
+@dataclass
+class Shape:
+    """The formula of the first cell of a shape."""
+
+    # (row, column) of the first cell.
+    origin: tuple
+    tokens: list
+    # The references of the range tokens as written, see
+    # `parser.reference_patterns()`. If they are unknown (None), the
+    # formulas of the shape are tokenized and parsed one by one.
+    patterns: list
+    ast: ast_nodes.ASTNode = None
+
+
+def shift_tokens(tokens, patterns, rows, cols):
+    """Move the relative references of range tokens."""
+    return [
+        token if pattern is None else tokenizer.f_token(
+            utils.shift_references(pattern, rows, cols).replace('$', ''),
+            token.ttype, token.tsubtype)
+        for token, pattern in zip(tokens, patterns)
+    ]
+
+
+class FormulaShapes:
+    """Tokenizes and parses each formula shape once.
+
+    `defined_names` maps names to the addresses they are resolved to when
+    parsing, like in `Model.build_code()`.
+    """
+
+    def __init__(self, defined_names=None):
+        self.defined_names = defined_names if defined_names is not None \
+            else {}
+        # Shapes by (sheet name, R1C1 formula).
+        self.shapes = {}
+        # The number of formulas that reused the tokens or AST of a shape.
+        self.hits = 0
+
+    def _lookup(self, formula, sheet_name, address):
+        row, col = utils.cell_position(address)
+        key = (sheet_name, utils.relative_formula(formula, row, col))
+        return key, (row, col), self.shapes.get(key)
+
+    def _add(self, key, origin, formula, tokens):
+        shape = self.shapes[key] = Shape(
+            origin, tokens, parser.reference_patterns(formula, tokens))
+        return shape
+
+    def formula(self, formula, sheet_name, address):
+        """An `XLFormula` for the cell at `address`."""
+        key, (row, col), shape = self._lookup(formula, sheet_name, address)
+        if shape is None:
+            xl_formula = xltypes.XLFormula(formula, sheet_name)
+            self._add(key, (row, col), formula, xl_formula.tokens)
+            return xl_formula
+        if shape.patterns is None:
+            return xltypes.XLFormula(formula, sheet_name)
+
+        self.hits += 1
+        tokens = shift_tokens(
+            shape.tokens, shape.patterns,
+            row - shape.origin[0], col - shape.origin[1])
+        return xltypes.XLFormula(formula, sheet_name, tokens=tokens)
+
+    def parse(self, xl_formula, address):
+        """The AST of `xl_formula` in the cell at `address`."""
+        sheet_name = address.split('!')[0]
+        key, origin, shape = self._lookup(
+            xl_formula.formula, sheet_name, address)
+        if shape is None:
+            shape = self._add(
+                key, origin, xl_formula.formula, xl_formula.tokens)
+        elif shape.ast is not None:
+            self.hits += 1
+            return shape.ast
+
+        if shape.patterns is not None:
+            # Any cell of the shape can serve as the origin of its AST.
+            shape.ast = parser.FormulaParser().parse(
+                xl_formula.formula, self.defined_names, origin=origin)
+            return shape.ast
+
+        return parser.FormulaParser().parse(
+            xl_formula.formula, self.defined_names)
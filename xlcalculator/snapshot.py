@@ -0,0 +1,386 @@
+"""Memory-mapped, read-only snapshot of a `Model`.
+
+A snapshot is written once by `write()` and opened by any number of processes
+with `Snapshot`, which maps the file read-only: the pages of the file are
+shared by the processes and nothing is deserialized up front.
+
+* Cells are fixed-size records sorted by address, found by binary search in
+  the mapped file. A cell is only decoded when it is first read.
+* Formulas and their ASTs are stored one by one and decoded (and compiled)
+  once per process, when first needed. They are not changed by evaluating,
+  so all models of a process share them. Formulas of models written before
+  `Model.build_code()` have no AST; they are parsed when they are decoded.
+* Ranges are stored as bounds (see `artifact`), the ranges, formulae and
+  defined names of the model in a small table at the end of the file.
+
+`Snapshot.load()` fills a model whose mappings are `Overlay`s of the
+snapshot: the cells a model reads or sets are private to the model, so that
+every request can evaluate and change a model of its own.
+
+Like artifacts, snapshots must only be loaded from trusted sources.
+"""
+import collections.abc
+import marshal
+import mmap
+import struct
+
+from . import artifact, graph, parser, xltypes
+
+MAGIC = b'XLCS'
+VERSION = 2
+# The number of cells, formulas and ASTs, the offset and length of the
+# tables.
+SECTIONS = struct.Struct('<IIIQQ')
+# A cell: the offset and length of its address and of its value, the index
+# of its formula.
+RECORD = struct.Struct('<QIQIi')
+# The offset and length of a formula or AST.
+SPAN = struct.Struct('<QI')
+
+
+def write(model, fname):
+    """Write a snapshot of `model` to the file `fname`.
+
+    The ASTs of the formulas are stored if they were built.
+    """
+    formulas = []
+    formula_ids = {}
+    asts = []
+    ast_ids = {}
+
+    def ast_index(node):
+        if node is None:
+            return artifact.NONE
+        index = ast_ids.get(id(node))
+        if index is None:
+            writer = artifact._Writer(True)
+            writer.node(node)
+            index = ast_ids[id(node)] = len(asts)
+            asts.append(marshal.dumps(
+                (tuple(writer.constants), tuple(writer.nodes))))
+        return index
+
+    def formula_index(formula):
+        if formula is None:
+            return artifact.NONE
+        index = formula_ids.get(id(formula))
+        if index is None:
+            writer = artifact._Writer(False)
+            record = writer.formulas[writer.formula(formula)]
+            record = record[:-1] + (ast_index(formula.ast),)
+            index = formula_ids[id(formula)] = len(formulas)
+            formulas.append(marshal.dumps(
+                (tuple(writer.constants), record)))
+        return index
+
+    cells = sorted(
+        (address.encode(),
+         marshal.dumps((
+             artifact.encode_value(cell.value),
+             tuple(cell.defined_names))),
+         formula_index(cell.formula))
+        for address, cell in model.cells.items()
+    )
+
+    writer = artifact._Writer(False)
+
+    def entries(mapping):
+        return tuple(
+            (writer.const(key), artifact.FORMULA, formula_index(obj))
+            if isinstance(obj, xltypes.XLFormula) else writer.entry(key, obj)
+            for key, obj in mapping.items())
+
+    formulae = entries(model.formulae)
+    ranges = entries(model.ranges)
+    defined_names = entries(model.defined_names)
+    tables = marshal.dumps((
+        tuple(writer.constants), tuple(writer.ranges),
+        formulae, ranges, defined_names))
+
+    offset = artifact.HEADER.size + SECTIONS.size \
+        + RECORD.size * len(cells) + SPAN.size * (len(formulas) + len(asts))
+    index = []
+    data = []
+    for address, value, formula in cells:
+        index.append(RECORD.pack(
+            offset, len(address), offset + len(address), len(value),
+            formula))
+        data.extend((address, value))
+        offset += len(address) + len(value)
+    for blob in formulas + asts:
+        index.append(SPAN.pack(offset, len(blob)))
+        data.append(blob)
+        offset += len(blob)
+
+    with open(fname, 'wb') as fp:
+        fp.write(artifact.HEADER.pack(MAGIC, VERSION, 0))
+        fp.write(SECTIONS.pack(
+            len(cells), len(formulas), len(asts), offset, len(tables)))
+        fp.writelines(index)
+        fp.writelines(data)
+        fp.write(tables)
+
+
+class Overlay(collections.abc.MutableMapping):
+    """A private, writable view of a read-only mapping.
+
+    Values read from `base` are kept, so that changing them (like
+    `Model.set_cell_value()` changes cells) only changes this overlay.
+    Items set or deleted are kept in the overlay too; `base` is never
+    changed.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.loaded = {}
+        self.deleted = set()
+        # Counted as items are added and deleted, as counting the keys of
+        # `base` would read all of them.
+        self.length = len(base)
+
+    def __getitem__(self, key):
+        try:
+            return self.loaded[key]
+        except KeyError:
+            if key in self.deleted:
+                raise
+        value = self.loaded[key] = self.base[key]
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.length += 1
+        self.loaded[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.loaded.pop(key, None)
+        self.deleted.add(key)
+        self.length -= 1
+
+    def __contains__(self, key):
+        return key in self.loaded or (
+            key not in self.deleted and key in self.base)
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.deleted:
+                yield key
+        for key in self.loaded:
+            if key not in self.base:
+                yield key
+
+    def __len__(self):
+        return self.length
+
+
+class _Entries(collections.abc.Mapping):
+    """The formulae, ranges or defined names of a snapshot."""
+
+    def __init__(self, entries, objects):
+        self.entries = entries
+        self.objects = objects
+
+    def __getitem__(self, key):
+        kind, index = self.entries[key]
+        return self.objects[kind](index)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Snapshot(collections.abc.Mapping):
+    """A snapshot written by `write()`, mapped read-only.
+
+    As a mapping, a snapshot maps the addresses of its cells to new
+    `XLCell`s. If `compiled` is set, ASTs are compiled into closures (see
+    `Model.compile_code()`) when they are decoded.
+    """
+
+    def __init__(self, fname, compiled=False):
+        self.fname = fname
+        self.compiled = compiled
+        with open(fname, 'rb') as fp:
+            try:
+                self.map = mmap.mmap(
+                    fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise artifact.ArtifactError(
+                    f'Not a model {MAGIC.decode()} file')
+        try:
+            self._read_tables()
+        except Exception:
+            self.map.close()
+            raise
+
+        # Decoded formulas, ASTs, compiled ASTs and range cells by index.
+        self.formulas = {}
+        self.asts = {}
+        self.codes = {}
+        self.range_cells = {}
+        # The addresses of the defined names, for parsing formulas.
+        self._defined_names = None
+
+    def _read_tables(self):
+        header_size = artifact.HEADER.size + SECTIONS.size
+        if len(self.map) < header_size:
+            raise artifact.ArtifactError(
+                f'Not a model {MAGIC.decode()} file')
+        artifact.read_header(
+            self.map[:artifact.HEADER.size], MAGIC, VERSION)
+        (self.cell_count, formula_count, _, tables_offset,
+         tables_length) = SECTIONS.unpack_from(
+            self.map, artifact.HEADER.size)
+        self.records_offset = header_size
+        self.formulas_offset = header_size + RECORD.size * self.cell_count
+        self.asts_offset = self.formulas_offset + SPAN.size * formula_count
+
+        (self.constants, self.range_records, formulae, ranges,
+         defined_names) = marshal.loads(
+            self.map[tables_offset:tables_offset + tables_length])
+        self.tables = tuple(
+            {self.constants[key]: (kind, index)
+             for key, kind, index in entries}
+            for entries in (formulae, ranges, defined_names))
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record(self, index):
+        return RECORD.unpack_from(
+            self.map, self.records_offset + RECORD.size * index)
+
+    def _address(self, index):
+        offset, length = self._record(index)[:2]
+        return self.map[offset:offset + length]
+
+    def _find(self, address):
+        """The index of the record of `address`, or -1."""
+        if not isinstance(address, str):
+            return -1
+        key = address.encode()
+        low, high = 0, self.cell_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._address(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.cell_count and self._address(low) == key:
+            return low
+        return -1
+
+    def __getitem__(self, address):
+        index = self._find(address)
+        if index < 0:
+            raise KeyError(address)
+        _, _, offset, length, formula = self._record(index)
+        value, defined_names = marshal.loads(self.map[offset:offset + length])
+        cell = xltypes.XLCell(
+            address, artifact.decode_value(value),
+            None if formula == artifact.NONE else self.formula(formula))
+        cell.defined_names = list(defined_names)
+        return cell
+
+    def __contains__(self, address):
+        return self._find(address) >= 0
+
+    def __iter__(self):
+        for index in range(self.cell_count):
+            yield self._address(index).decode()
+
+    def __len__(self):
+        return self.cell_count
+
+    def _span(self, offset, index):
+        offset, length = SPAN.unpack_from(self.map, offset + SPAN.size * index)
+        return marshal.loads(self.map[offset:offset + length])
+
+    def ast(self, index):
+        """The AST at `index`, decoded once."""
+        root = self.asts.get(index)
+        if root is None:
+            constants, nodes = self._span(self.asts_offset, index)
+            root = self.asts[index] = artifact.decode_nodes(
+                constants, nodes)[-1]
+        return root
+
+    @property
+    def defined_names(self):
+        """The addresses of the defined names of cells and ranges."""
+        if self._defined_names is None:
+            names = {}
+            for name, (kind, index) in self.tables[2].items():
+                if kind == artifact.CELL:
+                    names[name] = self.constants[index]
+                elif kind == artifact.RANGE:
+                    names[name] = self.range(index).address
+            self._defined_names = names
+        return self._defined_names
+
+    def formula(self, index):
+        """The `XLFormula` at `index`, decoded (or parsed) once."""
+        formula = self.formulas.get(index)
+        if formula is None:
+            constants, record = self._span(self.formulas_offset, index)
+            formula = artifact.decode_formula(constants, record, self.ast)
+            ast = record[-1]
+            if ast == artifact.NONE:
+                formula.ast = parser.FormulaParser().parse(
+                    formula.formula, self.defined_names)
+                if self.compiled:
+                    formula.code = formula.ast.compile()
+            elif self.compiled:
+                code = self.codes.get(ast)
+                if code is None:
+                    code = self.codes[ast] = formula.ast.compile()
+                formula.code = code
+            self.formulas[index] = formula
+        return formula
+
+    def range(self, index):
+        """A new `XLRange` for the range at `index`, sharing its cells."""
+        rng = artifact.decode_range(
+            self.constants, self.range_records[index],
+            self.range_cells.get(index))
+        self.range_cells[index] = rng.cells
+        return rng
+
+    def load(self, model):
+        """Make `model` a private overlay of the snapshot.
+
+        The dependency graph is not built, as it would decode every cell;
+        call `Model.build_dependency_graph()` if it is needed.
+        """
+        ranges = {}
+
+        def load_range(index):
+            rng = ranges.get(index)
+            if rng is None:
+                rng = ranges[index] = self.range(index)
+            return rng
+
+        model.cells = Overlay(self)
+        objects = {
+            artifact.CELL: lambda index: model.cells[self.constants[index]],
+            artifact.RANGE: load_range,
+            artifact.FORMULA: self.formula,
+        }
+        model.formulae, model.ranges, model.defined_names = (
+            Overlay(_Entries(entries, objects)) for entries in self.tables)
+        model.dependency_graph = graph.DependencyGraph()
+        return model
@@ -0,0 +1,119 @@
+"""Sparse spatial index of the cells of a model.
+
+`SpatialIndex` keeps, for each sheet, the sorted rows that have cells and
+the sorted columns of the cells of each row, so that the cells within a
+rectangle are found without visiting its blank cells, and the used range
+of a sheet is known without scanning.
+"""
+import bisect
+
+from openpyxl.utils.cell import column_index_from_string
+
+from . import addresses
+
+
+class SheetIndex:
+    """The cells of a sheet, as sorted (column, address) pairs by row."""
+
+    def __init__(self):
+        self.rows = {}
+        # The rows having cells, sorted.
+        self.row_numbers = []
+        # An upper bound of the columns having cells.
+        self.max_col = 0
+
+    @property
+    def used_bounds(self):
+        """The (max_row, max_col) of the cells, (0, 0) if there are none."""
+        return (self.row_numbers[-1] if self.row_numbers else 0,
+                self.max_col)
+
+    def add(self, row, col, address):
+        cols = self.rows.get(row)
+        if cols is None:
+            cols = self.rows[row] = []
+            bisect.insort(self.row_numbers, row)
+        position = bisect.bisect_left(cols, (col,))
+        if position < len(cols) and cols[position][0] == col:
+            cols[position] = (col, address)
+        else:
+            cols.insert(position, (col, address))
+        self.max_col = max(self.max_col, col)
+
+    def remove(self, row, col):
+        cols = self.rows.get(row, ())
+        position = bisect.bisect_left(cols, (col,))
+        if position < len(cols) and cols[position][0] == col:
+            del cols[position]
+            if not cols:
+                del self.rows[row]
+                self.row_numbers.remove(row)
+
+    def cells(self, bounds):
+        """The (row, column, address) of the cells within `bounds`
+        (min_row, min_col, max_row, max_col), row by row."""
+        min_row, min_col, max_row, max_col = bounds
+        start = bisect.bisect_left(self.row_numbers, min_row)
+        stop = bisect.bisect_right(self.row_numbers, max_row)
+        for row in self.row_numbers[start:stop]:
+            cols = self.rows[row]
+            first = bisect.bisect_left(cols, (min_col,))
+            last = bisect.bisect_left(cols, (max_col + 1,))
+            for col, address in cols[first:last]:
+                yield row, col, address
+
+
+def cell_position(address):
+    """The (sheet, row, column) of a cell address, None if it is not one."""
+    try:
+        sheet, col, row = addresses.split_address(address)
+        return sheet, row, column_index_from_string(col)
+    except (KeyError, ValueError):
+        return None
+
+
+class SpatialIndex:
+    """The `SheetIndex` of each sheet of `cells`, a mapping by address."""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.sheets = {}
+        positions = []
+        for address in cells:
+            position = cell_position(address)
+            if position is not None:
+                positions.append(position + (address,))
+        # Cells are added in order, so that rows and columns are appended.
+        positions.sort()
+        for sheet, row, col, address in positions:
+            self.sheet(sheet).add(row, col, address)
+
+    def sheet(self, sheet):
+        """The index of `sheet`, created if needed."""
+        index = self.sheets.get(sheet)
+        if index is None:
+            index = self.sheets[sheet] = SheetIndex()
+        return index
+
+    def add(self, address):
+        position = cell_position(address)
+        if position is not None:
+            sheet, row, col = position
+            self.sheet(sheet).add(row, col, address)
+
+    def remove(self, address):
+        position = cell_position(address)
+        if position is not None and position[0] in self.sheets:
+            sheet, row, col = position
+            self.sheets[sheet].remove(row, col)
+
+    def used_bounds(self, sheet):
+        """The (max_row, max_col) of the cells of `sheet`."""
+        index = self.sheets.get(sheet)
+        return index.used_bounds if index is not None else (0, 0)
+
+    def cells_within(self, sheet, bounds):
+        """The (row, column, address) of the cells of `sheet` within
+        `bounds`, see `SheetIndex.cells()`."""
+        index = self.sheets.get(sheet)
+        return index.cells(bounds) if index is not None else ()
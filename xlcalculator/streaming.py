@@ -0,0 +1,267 @@
+"""Single-pass reader of the worksheets of an xlsx archive.
+
+Worksheets are streamed with `iterparse` directly from the zip archive. Unlike
+`openpyxl.load_workbook()`, no worksheet, cell or style objects are built and
+formula cells are parsed once, capturing the formula and its cached value
+together.
+"""
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+from openpyxl.cell.text import Text
+from openpyxl.formula.tokenizer import Token
+from openpyxl.formula.translate import Translator
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601)
+from openpyxl.xml.constants import PKG_REL_NS, REL_NS, SHEET_MAIN_NS
+
+from . import shapes, utils, xltypes
+
+CELL_TAG = f'{{{SHEET_MAIN_NS}}}c'
+ROW_TAG = f'{{{SHEET_MAIN_NS}}}row'
+VALUE_TAG = f'{{{SHEET_MAIN_NS}}}v'
+FORMULA_TAG = f'{{{SHEET_MAIN_NS}}}f'
+INLINE_STRING_TAG = f'{{{SHEET_MAIN_NS}}}is'
+SHEET_TAG = f'{{{SHEET_MAIN_NS}}}sheet'
+DEFINED_NAME_TAG = f'{{{SHEET_MAIN_NS}}}definedName'
+WORKBOOK_PR_TAG = f'{{{SHEET_MAIN_NS}}}workbookPr'
+RELATIONSHIP_TAG = f'{{{PKG_REL_NS}}}Relationship'
+RELATIONSHIP_ID = f'{{{REL_NS}}}id'
+
+OFFICE_DOCUMENT_REL = '/officeDocument'
+WORKSHEET_REL = '/worksheet'
+SHARED_STRINGS_REL = '/sharedStrings'
+STYLES_REL = '/styles'
+
+
+def cast_number(value):
+    """Convert a number as string to an int or float, like openpyxl."""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def read_relationships(archive, path):
+    """Map the relationship ids of the part at `path` to (type, target)."""
+    folder, name = posixpath.split(path)
+    rels_path = posixpath.join(folder, '_rels', f'{name}.rels')
+    if rels_path not in archive.namelist():
+        return {}
+    rels = {}
+    root = ElementTree.fromstring(archive.read(rels_path))
+    for rel in root.iter(RELATIONSHIP_TAG):
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        rels[rel.get('Id')] = (rel.get('Type'), target)
+    return rels
+
+
+def shared_formula(formula, coordinate):
+    """Translate the formula of the master cell of a shared formula.
+
+    Returns a function taking the coordinate of another cell of the shared
+    formula and returning its formula. References are moved in the formula
+    text (`utils.shift_references()`), without tokenizing it again for every
+    cell, unless the formula has references the text cannot tell apart.
+    """
+    translator = Translator(formula, coordinate)
+    references = sum(
+        utils.count_references(token.value)
+        for token in translator.tokenizer.items
+        if token.type == Token.OPERAND and token.subtype == Token.RANGE)
+    if references != utils.count_references(formula):
+        return translator.translate_formula
+
+    row, col = coordinate_to_tuple(coordinate)
+
+    def translate(dest):
+        dest_row, dest_col = coordinate_to_tuple(dest)
+        try:
+            return utils.shift_references(
+                formula, dest_row - row, dest_col - col)
+        except ValueError:
+            return translator.translate_formula(dest)
+
+    return translate
+
+
+def find_relationship(rels, rel_type):
+    for type_, target in rels.values():
+        if type_.endswith(rel_type):
+            return target
+    return None
+
+
+class Workbook:
+    """The workbook-level parts of an xlsx archive.
+
+    The workbook, its relationships, shared strings and styles are read when
+    the workbook is created. Worksheets are only read by `read_sheet()`.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        # Worksheet names mapped to their part in the archive, in order.
+        self.sheets = {}
+        self.defined_names = {}
+        self.epoch = CALENDAR_WINDOWS_1900
+        self.shared_strings = []
+        self.date_formats = set()
+        self.timedelta_formats = set()
+        with zipfile.ZipFile(file_name) as archive:
+            self._read_workbook(archive)
+
+    @property
+    def sheetnames(self):
+        return list(self.sheets)
+
+    def _read_workbook(self, archive):
+        path = find_relationship(
+            read_relationships(archive, ''), OFFICE_DOCUMENT_REL)
+        path = path or 'xl/workbook.xml'
+        rels = read_relationships(archive, path)
+
+        root = ElementTree.fromstring(archive.read(path))
+        properties = root.find(WORKBOOK_PR_TAG)
+        if properties is not None and \
+                properties.get('date1904') in ('1', 'true'):
+            self.epoch = CALENDAR_MAC_1904
+
+        for sheet in root.iter(SHEET_TAG):
+            rel_type, target = rels.get(
+                sheet.get(RELATIONSHIP_ID), ('', None))
+            # Chart sheets and dangling sheets have no cells.
+            if rel_type.endswith(WORKSHEET_REL) and \
+                    target in archive.namelist():
+                self.sheets[sheet.get('name')] = target
+
+        for defn in root.iter(DEFINED_NAME_TAG):
+            # Like openpyxl's `Workbook.defined_names`, only global names.
+            if defn.get('localSheetId') is not None:
+                continue
+            if defn.get('hidden') is None and defn.text != '#REF!':
+                self.defined_names[defn.get('name')] = defn.text
+
+        strings_path = find_relationship(rels, SHARED_STRINGS_REL)
+        if strings_path is not None:
+            with archive.open(strings_path) as source:
+                self.shared_strings = read_string_table(source)
+
+        styles_path = find_relationship(rels, STYLES_REL)
+        if styles_path is not None:
+            stylesheet = Stylesheet.from_tree(
+                ElementTree.fromstring(archive.read(styles_path)))
+            self.date_formats = stylesheet.date_formats
+            self.timedelta_formats = stylesheet.timedelta_formats
+
+    def iter_cells(self, sheet_name):
+        """Stream the cells of a worksheet.
+
+        Yields ``(coordinate, value, formula, shared_index)`` tuples. For
+        formula cells `value` is the cached value and `formula` the formula
+        text, shared formulas being translated to the cell; `shared_index`
+        is the ``si`` of a shared formula, None otherwise.
+        """
+        shared_formulae = {}
+        row_counter = col_counter = 0
+        with zipfile.ZipFile(self.file_name) as archive, \
+                archive.open(self.sheets[sheet_name]) as source:
+            for event, element in ElementTree.iterparse(
+                    source, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == ROW_TAG:
+                        row_counter = int(element.get('r', row_counter + 1))
+                        col_counter = 0
+                    continue
+                if tag == ROW_TAG:
+                    element.clear()
+                    continue
+                if tag != CELL_TAG:
+                    continue
+
+                coordinate = element.get('r')
+                if coordinate:
+                    col_counter = coordinate_to_tuple(coordinate)[1]
+                else:
+                    col_counter += 1
+                    coordinate = \
+                        f'{get_column_letter(col_counter)}{row_counter}'
+
+                formula = shared_index = None
+                formula_element = element.find(FORMULA_TAG)
+                if formula_element is not None:
+                    formula = '=' + (formula_element.text or '')
+                    if formula_element.get('t') == 'shared':
+                        shared_index = formula_element.get('si')
+                        if shared_index in shared_formulae:
+                            formula = shared_formulae[shared_index](
+                                coordinate)
+                        elif formula != '=':
+                            shared_formulae[shared_index] = \
+                                shared_formula(formula, coordinate)
+
+                yield (coordinate, self._cell_value(element), formula,
+                       shared_index)
+
+    def _cell_value(self, element):
+        data_type = element.get('t', 'n')
+        if data_type == 'inlineStr':
+            child = element.find(INLINE_STRING_TAG)
+            return None if child is None else Text.from_tree(child).content
+
+        value = element.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+        if data_type == 'n':
+            value = cast_number(value)
+            style_id = int(element.get('s', 0))
+            if style_id in self.date_formats:
+                try:
+                    return from_excel(
+                        value, self.epoch,
+                        timedelta=style_id in self.timedelta_formats)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return value
+        if data_type == 's':
+            return self.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        return value
+
+    def read_sheet(self, sheet_name):
+        """Read the cells and formulae of a worksheet, keyed by address."""
+        return build_cells(sheet_name, (
+            (coordinate, value, formula)
+            for coordinate, value, formula, _ in self.iter_cells(sheet_name)
+        ))
+
+
+def build_cells(sheet_name, records):
+    """Build the cells and formulae of a worksheet, keyed by address.
+
+    `records` are ``(coordinate, value, formula)`` tuples, `formula` being
+    the formula text or None.
+    """
+    cells = {}
+    formulae = {}
+    # Formulas filled down or across are tokenized once.
+    formula_shapes = shapes.FormulaShapes()
+    for coordinate, value, formula_text in records:
+        addr = f'{sheet_name}!{coordinate}'
+        formula = None
+        if formula_text is not None:
+            formula = formula_shapes.formula(formula_text, sheet_name, addr)
+            formulae[addr] = formula
+        cells[addr] = xltypes.XLCell(addr, value=value, formula=formula)
+    return cells, formulae
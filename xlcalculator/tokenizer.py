@@ -20,10 +20,17 @@
 # ========================================================================
 
 import re
-from dataclasses import dataclass, field
-import uuid
 from string import ascii_uppercase
 
+# A mantissa and exponent sign follow, e.g. "1.5E" of "1.5E+3".
+SCIENTIFIC_RE = re.compile(r'^[1-9]{1}(\.[0-9]+)?[eE]{1}$')
+ERRORS = frozenset((
+    "#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"))
+MAX_ERROR_LENGTH = max(len(error) for error in ERRORS)
+# Characters of operands, up to the next character with a meaning.
+PLAIN_RUN_RE = re.compile(r'[^"\'\[#{};\n ,()$%+\-*/^&=><]*')
+PLAIN_RUN_RANGE_RE = re.compile(r'[^"\'\[#{};\n ,()$%+\-*/^&=><:]*')
+
 
 def col2num(col):
     if not col:
@@ -88,11 +95,6 @@ class ExcelParserTokens(object):
     TOK_SUBTYPE_NONE = "none"
 
 
-def init_uuid():
-    """Default factory to initialise Formula.ranges."""
-    return uuid.uuid4()
-
-
 # ========================================================================
 #        Class: f_token
 #  Description: Encapsulate a formula token
@@ -102,16 +104,40 @@ def init_uuid():
 #               tsubtype - See token definitions, above, for values
 #
 #      Methods: f_token  - __init__()
+#
+#        Notes: Tokens compare by identity: equal values at two places of a
+#               formula are two different tokens.
 # ========================================================================
-@dataclass
 class f_token:
 
-    tvalue: str
-    ttype: str
-    tsubtype: str
-    unique_identifier: uuid = field(
-        init=False, default_factory=init_uuid, compare=True, hash=True,
-        repr=True)
+    __slots__ = ('tvalue', 'ttype', 'tsubtype')
+
+    def __init__(self, tvalue, ttype, tsubtype):
+        self.tvalue = tvalue
+        self.ttype = ttype
+        self.tsubtype = tsubtype
+
+    def __getstate__(self):
+        return {
+            'tvalue': self.tvalue,
+            'ttype': self.ttype,
+            'tsubtype': self.tsubtype,
+        }
+
+    def __setstate__(self, state):
+        self.tvalue = state['tvalue']
+        self.ttype = state['ttype']
+        self.tsubtype = state['tsubtype']
+
+    @property
+    def unique_identifier(self):
+        return None
+
+    @unique_identifier.setter
+    def unique_identifier(self, value):
+        # Tokens persisted by older versions have a UUID, which is not
+        # needed anymore.
+        pass
 
     def __repr__(self):
         return "<{} tvalue: {} ttype: {} tsubtype: {}>".format(
@@ -258,438 +284,319 @@ class ExcelParser(ExcelParserTokens):
     def __init__(self, tokenize_range=False):
         if tokenize_range:
             self.OPERATORS = "+-*/^&=><:"
+            self.plain_run = PLAIN_RUN_RANGE_RE
         else:
             self.OPERATORS = "+-*/^&=><"
+            self.plain_run = PLAIN_RUN_RE
 
     def getTokens(self, formula):
-
-        def currentChar():
-            return formula[offset]
-
-        def doubleChar():
-            return formula[offset:offset + 2]
-
-        def nextChar():
-            # JavaScript returns an empty string if the index is out of bounds,
-            # Python throws an IndexError.  We mimic this behaviour here.
-            try:
-                formula[offset + 1]
-            except IndexError:
-                return ""
-            else:
-                return formula[offset + 1]
-
-        def EOF():
-            return offset >= len(formula)
-
-        tokens = f_tokens()
+        # The formula is scanned once. Characters without a meaning of their
+        # own are consumed in runs and quoted strings up to their closing
+        # quote, so that the work is linear in the length of the formula.
+        OPERAND = self.TOK_TYPE_OPERAND
+        FUNCTION = self.TOK_TYPE_FUNCTION
+        SUBEXPR = self.TOK_TYPE_SUBEXPR
+        OP_IN = self.TOK_TYPE_OP_IN
+        START = self.TOK_SUBTYPE_START
+        OPERATORS = self.OPERATORS
+        plain_run = self.plain_run.match
+
+        items = []
+        add = items.append
         tokenStack = f_tokenStack()
-        offset = 0
         token = ""
-        inString = False
-        inPath = False
-        inRange = False
-        inError = False
-
-        while (len(formula) > 0):
-            if (formula[0] in (" ", "\n")):
-                formula = formula[1:]
 
-            else:
-                if (formula[0] == "="):
-                    formula = formula[1:]
-                break
+        formula = formula.lstrip(" \n")
+        if formula[:1] == "=":
+            formula = formula[1:]
+        offset = 0
+        length = len(formula)
 
         # state-dependent character evaluation (order is important)
-        while not EOF():
+        while offset < length:
+            char = formula[offset]
+
+            # scientific notation check
+            if char in "+-" and len(token) > 1 and SCIENTIFIC_RE.match(token):
+                token += char
+                offset += 1
+                continue
+
             # double-quoted strings
             # embeds are doubled
             # end marks token
-            if inString:
-                if currentChar() == "\"":
-                    if nextChar() == "\"":
-                        token += "\""
-                        offset += 1
-
-                    else:
-                        inString = False
-                        tokens.add(
-                            token, self.TOK_TYPE_OPERAND,
-                            self.TOK_SUBTYPE_TEXT)
-                        token = ""
-
-                else:
-                    token += currentChar()
+            if char == "\"":
+                if token:
+                    # not expected
+                    add(f_token(token, self.TOK_TYPE_UNKNOWN, ""))
+                token = ""
                 offset += 1
+                while True:
+                    end = formula.find("\"", offset)
+                    if end == -1:
+                        # not terminated, kept as an operand
+                        token += formula[offset:]
+                        offset = length
+                        break
+                    token += formula[offset:end]
+                    offset = end + 1
+                    if formula[offset:offset + 1] != "\"":
+                        add(f_token(token, OPERAND, self.TOK_SUBTYPE_TEXT))
+                        token = ""
+                        break
+                    token += "\""
+                    offset += 1
                 continue
 
             # single-quoted strings (links)
             # embeds are double
             # end does not mark a token
-            if inPath:
-                if currentChar() == "'":
-                    if nextChar() == "'":
-                        token += "'"
-                        offset += 1
-
-                    else:
-                        inPath = False
-
-                else:
-                    token += currentChar()
+            if char == "'":
+                if token:
+                    # not expected
+                    add(f_token(token, self.TOK_TYPE_UNKNOWN, ""))
+                    token = ""
                 offset += 1
+                while True:
+                    end = formula.find("'", offset)
+                    if end == -1:
+                        token += formula[offset:]
+                        offset = length
+                        break
+                    token += formula[offset:end]
+                    offset = end + 1
+                    if formula[offset:offset + 1] != "'":
+                        break
+                    token += "'"
+                    offset += 1
                 continue
 
             # bracketed strings (range offset or linked workbook name)
             # no embeds (changed to "()" by Excel)
             # end does not mark a token
-            if inRange:
-                if currentChar() == "]":
-                    inRange = False
-                token += currentChar()
-                offset += 1
+            if char == "[":
+                end = formula.find("]", offset)
+                end = length if end == -1 else end + 1
+                token += formula[offset:end]
+                offset = end
                 continue
 
             # error values
             # end marks a token, determined from absolute list of values
-            if inError:
-                token += currentChar()
-                offset += 1
-                if ",#NULL!,#DIV/0!,#VALUE!,#REF!,#NAME?,#NUM!,#N/A,".find(
-                        "," + token + ",") != -1:
-                    inError = False
-                    tokens.add(
-                        token, self.TOK_TYPE_OPERAND, self.TOK_SUBTYPE_ERROR)
-                    token = ""
-                continue
-
-            # scientific notation check
-            regexSN = r'^[1-9]{1}(\.[0-9]+)?[eE]{1}$'
-            if (("+-").find(currentChar()) != -1):
-                if len(token) > 1:
-                    if re.match(regexSN, token):
-                        token += currentChar()
-                        offset += 1
-                        continue
-
-            # independent character evaulation (order not important)
-            #
-            # establish state-dependent character evaluations
-            if currentChar() == "\"":
-                if len(token) > 0:
-                    # not expected
-                    tokens.add(token, self.TOK_TYPE_UNKNOWN)
-                    token = ""
-                inString = True
-                offset += 1
-                continue
-
-            if currentChar() == "'":
-                if len(token) > 0:
-                    # not expected
-                    tokens.add(token, self.TOK_TYPE_UNKNOWN)
-                    token = ""
-                inPath = True
-                offset += 1
-                continue
-
-            if (currentChar() == "["):
-                inRange = True
-                token += currentChar()
-                offset += 1
-                continue
-
-            if (currentChar() == "#"):
-                if (len(token) > 0):
+            if char == "#":
+                if token:
                     # not expected
-                    tokens.add(token, self.TOK_TYPE_UNKNOWN)
-                    token = ""
-                inError = True
-                token += currentChar()
-                offset += 1
+                    add(f_token(token, self.TOK_TYPE_UNKNOWN, ""))
+                for end in range(offset + 2, offset + MAX_ERROR_LENGTH + 1):
+                    if formula[offset:end] in ERRORS:
+                        add(f_token(
+                            formula[offset:end], OPERAND,
+                            self.TOK_SUBTYPE_ERROR))
+                        token = ""
+                        offset = end
+                        break
+                else:
+                    # not an error value, the rest is one operand
+                    token = formula[offset:]
+                    offset = length
                 continue
 
             # mark start and end of arrays and array rows
-            if (currentChar() == "{"):
-                if (len(token) > 0):
+            if char == "{":
+                if token:
                     # not expected
-                    tokens.add(token, self.TOK_TYPE_UNKNOWN)
+                    add(f_token(token, self.TOK_TYPE_UNKNOWN, ""))
                     token = ""
-                tokenStack.push(tokens.add(
-                    "ARRAY",
-                    self.TOK_TYPE_FUNCTION, self.TOK_SUBTYPE_START))
-                tokenStack.push(tokens.add(
-                    "ARRAYROW",
-                    self.TOK_TYPE_FUNCTION, self.TOK_SUBTYPE_START))
+                for value in ("ARRAY", "ARRAYROW"):
+                    array = f_token(value, FUNCTION, START)
+                    add(array)
+                    tokenStack.push(array)
                 offset += 1
                 continue
 
-            if (currentChar() == ";"):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char == ";":
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.addRef(tokenStack.pop())
-                tokens.add(",", self.TOK_TYPE_ARGUMENT)
-                tokenStack.push(tokens.add(
-                    "ARRAYROW",
-                    self.TOK_TYPE_FUNCTION, self.TOK_SUBTYPE_START))
+                add(tokenStack.pop())
+                add(f_token(",", self.TOK_TYPE_ARGUMENT, ""))
+                array = f_token("ARRAYROW", FUNCTION, START)
+                add(array)
+                tokenStack.push(array)
                 offset += 1
                 continue
 
-            if (currentChar() == "}"):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char == "}":
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.addRef(tokenStack.pop())
-                tokens.addRef(tokenStack.pop())
+                add(tokenStack.pop())
+                add(tokenStack.pop())
                 offset += 1
                 continue
 
             # trim white-space
-            if (currentChar() in (" ", "\n")):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char in " \n":
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.add("", self.TOK_TYPE_WSPACE)
+                add(f_token("", self.TOK_TYPE_WSPACE, ""))
                 offset += 1
-                while ((currentChar() in (" ", "\n")) and (not EOF())):
+                while offset < length and formula[offset] in " \n":
                     offset += 1
                 continue
 
             # multi-character comparators
-            if (",>=,<=,<>,".find("," + doubleChar() + ",") != -1):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if formula[offset:offset + 2] in ("<=", ">=", "<>"):
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.add(
-                    doubleChar(),
-                    self.TOK_TYPE_OP_IN, self.TOK_SUBTYPE_LOGICAL)
+                add(f_token(
+                    formula[offset:offset + 2], OP_IN,
+                    self.TOK_SUBTYPE_LOGICAL))
                 offset += 2
                 continue
 
             # standard infix operators
-            if (self.OPERATORS.find(currentChar()) != -1):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char in OPERATORS:
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.add(currentChar(), self.TOK_TYPE_OP_IN)
+                add(f_token(char, OP_IN, ""))
                 offset += 1
                 continue
 
             # standard postfix operators
-            if ("%".find(currentChar()) != -1):
-                if (len(token) > 0):
-                    tokens.add(float(token) / 100, self.TOK_TYPE_OPERAND)
+            if char == "%":
+                if token:
+                    add(f_token(float(token) / 100, OPERAND, ""))
                     token = ""
                 else:
-                    tokens.add('*', self.TOK_TYPE_OP_IN)
-                    tokens.add(0.01, self.TOK_TYPE_OPERAND)
-                # tokens.add(currentChar(), self.TOK_TYPE_OP_POST)
+                    add(f_token('*', OP_IN, ""))
+                    add(f_token(0.01, OPERAND, ""))
                 offset += 1
                 continue
 
             # start subexpression or function
-            if (currentChar() == "("):
-                if (len(token) > 0):
-                    tokenStack.push(tokens.add(
-                        token, self.TOK_TYPE_FUNCTION, self.TOK_SUBTYPE_START))
+            if char == "(":
+                if token:
+                    start = f_token(token, FUNCTION, START)
                     token = ""
                 else:
-                    tokenStack.push(tokens.add(
-                        "", self.TOK_TYPE_SUBEXPR, self.TOK_SUBTYPE_START))
+                    start = f_token("", SUBEXPR, START)
+                add(start)
+                tokenStack.push(start)
                 offset += 1
                 continue
 
             # function, subexpression, array parameters
-            if (currentChar() == ","):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char == ",":
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                if (not (tokenStack.type() == self.TOK_TYPE_FUNCTION)):
-                    tokens.add(
-                        currentChar(),
-                        self.TOK_TYPE_OP_IN, self.TOK_SUBTYPE_UNION)
+                if tokenStack.type() != FUNCTION:
+                    add(f_token(char, OP_IN, self.TOK_SUBTYPE_UNION))
                 else:
-                    tokens.add(currentChar(), self.TOK_TYPE_ARGUMENT)
+                    add(f_token(char, self.TOK_TYPE_ARGUMENT, ""))
                 offset += 1
-                if (currentChar() == ","):
-                    tokens.add(
-                        'None',
-                        self.TOK_TYPE_OPERAND, self.TOK_SUBTYPE_NONE)
-                    token = ""
+                if formula[offset:offset + 1] == ",":
+                    add(f_token('None', OPERAND, self.TOK_SUBTYPE_NONE))
                 continue
 
             # stop subexpression
-            if (currentChar() == ")"):
-                if (len(token) > 0):
-                    tokens.add(token, self.TOK_TYPE_OPERAND)
+            if char == ")":
+                if token:
+                    add(f_token(token, OPERAND, ""))
                     token = ""
-                tokens.addRef(tokenStack.pop())
+                add(tokenStack.pop())
                 offset += 1
                 continue
 
             # absolute references
-            if (currentChar() == "$"):
-                # print("$$$ Dropping a $$$")
+            if char == "$":
                 offset += 1
                 continue
 
             # token accumulation
-            token += currentChar()
-            offset += 1
+            end = plain_run(formula, offset).end()
+            if end == offset:
+                end += 1
+            token += formula[offset:end]
+            offset = end
 
         # dump remaining accumulation
-        if (len(token) > 0):
-            tokens.add(token, self.TOK_TYPE_OPERAND)
+        if token:
+            add(f_token(token, OPERAND, ""))
 
         # move all tokens to a new collection, excluding all unnecessary
         # white-space tokens
-        tokens2 = f_tokens()
-
-        while (tokens.moveNext()):
-            token = tokens.current()
-
-            if (token.ttype == self.TOK_TYPE_WSPACE):
-                if ((tokens.BOF()) or (tokens.EOF())):
-                    pass
-                elif (not (
-                     (
-                         (tokens.previous().ttype == self.TOK_TYPE_FUNCTION)
-                         and (tokens.previous().tsubtype
-                              == self.TOK_SUBTYPE_STOP)
-                     ) or (
-                         (tokens.previous().ttype == self.TOK_TYPE_SUBEXPR)
-                         and (tokens.previous().tsubtype
-                              == self.TOK_SUBTYPE_STOP)
-                     ) or (
-                         tokens.previous().ttype == self.TOK_TYPE_OPERAND
-                     )
-                )):
-                    pass
-                elif (not (
-                    (
-                        (tokens.next().ttype == self.TOK_TYPE_FUNCTION)
-                        and (tokens.next().tsubtype
-                             == self.TOK_SUBTYPE_START)
-                    ) or (
-                        (tokens.next().ttype == self.TOK_TYPE_SUBEXPR)
-                        and (tokens.next().tsubtype == self.TOK_SUBTYPE_START)
-                    ) or (
-                        tokens.next().ttype == self.TOK_TYPE_OPERAND)
-                )):
-                    pass
-                else:
-                    tokens2.add(
-                        token.tvalue, self.TOK_TYPE_OP_IN,
-                        self.TOK_SUBTYPE_INTERSECT)
-                continue
-
-            tokens2.addRef(token)
+        last = len(items) - 1
+        items2 = []
+        for index, token in enumerate(items):
+            if token.ttype != self.TOK_TYPE_WSPACE:
+                items2.append(token)
+            elif (
+                0 < index < last
+                and (
+                    items[index - 1].ttype == OPERAND
+                    or (items[index - 1].ttype in (FUNCTION, SUBEXPR)
+                        and items[index - 1].tsubtype == self.TOK_SUBTYPE_STOP)
+                )
+                and (
+                    items[index + 1].ttype == OPERAND
+                    or (items[index + 1].ttype in (FUNCTION, SUBEXPR)
+                        and items[index + 1].tsubtype == START)
+                )
+            ):
+                items2.append(f_token(
+                    token.tvalue, OP_IN, self.TOK_SUBTYPE_INTERSECT))
 
         # switch infix "-" operator to prefix when appropriate, switch infix
         # "+" operator to noop when appropriate, identify operand and
         # infix-operator subtypes, pull "@" from in front of function names
-        while (tokens2.moveNext()):
-            token = tokens2.current()
-            if (
-                    (token.ttype == self.TOK_TYPE_OP_IN)
-                    and (token.tvalue == "-")
-            ):
-                if (tokens2.BOF()):
-                    token.ttype = self.TOK_TYPE_OP_PRE
-                elif (
-                    (
-                        (tokens2.previous().ttype == self.TOK_TYPE_FUNCTION)
-                        and (tokens2.previous().tsubtype
-                             == self.TOK_SUBTYPE_STOP)
-                    ) or (
-                        (tokens2.previous().ttype == self.TOK_TYPE_SUBEXPR)
-                        and (tokens2.previous().tsubtype
-                             == self.TOK_SUBTYPE_STOP)
-                    ) or (
-                        tokens2.previous().ttype == self.TOK_TYPE_OP_POST
-                    ) or (
-                        tokens2.previous().ttype == self.TOK_TYPE_OPERAND
-                    )
+        previous = None
+        for token in items2:
+            ttype = token.ttype
+            if ttype == OP_IN and token.tvalue in ("-", "+"):
+                if previous is not None and (
+                    previous.ttype in (OPERAND, self.TOK_TYPE_OP_POST)
+                    or (previous.ttype in (FUNCTION, SUBEXPR)
+                        and previous.tsubtype == self.TOK_SUBTYPE_STOP)
                 ):
                     token.tsubtype = self.TOK_SUBTYPE_MATH
-
-                else:
+                elif token.tvalue == "-":
                     token.ttype = self.TOK_TYPE_OP_PRE
-
-                continue
-
-            if (
-                    (token.ttype == self.TOK_TYPE_OP_IN)
-                    and (token.tvalue == "+")
-            ):
-                if tokens2.BOF():
-                    token.ttype = self.TOK_TYPE_NOOP
-                elif (
-                    (
-                        (tokens2.previous().ttype == self.TOK_TYPE_FUNCTION)
-                        and (tokens2.previous().tsubtype
-                             == self.TOK_SUBTYPE_STOP)
-                    ) or (
-                        (tokens2.previous().ttype == self.TOK_TYPE_SUBEXPR)
-                        and (tokens2.previous().tsubtype
-                             == self.TOK_SUBTYPE_STOP)
-                    ) or (
-                        tokens2.previous().ttype == self.TOK_TYPE_OP_POST
-                    ) or (
-                        tokens2.previous().ttype == self.TOK_TYPE_OPERAND
-                    )
-                ):
-                    token.tsubtype = self.TOK_SUBTYPE_MATH
-
                 else:
                     token.ttype = self.TOK_TYPE_NOOP
 
-                continue
-
-            if ((token.ttype == self.TOK_TYPE_OP_IN)
-                    and (len(token.tsubtype) == 0)):
-                if (("<>=").find(token.tvalue[0:1]) != -1):
+            elif ttype == OP_IN and not token.tsubtype:
+                if token.tvalue[0:1] in ("<", ">", "="):
                     token.tsubtype = self.TOK_SUBTYPE_LOGICAL
-
-                elif (token.tvalue == "&"):
+                elif token.tvalue == "&":
                     token.tsubtype = self.TOK_SUBTYPE_CONCAT
-
                 else:
                     token.tsubtype = self.TOK_SUBTYPE_MATH
 
-                continue
-
-            if ((token.ttype == self.TOK_TYPE_OPERAND)
-                    and (len(token.tsubtype) == 0)):
+            elif ttype == OPERAND and not token.tsubtype:
                 try:
                     float(token.tvalue)
-
                 except ValueError:
-                    if ((token.tvalue == 'TRUE') or (token.tvalue == 'FALSE')):
+                    if token.tvalue in ('TRUE', 'FALSE'):
                         token.tsubtype = self.TOK_SUBTYPE_LOGICAL
                     else:
                         token.tsubtype = self.TOK_SUBTYPE_RANGE
                 else:
                     token.tsubtype = self.TOK_SUBTYPE_NUMBER
 
-                continue
-
-            if (token.ttype == self.TOK_TYPE_FUNCTION):
-                if (token.tvalue[0:1] == "@"):
-                    token.tvalue = token.tvalue[1:]
+            elif ttype == FUNCTION and token.tvalue[0:1] == "@":
+                token.tvalue = token.tvalue[1:]
 
-                continue
-
-        tokens2.reset()
+            previous = token
 
         # move all tokens to a new collection, excluding all noops
         tokens = f_tokens()
-        while (tokens2.moveNext()):
-            if (tokens2.current().ttype != self.TOK_TYPE_NOOP):
-                tokens.addRef(tokens2.current())
-
-        tokens.reset()
+        tokens.items = [
+            token for token in items2 if token.ttype != self.TOK_TYPE_NOOP]
         return tokens
 
     def parse(self, formula):
@@ -0,0 +1,118 @@
+import collections
+import functools
+import logging
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Event:
+    """A trace event.
+
+    `kind` is one of:
+
+    - ``evaluate``: a formula cell was evaluated (`value`, `duration`),
+    - ``cache-hit``: a cell or range value was served from the cache,
+    - ``error``: evaluating a formula cell failed (`formula`, `error`),
+    - ``function``: an Excel function was called (`name`, `duration`),
+    - ``set-cell-value`` / ``get-cell-value``: a model cell was accessed,
+    - ``load-sheet`` / ``ignore-sheet``: a worksheet is being read.
+    """
+    kind: str
+    address: str = None
+    data: dict = field(default_factory=dict)
+
+
+class Tracer:
+    """Dispatches trace events to sinks.
+
+    Sinks are callables receiving an `Event`. While no sink is attached the
+    tracer is disabled: code emitting events checks the `enabled` attribute
+    first, so that tracing costs nothing but that check.
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = []
+        self.enabled = False
+        for sink in sinks:
+            self.add_sink(sink)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        self.enabled = True
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+        self.enabled = bool(self.sinks)
+
+    def emit(self, kind, address=None, **data):
+        event = Event(kind, address, data)
+        for sink in self.sinks:
+            sink(event)
+
+    def timed(self, name, func):
+        """Wrap `func`, emitting a ``function`` event for every call."""
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.emit(
+                    'function', name=name,
+                    duration=time.perf_counter() - start)
+
+        return timed
+
+    def timed_namespace(self, namespace):
+        """A copy of the function `namespace` with all functions timed."""
+        return {
+            name: self.timed(name, func) for name, func in namespace.items()
+        }
+
+
+class ListSink:
+    """Collects all events in `events`."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+
+class LoggingSink:
+    """Logs all events at `level`."""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger(
+            'xlcalculator.tracing')
+        self.level = level
+
+    def __call__(self, event):
+        self.logger.log(
+            self.level, '%s %s %s', event.kind, event.address or '',
+            event.data)
+
+
+class StatsSink:
+    """Counts events and adds up their durations.
+
+    Both `counts` and `durations` are keyed by ``(kind, name)``, where
+    `name` is the function name for ``function`` events and None otherwise.
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.durations = collections.Counter()
+
+    def __call__(self, event):
+        key = (event.kind, event.data.get('name'))
+        self.counts[key] += 1
+        if 'duration' in event.data:
+            self.durations[key] += event.data['duration']
+
+
+# The tracer used by models, readers and evaluators by default.
+tracer = Tracer()
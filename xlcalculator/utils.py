@@ -1,12 +1,16 @@
 import collections
+import collections.abc
+import functools
 import re
 from openpyxl.utils.cell import COORD_RE, SHEET_TITLE
-from openpyxl.utils.cell import range_boundaries, get_column_letter
+from openpyxl.utils.cell import (
+    column_index_from_string, range_boundaries, get_column_letter)
 
 MAX_COL = 18278
 MAX_ROW = 1048576
 
 
+@functools.lru_cache(maxsize=1024)
 def resolve_sheet(sheet_str):
     sheet_str = sheet_str.strip()
     sheet_match = re.match(SHEET_TITLE.strip(), sheet_str + '!')
@@ -27,7 +31,104 @@ def resolve_address(addr):
     return sheet, col, row
 
 
+class RangeCells(collections.abc.Sequence):
+    """The cell addresses of a rectangular range, as rows of addresses.
+
+    Only the bounds (min_row, min_col, max_row, max_col) are stored; rows are
+    built when they are read. A max_row or max_col of None marks a full
+    column or row reference (like ``A:A``), which is bounded by the sheet
+    until `clip()`ped to the used range of the sheet.
+    """
+
+    def __init__(self, sheet, bounds):
+        self.sheet = sheet
+        self.bounds = bounds
+
+    @property
+    def min_row(self):
+        return self.bounds[0]
+
+    @property
+    def min_col(self):
+        return self.bounds[1]
+
+    @property
+    def max_row(self):
+        max_row = self.bounds[2]
+        return MAX_ROW if max_row is None else max_row
+
+    @property
+    def max_col(self):
+        max_col = self.bounds[3]
+        return MAX_COL if max_col is None else max_col
+
+    def clip(self, max_row, max_col):
+        """The range with full rows and columns ending at (max_row,
+        max_col), the end of the used range of the sheet."""
+        min_row, min_col, range_max_row, range_max_col = self.bounds
+        if range_max_row is None:
+            range_max_row = max(min_row, max_row)
+        if range_max_col is None:
+            range_max_col = max(min_col, max_col)
+        return RangeCells(
+            self.sheet, (min_row, min_col, range_max_row, range_max_col))
+
+    def row(self, row_idx):
+        """The addresses of a row of the sheet within the range."""
+        prefix = f'{self.sheet}!' if self.sheet else ''
+        return [
+            f'{prefix}{get_column_letter(col_idx)}{row_idx}'
+            for col_idx in range(self.min_col, self.max_col + 1)
+        ]
+
+    def __len__(self):
+        return self.max_row - self.min_row + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('range row index out of range')
+        return self.row(self.min_row + index)
+
+    def __iter__(self):
+        for row_idx in range(self.min_row, self.max_row + 1):
+            yield self.row(row_idx)
+
+    def __eq__(self, other):
+        if isinstance(other, RangeCells):
+            return (self.sheet, self.min_row, self.min_col, self.max_row,
+                    self.max_col) == (other.sheet, other.min_row,
+                                      other.min_col, other.max_row,
+                                      other.max_col)
+        if isinstance(other, list):
+            return len(self) == len(other) and list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.sheet!r}, {self.bounds!r})'
+
+
 def resolve_ranges(ranges, default_sheet='Sheet1'):
+    """The sheet and the rows of cell addresses of `ranges`.
+
+    A single area is returned as `RangeCells`, several comma separated areas
+    as a list of the rows of their union.
+    """
+    if ',' not in ranges:
+        sheet = None
+        rng = ranges
+        if '!' in rng:
+            sheet_str, rng = rng.split('!')
+            sheet = resolve_sheet(sheet_str)
+        min_col, min_row, max_col, max_row = range_boundaries(rng)
+        sheet = default_sheet if sheet is None else sheet
+        # Unbound ranges (e.g., A:A) have no max row or column.
+        return sheet, RangeCells(
+            sheet, (min_row or 1, min_col or 1, max_row, max_col))
+
     sheet = None
     range_cells = collections.defaultdict(set)
     for rng in ranges.split(','):
@@ -65,3 +166,268 @@ def resolve_ranges(ranges, default_sheet='Sheet1'):
         ]
         for row_idx, row_cells in sorted(range_cells.items())
     ]
+
+
+# A1 references in a formula. String literals, quoted sheet names and
+# bracketed (structured or external) references are matched as a whole, so
+# that nothing inside them is taken for a reference. Function names (followed
+# by "(") and sheet names (followed by "!") are not references either.
+REFERENCE_RE = re.compile(r"""
+    (?P<skip>"(?:[^"]|"")*"|'(?:[^']|'')*'|\[[^\]]*\])
+  | (?<![A-Za-z0-9_.$])
+    (?:
+        (?P<col>\$?[A-Z]{1,3})(?P<row>\$?[0-9]+)
+      | (?P<col1>\$?[A-Z]{1,3}):(?P<col2>\$?[A-Z]{1,3})
+      | (?P<row1>\$?[0-9]+):(?P<row2>\$?[0-9]+)
+    )
+    (?![A-Za-z0-9_.(!])
+""", re.VERBOSE)
+
+
+@functools.lru_cache(maxsize=65536)
+def cell_position(addr):
+    """The (row, column) index of a cell address like ``Sheet1!B3``."""
+    sheet, col, row = resolve_address(addr)
+    return int(row), column_index_from_string(col)
+
+
+def _shift_row(row, rows):
+    if row.startswith('$'):
+        return row
+    row = int(row) + rows
+    if not 0 < row <= MAX_ROW:
+        raise ValueError('Reference shifted out of the sheet.')
+    return str(row)
+
+
+def _shift_col(col, cols):
+    if col.startswith('$'):
+        return col
+    col = column_index_from_string(col) + cols
+    if not 0 < col <= MAX_COL:
+        raise ValueError('Reference shifted out of the sheet.')
+    return get_column_letter(col)
+
+
+def _relative_row(row, origin):
+    if row.startswith('$'):
+        return f'R{row[1:]}'
+    return f'R[{int(row) - origin}]'
+
+
+def _relative_col(col, origin):
+    if col.startswith('$'):
+        return f'C{column_index_from_string(col[1:])}'
+    return f'C[{column_index_from_string(col) - origin}]'
+
+
+def find_references(formula):
+    """The A1 references in `formula`, in order."""
+    return [
+        match.group() for match in REFERENCE_RE.finditer(formula)
+        if match.group('skip') is None
+    ]
+
+
+def count_references(formula):
+    """The number of A1 references in `formula`."""
+    return len(find_references(formula))
+
+
+def replace_references(formula, references):
+    """Replace the A1 references in `formula` by `references`, in order."""
+    references = iter(references)
+    return REFERENCE_RE.sub(
+        lambda match: match.group() if match.group('skip') is not None
+        else next(references),
+        formula)
+
+
+@functools.lru_cache(maxsize=65536)
+def shift_references(formula, rows, cols):
+    """Move the relative parts of all A1 references in `formula`.
+
+    Raises a `ValueError` if a reference is moved off the sheet.
+    """
+    if not rows and not cols:
+        return formula
+
+    def shift(match):
+        if match.group('skip') is not None:
+            return match.group()
+        if match.group('col') is not None:
+            return (_shift_col(match.group('col'), cols)
+                    + _shift_row(match.group('row'), rows))
+        if match.group('col1') is not None:
+            return (_shift_col(match.group('col1'), cols) + ':'
+                    + _shift_col(match.group('col2'), cols))
+        return (_shift_row(match.group('row1'), rows) + ':'
+                + _shift_row(match.group('row2'), rows))
+
+    return REFERENCE_RE.sub(shift, formula)
+
+
+ROW_PART, COL_PART = 0, 1
+
+
+def _offset_row(row, origin):
+    if row.startswith('$'):
+        return row[1:]
+    return (ROW_PART, int(row) - origin)
+
+
+def _offset_col(col, origin):
+    if col.startswith('$'):
+        return col[1:]
+    return (COL_PART, column_index_from_string(col) - origin)
+
+
+def reference_parts(formula, row, col):
+    """Split `formula` in the cell at (row, col) for `bind_references()`.
+
+    The parts are literal strings, with the "$" of absolute references
+    removed, and (ROW_PART, offset) or (COL_PART, offset) tuples for the
+    relative rows and columns of references.
+    """
+    parts = []
+    end = 0
+    for match in REFERENCE_RE.finditer(formula):
+        parts.append(formula[end:match.start()])
+        end = match.end()
+        if match.group('skip') is not None:
+            parts.append(match.group())
+        elif match.group('col') is not None:
+            parts += [_offset_col(match.group('col'), col),
+                      _offset_row(match.group('row'), row)]
+        elif match.group('col1') is not None:
+            parts += [_offset_col(match.group('col1'), col), ':',
+                      _offset_col(match.group('col2'), col)]
+        else:
+            parts += [_offset_row(match.group('row1'), row), ':',
+                      _offset_row(match.group('row2'), row)]
+    parts.append(formula[end:])
+
+    merged = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        elif part != '':
+            merged.append(part)
+    return tuple(merged)
+
+
+def bind_references(parts, row, col):
+    """The formula of `reference_parts()` moved to the cell at (row, col).
+
+    Raises a `ValueError` if a reference is moved off the sheet.
+    """
+    bound = []
+    for part in parts:
+        if isinstance(part, str):
+            bound.append(part)
+        elif part[0] == ROW_PART:
+            index = row + part[1]
+            if not 0 < index <= MAX_ROW:
+                raise ValueError('Reference shifted out of the sheet.')
+            bound.append(str(index))
+        else:
+            index = col + part[1]
+            if not 0 < index <= MAX_COL:
+                raise ValueError('Reference shifted out of the sheet.')
+            bound.append(get_column_letter(index))
+    return ''.join(bound)
+
+
+def relative_formula(formula, row, col):
+    """`formula` in the cell at (row, col) with references in R1C1 style.
+
+    Formulas filled down or across have the same relative form, e.g.
+    ``=A1*2`` in B1 and ``=A2*2`` in B2 are both ``=R[0]C[-1]*2``.
+    """
+    def relative(match):
+        if match.group('skip') is not None:
+            return match.group()
+        if match.group('col') is not None:
+            return (_relative_row(match.group('row'), row)
+                    + _relative_col(match.group('col'), col))
+        if match.group('col1') is not None:
+            return (_relative_col(match.group('col1'), col) + ':'
+                    + _relative_col(match.group('col2'), col))
+        return (_relative_row(match.group('row1'), row) + ':'
+                + _relative_row(match.group('row2'), row))
+
+    return REFERENCE_RE.sub(relative, formula)
+
+
+def range_bounds(addr):
+    """The sheet and (min_row, min_col, max_row, max_col) of a reference.
+
+    `addr` is a cell or range address like ``Sheet1!A1:B2``.
+    """
+    sheet, rng = addr.rsplit('!', 1) if '!' in addr else ('', addr)
+    min_col, min_row, max_col, max_row = range_boundaries(rng)
+    return resolve_sheet(sheet), (
+        min_row or 1, min_col or 1, max_row or MAX_ROW, max_col or MAX_COL)
+
+
+def range_address(sheet, bounds):
+    """The address of the cell or range with the given `range_bounds()`."""
+    min_row, min_col, max_row, max_col = bounds
+    if not (0 < min_row <= max_row <= MAX_ROW
+            and 0 < min_col <= max_col <= MAX_COL):
+        raise ValueError('Reference out of the sheet.')
+    addr = f'{sheet}!{get_column_letter(min_col)}{min_row}'
+    if (min_row, min_col) == (max_row, max_col):
+        return addr
+    return f'{addr}:{get_column_letter(max_col)}{max_row}'
+
+
+def join_references(left, right):
+    """The range spanning the references `left` and `right` (``:``)."""
+    sheet, left_bounds = range_bounds(left)
+    right_sheet, right_bounds = range_bounds(right)
+    if right_sheet != sheet:
+        raise ValueError(
+            f'Got multiple different sheets in ranges: {sheet}, '
+            f'{right_sheet}')
+    return range_address(sheet, (
+        min(left_bounds[0], right_bounds[0]),
+        min(left_bounds[1], right_bounds[1]),
+        max(left_bounds[2], right_bounds[2]),
+        max(left_bounds[3], right_bounds[3]),
+    ))
+
+
+def offset_reference(addr, rows, cols, height=None, width=None):
+    """The reference of ``OFFSET(addr, rows, cols, height, width)``."""
+    sheet, (min_row, min_col, max_row, max_col) = range_bounds(addr)
+    height = max_row - min_row + 1 if height is None else height
+    width = max_col - min_col + 1 if width is None else width
+    if height < 1 or width < 1:
+        raise ValueError('OFFSET height and width must be positive.')
+    min_row += rows
+    min_col += cols
+    return range_address(sheet, (
+        min_row, min_col, min_row + height - 1, min_col + width - 1))
+
+
+def index_reference(addr, row_num, column_num=None):
+    """The reference of ``INDEX(addr, row_num, column_num)``.
+
+    A row or column number of 0 selects the entire column or row. In a
+    single row, a lone number selects a column.
+    """
+    sheet, (min_row, min_col, max_row, max_col) = range_bounds(addr)
+    if column_num is None:
+        if min_row == max_row:
+            row_num, column_num = 1, row_num
+        else:
+            column_num = 0
+    if not (0 <= row_num <= max_row - min_row + 1
+            and 0 <= column_num <= max_col - min_col + 1):
+        raise ValueError('INDEX row or column number out of the range.')
+    if row_num:
+        min_row = max_row = min_row + row_num - 1
+    if column_num:
+        min_col = max_col = min_col + column_num - 1
+    return range_address(sheet, (min_row, min_col, max_row, max_col))
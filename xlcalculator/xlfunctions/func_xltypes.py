@@ -1,12 +1,16 @@
 import datetime
 import dateutil
-# import numpy
 # import pandas
 from typing import Optional, Union, NewType
 
 from . import utils, xlerrors
 from dateutil import parser
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
 NATIVE_TO_XLTYPE = {}
 
 
@@ -30,6 +34,10 @@ class ExcelType:
         inst.value = value
         return inst
 
+    def __getnewargs__(self):
+        # `__new__()` needs the value, also when unpickling.
+        return (self.value,)
+
     @classmethod
     def cast(cls, value):
         if isinstance(value, cls):
@@ -358,6 +366,10 @@ class Blank(ExcelType):
     def __new__(cls, value=None):
         return super().__new__(cls, None)
 
+    def __reduce__(self):
+        # Blanks unpickle as the shared `BLANK`.
+        return 'BLANK'
+
     @classmethod
     def is_blank(cls, value):
         return isinstance(value, (cls,) + cls.native_types) or value == ''
@@ -419,6 +431,133 @@ def _convert_nested_list(value):
     return [_convert_nested_list(item) for item in value]
 
 
+class ArrayBuffer:
+    """Columnar representation of the items of an `Array`.
+
+    The items are stored flat, in row-major order. `kinds` holds the type
+    code of every item and `values` the numeric value of all numbers,
+    booleans, dates and blanks (0 for everything else), both as NumPy
+    arrays, so that aggregates can work on whole columns at once.
+    """
+
+    BLANK, NUMBER, TEXT, BOOLEAN, DATETIME, ERROR, OTHER = range(7)
+
+    def __init__(self, items):
+        kind_of = {
+            Blank: self.BLANK,
+            Number: self.NUMBER,
+            Text: self.TEXT,
+            Boolean: self.BOOLEAN,
+            DateTime: self.DATETIME,
+        }
+        self.items = items
+        self.size = len(items)
+        self.kinds = numpy.empty(self.size, dtype=numpy.int8)
+        self.values = numpy.zeros(self.size)
+        # Whether the number each item casts to is an int.
+        self.ints = numpy.zeros(self.size, dtype=bool)
+        for idx, item in enumerate(items):
+            kind = kind_of.get(type(item), self.OTHER)
+            if kind in (self.NUMBER, self.BOOLEAN, self.DATETIME):
+                value = item.__number__()
+                self.values[idx] = value
+                self.ints[idx] = isinstance(value, int)
+            elif kind == self.BLANK:
+                # Blanks count as an int 0.
+                self.ints[idx] = True
+            elif kind == self.OTHER and isinstance(item, xlerrors.ExcelError):
+                kind = self.ERROR
+            self.kinds[idx] = kind
+        self._numbers = None
+        self._texts = None
+
+    def of_kind(self, *kinds):
+        """Mask of the items having one of the given type codes."""
+        return numpy.isin(self.kinds, kinds)
+
+    @property
+    def numbers(self):
+        """Mask and values of the items `Number.cast()` can convert.
+
+        Casting texts is expensive, so it happens once per buffer, on first
+        access.
+        """
+        if self._numbers is None:
+            castable = self.of_kind(
+                self.BLANK, self.NUMBER, self.BOOLEAN, self.DATETIME)
+            values = self.values.copy()
+            for idx in numpy.flatnonzero(~castable):
+                try:
+                    value = Number.cast(self.items[idx]).value
+                except xlerrors.ExcelError:
+                    continue
+                castable[idx] = True
+                values[idx] = value
+                self.ints[idx] = isinstance(value, int)
+            self._numbers = (castable, values)
+        return self._numbers
+
+    @property
+    def texts(self):
+        """Upper-cased text items (for case-insensitive comparisons)."""
+        if self._texts is None:
+            self._texts = numpy.array([
+                item.value.upper() if kind == self.TEXT else ''
+                for item, kind in zip(self.items, self.kinds)
+            ], dtype=object)
+        return self._texts
+
+    def sum(self, where=None):
+        """Sum of all items `Number.cast()` can convert.
+
+        `where` optionally is a mask selecting the items to add up. It may be
+        shorter or longer than the buffer; extra items are ignored.
+        """
+        castable, values = self.numbers
+        if where is not None:
+            where = numpy.asarray(where, dtype=bool)
+            size = min(self.size, len(where))
+            castable = castable.copy()
+            castable[:size] &= where[:size]
+            castable[size:] = False
+        return self.native(values[castable].sum(), castable)
+
+    def product(self):
+        """Product of all number and boolean items."""
+        where = self.of_kind(self.NUMBER, self.BOOLEAN)
+        return self.native(self.values[where].prod(), where)
+
+    def _pick_number(self, select):
+        where = numpy.flatnonzero(self.kinds == self.NUMBER)
+        if not len(where):
+            return None
+        return self.items[where[select(self.values[where])]]
+
+    def min_number(self):
+        """The first smallest `Number` item, or None if there is none."""
+        return self._pick_number(numpy.argmin)
+
+    def max_number(self):
+        """The first largest `Number` item, or None if there is none."""
+        return self._pick_number(numpy.argmax)
+
+    def sorted_numbers(self):
+        """All `Number` items, sorted by value (stable)."""
+        where = numpy.flatnonzero(self.kinds == self.NUMBER)
+        order = numpy.argsort(self.values[where], kind='stable')
+        return [self.items[idx] for idx in where[order]]
+
+    def native(self, value, where):
+        """Convert a NumPy number computed from the items selected by `where`.
+
+        Like for `Number` arithmetic, the result is an int if all those items
+        are ints.
+        """
+        if self.ints[where].all() and float(value).is_integer():
+            return int(value)
+        return float(value)
+
+
 @register
 class Array(list):
 
@@ -426,20 +565,22 @@ class Array(list):
 
     def __init__(self, data, *args, **kw):
         try:
-            d = _convert_nested_list(data)
-            # print(f"d = {d}")
             super().__init__(_convert_nested_list(data), *args, **kw)
-            # print(f"Array = {self}")
         except ValueError:
             raise xlerrors.ValueExcelError(f'Invalid array argument: {data}')
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_memo', None)
+        return state
+
     @property
     def _constructor(self):
         return Array
 
     @property
     def values(self):
-        return list(self)   
+        return list(self)
 
     @property
     def shape(self):
@@ -451,25 +592,39 @@ class Array(list):
             if len(array[i]) != num_columns:
                 raise xlerrors.ValueExcelError(
                     f'Nested lists must have the same length to determine the shape')
-        print("Get the shape of a rows: ", num_rows)
-        print("Get the shape of a columns: ", num_columns)
         return (num_rows, num_columns)       
 
     @property
     def flatten_concatenation(self):
-        flat_list = []
+        return self.flat
+
+    @property
+    def flat(self):
+        flat = []
         for row in self:
-            flat_list += row
-        return flat_list
+            if isinstance(row, list):
+                flat.extend(row)
+            else:
+                flat.append(row)
+        return flat
+
+    def memoize(self, key, build):
+        """Return `build(self)`, computed once per array and `key`.
+
+        Derived data (buffers, lookup indexes) is kept with the array, so
+        arrays must not be modified once they have been passed to functions.
+        """
+        memo = self.__dict__.setdefault('_memo', {})
+        if key not in memo:
+            memo[key] = build(self)
+        return memo[key]
 
     @property
-    def flat(self): 
-        # print(f"Flat array - pre: {list(self)}")
-        # print(f"Flat array - pre: {list(self.values)}")
-        # print(f"Flat array: {list(self.flatten_concatenation)}")
-        # print(f"Flat array: {list(self.values.flat)}")
-        return list(self.flatten_concatenation)
-        # return list(self.values.flat)
+    def buffer(self):
+        """The `ArrayBuffer` of the items, or None if NumPy is missing."""
+        if numpy is None:
+            return None
+        return self.memoize('buffer', lambda array: ArrayBuffer(array.flat))
 
     @classmethod
     def cast(cls, value):
@@ -479,19 +634,26 @@ class Array(list):
             value = [[value]]
         return Array(value)
 
+    def _map(self, func):
+        return Array([
+            [func(item) for item in row] if isinstance(row, list)
+            else func(row)
+            for row in self
+        ])
+
     def flatten(self, xltype=None, filt=None):
-        cast = _safe_cast(Number.cast, None) \
+        cast = _safe_cast(xltype.cast, None) \
             if xltype is not None else lambda x: x
-        return list(filter(filt, [cast(item) for item in self.values.flat]))
+        return list(filter(filt, [cast(item) for item in self.flat]))
 
     def cast_to_numbers(self):
-        return self.applymap(_safe_cast(Number.cast, Number(0.0)))
+        return self._map(_safe_cast(Number.cast, Number(0.0)))
 
     def cast_to_booleans(self):
-        return self.applymap(_safe_cast(Boolean.cast, Boolean(True)))
+        return self._map(_safe_cast(Boolean.cast, Boolean(True)))
 
     def cast_to_texts(self):
-        return self.applymap(_safe_cast(Text.cast, Text('')))
+        return self._map(_safe_cast(Text.cast, Text('')))
 
 
 class Expr:
@@ -94,8 +94,9 @@ def IFERROR(
     """
     # Use delayed evaluation to only evaluate the true or false value but not
     # both.
-    result = value_if_error() if isinstance(logical_test(), xlerrors.ExcelError) else logical_test()
-    print(f"IFERROR result: {result}")
+    result = logical_test()
+    if isinstance(result, xlerrors.ExcelError):
+        return value_if_error()
     return result
 
 
@@ -144,9 +145,7 @@ def IFS(*args: Tuple[Union[func_xltypes.XlExpr, func_xltypes.XlAnything]]) -> fu
             if result and result in [True, False]:
                 return args[i+1]()
             else: # result is not a True or False value
-                print("Error: IFS condition did not result in a boolean value.")
                 return xlerrors.ValueExcelError("Condition is not a boolean value.")
-    print("Error: No IFS conditions resulted in a True value.")
     return xlerrors.NaExcelError()
 
 
@@ -1,6 +1,98 @@
+import bisect
+
 from . import xl, xlerrors, func_xltypes
 
 
+def lookup_key(value):
+    """Hashable and sortable key of a value for lookups.
+
+    Keys follow Excel's ordering (`ExcelType.sort_precedence`): numbers and
+    dates compare by number and sort before texts, which compare
+    case-insensitively and sort before booleans. Blanks, errors and other
+    objects never match and have no key.
+    """
+    if isinstance(value, func_xltypes.Text):
+        return (value.sort_precedence, value.value.upper())
+    if isinstance(value, func_xltypes.Boolean):
+        return (value.sort_precedence, value.value)
+    if isinstance(value, (func_xltypes.Number, func_xltypes.DateTime)):
+        return (func_xltypes.Number.sort_precedence,
+                func_xltypes.Number.cast(value).value)
+    return None
+
+
+def exact_index(values):
+    """Map the lookup keys of `values` to the position of their first
+    occurrence."""
+    index = {}
+    for position, value in enumerate(values):
+        key = lookup_key(value)
+        if key is not None:
+            index.setdefault(key, position)
+    return index
+
+
+class SortedIndex:
+    """Lookup keys of `values` in order, for approximate-match lookups.
+
+    Whether the keys are sorted is determined once, when the index is built.
+    """
+
+    def __init__(self, values):
+        self.keys = []
+        self.positions = []
+        for position, value in enumerate(values):
+            key = lookup_key(value)
+            if key is not None:
+                self.keys.append(key)
+                self.positions.append(position)
+        pairs = list(zip(self.keys, self.keys[1:]))
+        self.ascending = all(key1 <= key2 for key1, key2 in pairs)
+        self.descending = all(key1 >= key2 for key1, key2 in pairs)
+        # Descending keys in ascending order, for bisecting.
+        self.reversed_keys = self.keys[::-1] if self.descending else None
+
+    def find_lower(self, value):
+        """Position of the largest value not greater than `value`.
+
+        Only values of the same type are considered. The keys must be in
+        ascending order; of equal values the last one is found.
+        """
+        key = lookup_key(value)
+        if key is None:
+            return None
+        idx = bisect.bisect_right(self.keys, key) - 1
+        if idx < 0 or self.keys[idx][0] != key[0]:
+            return None
+        return self.positions[idx]
+
+    def find_upper(self, value):
+        """Position of the smallest value not less than `value`.
+
+        Only values of the same type are considered. The keys must be in
+        descending order; of equal values the last one is found.
+        """
+        key = lookup_key(value)
+        if key is None:
+            return None
+        keys = self.reversed_keys
+        idx = bisect.bisect_left(keys, key)
+        if idx == len(keys) or keys[idx][0] != key[0]:
+            return None
+        return self.positions[len(keys) - 1 - idx]
+
+    def scan_lower(self, value):
+        """Like `find_lower()`, for keys that are not in order."""
+        key = lookup_key(value)
+        candidates = [
+            (candidate, idx) for idx, candidate in enumerate(self.keys)
+            if key is not None and candidate[0] == key[0] and candidate <= key
+        ]
+        if not candidates:
+            return None
+        return self.positions[max(candidates)[1]]
+
+
 @xl.register()
 @xl.validate_args
 def CHOOSE(
@@ -39,14 +131,6 @@ def VLOOKUP(
     https://support.office.com/en-us/article/
         vlookup-function-0bbc8083-26fe-4963-8ab8-93a18ad188a1
     """
-    print(f"lookup_value: {lookup_value}")
-    print(f"table_array: {len(table_array)}") # TODO: Toggle detail vs length logging
-    print(f"col_index_num: {col_index_num}")
-    print(f"range_lookup: {range_lookup}")
-    # if range_lookup:
-
-    #     raise NotImplementedError("Exact match only supported at the moment.")
-
     col_index_num = int(col_index_num)
 
     if col_index_num > len(table_array.values[0]):
@@ -54,66 +138,28 @@ def VLOOKUP(
             'col_index_num is greater than the number of cols in table_array')
 
     if range_lookup:
-        closest_match = None
-        input_val_is_num = False
-        if func_xltypes.Number.is_type(lookup_value):
-            input_val = float(lookup_value)
-            input_val_is_num = True        
-        for index, row in enumerate(table_array):
-            print(f"{index}. row[0]: {row[0]}")
-            if func_xltypes.Number.is_type(row[0]):
-                row_val = float(row[0])
-
-                # COMPARING NUMBERS
-                if input_val_is_num:
-                    print(f"Comparing as numbers: input_val: {input_val} vs row_val: {row_val}")
-                    if input_val == row_val:
-                        print(f"Returning exact match: {row[col_index_num - 1]}")
-                        return row[col_index_num - 1]
-                    if index == 0 and input_val < row_val:
-                        print(f"Lookup value smaller than all values in table_array.")   
-                        raise xlerrors.NaExcelError('No match found. Lookup value smaller than all values in table_array.')
-                    if row_val < input_val:
-                        print(f"Setting closest_match to current row.")
-                        closest_match = row
-                        continue
-                else:
-                    print("skipping row because we can't compare numbers and text")
-                    continue
-            else:
-                print("skipping row because we can't compare numbers and text")
-                continue
-
-            # COMPARING TEXT
-            if not input_val_is_num:
-                print(f"Comparing as test: input_val: {input_val} vs row_val: {row_val}")
-                if row[0] == lookup_value:
-                    print(f"Returning exact match: {row[col_index_num - 1]}")
-                    return row[col_index_num - 1]
-                if index == 0 and lookup_value < row[0]:
-                    print(f"Lookup value smaller than all values in table_array.")
-                    raise xlerrors.NaExcelError('No match found. Lookup value smaller than all values in table_array.')
-                if lookup_value > row[0]:
-                    print(f"Setting closest_match to current row.")
-                    closest_match = row
-
-        if closest_match:
-            print(f"Returning closest match: {closest_match[col_index_num - 1]}")
-            return closest_match[col_index_num - 1]
+        # The index of the first column is built once per table.
+        index = table_array.memoize(
+            'vlookup-sorted', lambda table: SortedIndex(
+                row[0] if row else None for row in table))
+        if index.ascending:
+            position = index.find_lower(lookup_value)
         else:
-            print(f"Could not find values to compare to in the table_array. Are you comparing numbers to text?")
-            raise xlerrors.NaExcelError('No match found. Could not find values to compare to in the table_array. Are you comparing numbers to text?')
+            position = index.scan_lower(lookup_value)
+        if position is None:
+            raise xlerrors.NaExcelError(
+                'No match found. Lookup value smaller than all values of '
+                'its type in table_array.')
+        return table_array[position][col_index_num - 1]
     else:
-        compare = lookup_value.__eq__
-        try:
-            result = max(row for row in table_array if row and row[0] and compare(row[0]))
-            result = result[col_index_num - 1]
-            print(f"Vlookup result for {lookup_value} in column {col_index_num} is: {result}")
-        except ValueError:
-            print(f"Vlookup result for {lookup_value} in column {col_index_num} is: None")
+        # The index of the first column is built once per table.
+        index = table_array.memoize('vlookup', lambda table: exact_index(
+            row[0] if row else None for row in table))
+        position = index.get(lookup_key(lookup_value))
+        if position is None:
             raise xlerrors.NaExcelError(
                 '`lookup_value` not in first column of `table_array`.')
-        return result
+        return table_array[position][col_index_num - 1]
 
     # table_array = table_array.set_index(0)
 
@@ -133,31 +179,35 @@ def MATCH(
 ) -> func_xltypes.XlAnything:
     # assert len(lookup_array.values[0]) == 1
 
-    lookup_array = lookup_array.flat
+    if match_type == 0:
+        index = lookup_array.memoize(
+            'match', lambda array: exact_index(array.flat))
+        position = index.get(lookup_key(lookup_value))
+        if position is None:
+            return xlerrors.NaExcelError("No match found.")
+        return position + 1
+
+    index = lookup_array.memoize(
+        'match-sorted', lambda array: SortedIndex(array.flat))
 
-    if match_type == 1:
-        if lookup_array != sorted(lookup_array):
-            return xlerrors.NaExcelError(
-                "Values must be sorted in ascending order"
-            )
     if match_type == -1:
-        if lookup_array != sorted(lookup_array, reverse=True):
+        if not index.descending:
             return xlerrors.NaExcelError(
                 "Values must be sorted in descending order"
             )
+        position = index.find_upper(lookup_value)
+        if position is None:
+            return xlerrors.NaExcelError("No greater value found.")
+        return position + 1
 
-    for i, val in enumerate(lookup_array):
-        if val == lookup_value:
-            return i + 1
-        if match_type == 1 and val > lookup_value:
-            return i or xlerrors.NaExcelError(
-                "No lesser value found."
-            )
-        if match_type == -1 and val < lookup_value:
-            return i or xlerrors.NaExcelError(
-                "No greater value found."
-            )
-    return xlerrors.NaExcelError("No match found.")
+    if not index.ascending:
+        return xlerrors.NaExcelError(
+            "Values must be sorted in ascending order"
+        )
+    position = index.find_lower(lookup_value)
+    if position is None:
+        return xlerrors.NaExcelError("No lesser value found.")
+    return position + 1
 
 
 @xl.register()
@@ -165,7 +215,6 @@ def MATCH(
 def INDIRECT(
         indirect_address_text: func_xltypes.XlText
 ) -> func_xltypes.XlExpr:
-    print(f"INDIRECT function called with: {indirect_address_text}")
     if "!" not in str(indirect_address_text):
         return xlerrors.NaExcelError("Invalid excel cell address provided.")
     val =  indirect_address_text()
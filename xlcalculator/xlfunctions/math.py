@@ -1,6 +1,6 @@
 import decimal
 import math
-from typing import Tuple, Union
+from typing import Tuple
 
 # import numpy as np
 # import pandas as pd
@@ -536,21 +536,21 @@ def SQRTPI(
 
 @xl.register()
 @xl.validate_args
-def SUM(
-        *numbers: Tuple[func_xltypes.XlNumber]
-) -> func_xltypes.XlNumber:
+def SUM(*numbers) -> func_xltypes.XlNumber:
     """The SUM function adds values.
 
     https://support.office.com/en-us/article/
         sum-function-043e1c7d-7726-4e80-8f32-07b23e057f89
     """
-    # print(f"SUM(Numbers):\n{numbers}")
-
-    # If no non numeric cells, return zero (is what excel does)
-    if len(numbers) == 0:
-        return 0
-
-    return sum(numbers)
+    buffers, numbers = xl.buffers(numbers)
+    cast = func_xltypes.Number.cast
+    total = 0
+    for number in numbers:
+        try:
+            total += cast(number)
+        except xlerrors.ExcelError:
+            pass
+    return total + sum(buffer.sum() for buffer in buffers)
 
 
 @xl.register()
@@ -568,22 +568,11 @@ def SUMIF(
     # WARNING:
     # - wildcards not supported
 
-    check = xlcriteria.parse_criteria(criteria)
-
     if sum_range is None:
         sum_range = range
 
-
-    range = range.flat
-    sum_range = sum_range.cast_to_numbers().flat
-
-    # zip() will automatically drop any range values that have indexes larger
-    # than sum_range's length.
-    return sum([
-        sval
-        for cval, sval in zip(range, sum_range)
-        if check(cval)
-    ])
+    return _sum_matches(
+        sum_range, xlcriteria.match_criteria(criteria, range))
 
 
 @xl.register()
@@ -592,9 +581,7 @@ def SUMIFS(
         sum_range: func_xltypes.XlArray,
         criteria_range: func_xltypes.XlArray,
         criteria: func_xltypes.XlAnything,
-        *criteriaAndRanges: Tuple[Union[
-            func_xltypes.XlAnything, func_xltypes.XlArray
-        ]]
+        *criteriaAndRanges
 ) -> func_xltypes.XlNumber:
     """Adds the cells specified by given criteria in multiple arrays.
     Requires equal length arrays, since the arrays get decomposed.
@@ -604,32 +591,27 @@ def SUMIFS(
     """
     # WARNING:
     # - wildcards not supported
-    ranges = [criteria_range.flat]
-    checks = [xlcriteria.parse_criteria(criteria)]
-    rangeLen = len(criteria_range.flat)
-    newRange = []
-    idx = 0
-    for item in criteriaAndRanges:
-        if idx == rangeLen:
-            checks.append(xlcriteria.parse_criteria(item))
-            ranges.append(newRange)
-            newRange = []
-            idx = 0
-        else:
-            newRange.append(item)
-            idx += 1
-    sum_range = sum_range.cast_to_numbers().flat
+    ranges = [criteria_range] + [
+        func_xltypes.Array.cast(item) for item in criteriaAndRanges[::2]]
+    criteria = [criteria] + list(criteriaAndRanges[1::2])
+    return _sum_matches(
+        sum_range, xlcriteria.match_all_criteria(ranges, criteria))
+
+
+def _sum_matches(sum_range, matches):
+    buffer = sum_range.buffer
+    if buffer is not None:
+        return buffer.sum(where=matches)
+
     # zip() will automatically drop any range values that have indexes larger
     # than sum_range's length.
     return sum([
         sval
-        for cvals, sval in zip(zip(*ranges), sum_range)
-        if all(checkfn(cvals[i]) for i, checkfn in enumerate(checks))
+        for match, sval in zip(matches, sum_range.cast_to_numbers().flat)
+        if match
     ])
 
 
-
-
 @xl.register()
 @xl.validate_args
 def PRODUCT(
@@ -642,23 +624,13 @@ def PRODUCT(
     """
     result = 1
     for array in arrays:
-        if isinstance(array, (list, tuple)):
-            for child in array:
-                if isinstance(child, (list, tuple)):
-                    for number in child:
-                        print(number)
-                        if isinstance(number.value, (int, float)):
-                            result *= number
-                else:
-                    print(number)
-                    if isinstance(number.value, (int, float)):
-                        result *= number
-        elif isinstance(array.value, (int, float)):
-            print(array)
-            result *= array
-            
-    # result = math.prod(flat_list)
-    print(F"PRODUCT() result: {result}")
+        buffer = array.buffer
+        if buffer is not None:
+            result *= buffer.product()
+            continue
+        for number in array.flat:
+            if isinstance(number.value, (int, float)):
+                result *= number
     return result
 
 
@@ -1,25 +1,28 @@
-from typing import Tuple, Union
-
 from . import xl, xlerrors, func_xltypes, xlcriteria
 
 
 @xl.register()
 @xl.validate_args
-def AVERAGE(
-        *numbers: Tuple[func_xltypes.Number]
-) -> func_xltypes.Number:
+def AVERAGE(*numbers) -> func_xltypes.Number:
     """Returns the average (arithmetic mean) of the arguments.
 
     https://support.office.com/en-us/article/
         average-function-047bac88-d466-426c-a32b-8f33eb960cf6
     """
-    numbers = xl.flatten(numbers)
+    buffers, numbers = xl.buffers(numbers)
+    numbers = [number for number in numbers if number is not None]
+    if not all(buffer.numbers[0].all() for buffer in buffers):
+        # Let the sum below fail on the items which are not numbers.
+        numbers = [
+            item for buffer in buffers for item in buffer.items] + numbers
+        buffers = []
+    count = len(numbers) + sum(buffer.size for buffer in buffers)
 
     # If no non numeric cells, return zero (is what excel does)
-    if len(numbers) < 1:
+    if count < 1:
         return 0
 
-    return sum(numbers) / len(numbers)
+    return (sum(numbers) + sum(buffer.sum() for buffer in buffers)) / count
 
 
 @xl.register()
@@ -76,9 +79,8 @@ def COUNTIF(
     https://support.microsoft.com/en-us/office/
         countif-function-e0de10c6-f885-4e71-abb4-1f464816df34
     """
-    check = xlcriteria.parse_criteria(criteria)
-    countRange = countRange.flat
-    return sum([check(val) for val in countRange])
+    return xlcriteria.count_matches(
+        xlcriteria.match_criteria(criteria, countRange))
 
 
 @xl.register()
@@ -86,50 +88,36 @@ def COUNTIF(
 def COUNTIFS(
     countRange1: func_xltypes.XlArray,
     criteria1: func_xltypes.XlAnything,
-    *rangesAndCriteria: Tuple[Union[
-        func_xltypes.XlArray, func_xltypes.XlAnything
-    ]]
+    *rangesAndCriteria
 ) -> func_xltypes.XlNumber:
     """Counts the number of cells that match multiple conditions.
 
     https://support.microsoft.com/en-us/office/
         countifs-function-dda3dc6e-f74e-4aee-88bc-aa8c2a866842
     """
-    ranges = [countRange1.flat]
-    checks = [xlcriteria.parse_criteria(criteria1)]
-    rangeLen = len(ranges[0])
-    newRange = []
-    idx = 0
-    for item in rangesAndCriteria:
-        if idx == rangeLen:
-            checks.append(xlcriteria.parse_criteria(item))
-            ranges.append(newRange)
-            newRange = []
-            idx = 0
-        else:
-            newRange.append(item)
-            idx += 1
-    return sum(
-        [
-            all([cfn(cvals[i]) for i, cfn in enumerate(checks)])
-            for cvals in zip(*ranges)
-        ]
-    )
-
+    ranges = [countRange1] + [
+        func_xltypes.Array.cast(item) for item in rangesAndCriteria[::2]]
+    criteria = [criteria1] + list(rangesAndCriteria[1::2])
+    return xlcriteria.count_matches(
+        xlcriteria.match_all_criteria(ranges, criteria))
 
 
 @xl.register()
 @xl.validate_args
-def MAX(*numbers: Tuple[func_xltypes.Number]):
+def MAX(*numbers):
     """Returns the largest value in a set of values.
 
     https://support.office.com/en-us/article/
         max-function-e0012414-9ac8-4b34-9a47-73e662c08098
     """
     # If no non numeric cells, return zero (is what excel does)
-    # numbers = xl.flatten(numbers)
+    buffers, numbers = xl.buffers(numbers)
 
     num_list = list(filter(func_xltypes.Number.is_type, numbers))
+    for buffer in buffers:
+        number = buffer.max_number()
+        if number is not None:
+            num_list.append(number)
 
     if len(num_list) < 1:
         return 0
@@ -143,15 +131,20 @@ def MAX(*numbers: Tuple[func_xltypes.Number]):
 
 @xl.register()
 @xl.validate_args
-def MIN(*numbers: Tuple[func_xltypes.Number]):
+def MIN(*numbers):
     """Returns the smallest number in a set of values.
 
     https://support.office.com/en-us/article/
         min-function-61635d12-920f-4ce2-a70f-96f202dcc152
     """
     # If no non numeric cells, return zero (is what excel does)
+    buffers, numbers = xl.buffers(numbers)
 
     num_list = list(filter(func_xltypes.Number.is_type, numbers))
+    for buffer in buffers:
+        number = buffer.min_number()
+        if number is not None:
+            num_list.append(number)
 
     if len(num_list) < 1:
         return 0
@@ -174,15 +167,18 @@ def SMALL(countRange: func_xltypes.XlArray,
     If k ≤ 0 or if k exceeds the number of data points, SMALL returns the #NUM! error value.    
 
     """
-    countRange_flat = countRange.flat
-    # print(f"l: {countRange_flat}")
-    numbers = [num for num in countRange_flat if func_xltypes.Number.is_type(num)]
-    if len(numbers) == 0:
+    buffer = countRange.buffer
+    if buffer is not None:
+        sorted_numbers = buffer.sorted_numbers()
+    else:
+        sorted_numbers = sorted(
+            [num for num in countRange.flat
+             if func_xltypes.Number.is_type(num)],
+            key=lambda num: float(num))
+    if len(sorted_numbers) == 0:
         return xlerrors.NumExcelError()
-    if k <= 0 or k > len(numbers):
+    if k <= 0 or k > len(sorted_numbers):
         return xlerrors.NumExcelError()
-    # print(f"numbers: {numbers}")
     else:
-        sorted_numbers = sorted(numbers, key=lambda num: float(num))
         return sorted_numbers[int(k) - 1]
     
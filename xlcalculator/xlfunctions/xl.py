@@ -1,6 +1,7 @@
 import functools
 import inspect
 import typing
+import weakref
 
 from . import func_xltypes, xlerrors
 
@@ -40,11 +41,142 @@ def register(name=None):
 
     def registerFunction(func):
         FUNCTIONS.register(func, name)
+        # Build the argument conversion plan right away.
+        get_signature(func)
         return func
 
     return registerFunction
 
 
+class Signature:
+    """Argument conversion plan of an Excel function.
+
+    Inspecting a function signature and its typing annotations is expensive,
+    so it is done once per function. The resulting plan is shared by
+    `validate_args()` and the AST nodes calling the function.
+    """
+
+    def __init__(self, func):
+        self.signature = sig = inspect.signature(func)
+        self.positional = []
+        self.var_positional = None
+        for param in sig.parameters.values():
+            if param.kind in (param.POSITIONAL_ONLY,
+                              param.POSITIONAL_OR_KEYWORD):
+                self.positional.append(_converter(param.annotation))
+            elif param.kind == param.VAR_POSITIONAL:
+                self.var_positional = _converter(param.annotation)
+        self.required = len([
+            param for param in sig.parameters.values()
+            if param.kind in (param.POSITIONAL_ONLY,
+                              param.POSITIONAL_OR_KEYWORD)
+            and param.default is param.empty
+        ])
+        self.required_keywords = any(
+            param.kind == param.KEYWORD_ONLY and param.default is param.empty
+            for param in sig.parameters.values())
+        self.returns = _converter(sig.return_annotation)
+        self._lazy = {}
+
+    def accepts(self, num_args):
+        """Whether `num_args` positional arguments can be bound."""
+        return (
+            not self.required_keywords
+            and num_args >= self.required
+            and (num_args <= len(self.positional)
+                 or self.var_positional is not None)
+        )
+
+    def lazy_arguments(self, num_args):
+        """Flags for each of `num_args` arguments telling whether it has to
+        be passed as an unevaluated `Expr`.
+
+        Raises a `TypeError` if the arguments cannot be bound.
+        """
+        if num_args in self._lazy:
+            return self._lazy[num_args]
+
+        bound = self.signature.bind(*range(num_args))
+        lazy = []
+        for pname, pvalue in bound.arguments.items():
+            param = self.signature.parameters[pname]
+            ptype = param.annotation
+            if param.kind == param.VAR_POSITIONAL:
+                lazy.extend(
+                    [func_xltypes.XlExpr in getattr(ptype, '__args__', [])]
+                    * len(pvalue))
+            else:
+                lazy.append(ptype == func_xltypes.XlExpr)
+        self._lazy[num_args] = lazy = tuple(lazy)
+        return lazy
+
+
+_SIGNATURES = weakref.WeakKeyDictionary()
+
+
+def get_signature(func):
+    """Returns the (cached) `Signature` of a function."""
+    # Decorated functions share the plan of the function they wrap.
+    func = inspect.unwrap(func)
+    try:
+        return _SIGNATURES[func]
+    except KeyError:
+        sig = _SIGNATURES[func] = Signature(func)
+        return sig
+    except TypeError:
+        # Not weak-referenceable, for example a builtin.
+        return Signature(func)
+
+
+def _identity(val):
+    return val
+
+
+def _converter(vtype):
+    """Resolve the typing metadata of `vtype` into a conversion function.
+
+    The returned function behaves exactly like `_validate(vtype, ...)`.
+    """
+    cast = TYPE_TO_CAST.get(vtype, None)
+    if cast is not None:
+        return cast
+
+    # Support lists with value types
+    if getattr(vtype, '__origin__', None) in [list, tuple]:
+        itype = vtype.__args__[0]
+        convert_item = _converter(itype)
+        flat = itype != func_xltypes.XlArray
+
+        def convert_list(val):
+            if flat:
+                val = flatten(val)
+            items = []
+            for item in val:
+                try:
+                    items.append(convert_item(item))
+                except xlerrors.ExcelError:
+                    pass
+            return tuple(item for item in items if item is not None)
+
+        return convert_list
+
+    # Support unions
+    if getattr(vtype, '__origin__', None) == typing.Union:
+        converters = [_converter(stype) for stype in vtype.__args__]
+
+        def convert_union(val):
+            for convert in converters:
+                try:
+                    return convert(val)
+                except xlerrors.ExcelError:
+                    pass
+            raise xlerrors.ValueExcelError(val)
+
+        return convert_union
+
+    return _identity
+
+
 def _validate(vtype, val, name):
     cast = TYPE_TO_CAST.get(vtype, None)
     if cast is not None:
@@ -82,34 +214,64 @@ def _safe_validate(vtype, val, name):
 
 
 def validate_args(func):
+    plan = get_signature(func)
+    sig = plan.signature
+    num_positional = len(plan.positional)
+
     @functools.wraps(func)
     def validate(*args, **kw):
-        sig = inspect.signature(func)
-        bound = sig.bind(*args, **kw)
+        if kw or not plan.accepts(len(args)):
+            return _validate_bound(func, sig, sig.bind(*args, **kw))
 
         # 1. Convert all input parameters to Excel Types.
-        for pname, value in list(bound.arguments.items()):
-            # print(f"PName: {pname}, Value: {value}")
+        converted = []
+        for convert, value in zip(plan.positional, args):
             if isinstance(value, xlerrors.ExcelError):
                 return value
             try:
-                bound.arguments[pname] = _validate(
-                    sig.parameters[pname].annotation, value, pname)
+                converted.append(convert(value))
+            except xlerrors.ExcelError as err:
+                return err
+        if len(args) > num_positional:
+            try:
+                converted.extend(
+                    plan.var_positional(args[num_positional:]))
             except xlerrors.ExcelError as err:
                 return err
         # 2. Run the function to compute the result.
         try:
-            res = func(*bound.args, **bound.kwargs)
+            res = func(*converted)
         except xlerrors.ExcelError as err:
             # Never crash on Excel errors as we want to store them as the cell
             # value.
             return err
         # 3. Convert the result to an Excel type.
-        return _validate(sig.return_annotation, res, 'return')
+        return plan.returns(res)
 
     return validate
 
 
+def _validate_bound(func, sig, bound):
+    # 1. Convert all input parameters to Excel Types.
+    for pname, value in list(bound.arguments.items()):
+        if isinstance(value, xlerrors.ExcelError):
+            return value
+        try:
+            bound.arguments[pname] = _validate(
+                sig.parameters[pname].annotation, value, pname)
+        except xlerrors.ExcelError as err:
+            return err
+    # 2. Run the function to compute the result.
+    try:
+        res = func(*bound.args, **bound.kwargs)
+    except xlerrors.ExcelError as err:
+        # Never crash on Excel errors as we want to store them as the cell
+        # value.
+        return err
+    # 3. Convert the result to an Excel type.
+    return _validate(sig.return_annotation, res, 'return')
+
+
 def flatten(values):
     """Fully recursive flattening."""
     # print(f"Flatten PRE: {values}")
@@ -127,5 +289,25 @@ def flatten(values):
     return flat
 
 
+def buffers(values):
+    """Split `values` into the buffers of its arrays and all other values.
+
+    The other values are flattened. Without NumPy arrays have no buffer, so
+    they are flattened as well.
+    """
+    buffers = []
+    flat = []
+    for value in values:
+        buffer = value.buffer \
+            if isinstance(value, func_xltypes.Array) else None
+        if buffer is not None:
+            buffers.append(buffer)
+        elif isinstance(value, (list, tuple)):
+            flat.extend(flatten(value))
+        else:
+            flat.append(value)
+    return buffers, flat
+
+
 def length(values):
     return len(flatten(values))
@@ -1,6 +1,7 @@
 import re
 
 from . import operator, xlerrors, func_xltypes
+from .func_xltypes import numpy
 
 CRITERIA_REGEX = r'(\W*)(.*)'
 
@@ -13,8 +14,18 @@ CRITERIA_OPERATORS = {
     '>': operator.OP_GT,
 }
 
+# Equivalents of the criteria operators working on whole NumPy columns.
+COLUMN_OPERATORS = {
+    operator.OP_LT: lambda column, value: column < value,
+    operator.OP_LE: lambda column, value: column <= value,
+    operator.OP_EQ: lambda column, value: column == value,
+    operator.OP_NE: lambda column, value: column != value,
+    operator.OP_GE: lambda column, value: column >= value,
+    operator.OP_GT: lambda column, value: column > value,
+}
 
-def parse_criteria(criteria):
+
+def _parse_criteria(criteria):
 
     if isinstance(criteria, (str, func_xltypes.Text)):
         search = re.search(CRITERIA_REGEX, str(criteria)).group
@@ -38,10 +49,7 @@ def parse_criteria(criteria):
             else:
                 break
 
-        def check(probe):
-            return operator(probe, value)
-
-        return check
+        return operator, value
 
     criteria = func_xltypes.ExcelType.cast_from_native(criteria)
 
@@ -49,7 +57,74 @@ def parse_criteria(criteria):
     if isinstance(criteria, func_xltypes.Array):
         raise xlerrors.ValueExcelError('Array criteria not supported.')
 
-    def check(x):
-        return x == criteria
+    return CRITERIA_OPERATORS['='], criteria
+
+
+def parse_criteria(criteria):
+    operator, value = _parse_criteria(criteria)
+
+    def check(probe):
+        return operator(probe, value)
 
     return check
+
+
+def _matches(result):
+    return not isinstance(result, xlerrors.ExcelError) and bool(result)
+
+
+def match_criteria(criteria, array):
+    """Check `criteria` against all items of `array`.
+
+    Returns a boolean NumPy mask if the array has a buffer. Numbers checked
+    against a number and texts checked for (in)equality with a text are
+    compared column-wise, all other items one by one.
+    """
+    op, value = _parse_criteria(criteria)
+    buffer = array.buffer
+    if buffer is None:
+        return [_matches(op(item, value)) for item in array.flat]
+
+    matches = numpy.zeros(buffer.size, dtype=bool)
+    fast = numpy.zeros(buffer.size, dtype=bool)
+    if isinstance(value, func_xltypes.Number):
+        fast = buffer.kinds == buffer.NUMBER
+        matches[fast] = COLUMN_OPERATORS[op](buffer.values[fast], value.value)
+    elif isinstance(value, (str, func_xltypes.Text)) \
+            and op in (operator.OP_EQ, operator.OP_NE):
+        fast = buffer.kinds == buffer.TEXT
+        matches[fast] = COLUMN_OPERATORS[op](
+            buffer.texts[fast], str(value).upper())
+
+    for idx in numpy.flatnonzero(~fast):
+        matches[idx] = _matches(op(buffer.items[idx], value))
+    return matches
+
+
+def match_all_criteria(ranges, criteria):
+    """Check each of the `criteria` against the items of its range.
+
+    An item matches if the items at its position match in all ranges. If the
+    ranges differ in size, nothing matches.
+    """
+    matches = None
+    for array, array_criteria in zip(ranges, criteria):
+        array_matches = match_criteria(array_criteria, array)
+        if matches is None:
+            matches = array_matches
+        elif len(matches) != len(array_matches):
+            return []
+        elif isinstance(matches, list):
+            matches = [
+                match and array_match
+                for match, array_match in zip(matches, array_matches)]
+        else:
+            matches = matches & array_matches
+    return matches
+
+
+def count_matches(matches):
+    """Number of matches found by `match_criteria()`."""
+    if isinstance(matches, list):
+        return matches.count(True)
+    return int(numpy.count_nonzero(matches))
@@ -21,27 +21,51 @@ class XLFormula(XLType):
     sheet_name: str = field(default=None, repr=True)
     reference: str = field(default=None, repr=True)
     evaluate: bool = field(default=True, repr=True)
+    # Tokens of the formula, if they are already known.
     tokens: List[tokenizer.f_token] = field(
-        init=False, default_factory=list, repr=True)
+        default_factory=list, repr=True)
     terms: List[str] = field(init=False, default_factory=list, repr=True)
     associated_cells: set = field(init=False, default_factory=set, repr=True)
     ast: ast_nodes.ASTNode = field(init=False, default=None)
+    # Optional closure compiled from the AST by `Model.build_code()`.
+    code: object = field(init=False, default=None, compare=False, repr=False)
 
     def __post_init__(self):
         """Supplimentary initialisation."""
-        self.tokens = tokenizer.ExcelParser().getTokens(self.formula).items
+        if not self.tokens:
+            self.tokens = tokenizer.ExcelParser().getTokens(
+                self.formula).items
         for token in self.tokens:
             if (
                     (token.ttype == ExcelParserTokens.TOK_TYPE_OPERAND)
                     and (token.tsubtype == ExcelParserTokens.TOK_SUBTYPE_RANGE)
-                    and (token.tvalue not in self.terms)
             ):
+                # The ":" of `INDEX(...):A1` is part of the range token.
+                term = token.tvalue.strip(':')
+            elif (
+                    (token.ttype == ExcelParserTokens.TOK_TYPE_FUNCTION)
+                    and (':' in token.tvalue)
+            ):
+                # `A1:INDEX(...)` is tokenized as function `A1:INDEX`.
+                term = token.tvalue[:token.tvalue.rfind(':')]
+            else:
+                continue
+            if term and term not in self.terms:
                 # Make sure we have a full address.
-                term = token.tvalue
                 if '!' not in term:
                     term = f'{self.sheet_name}!{term}'
                 self.terms.append(term)
 
+    def __getstate__(self):
+        # Compiled code cannot be serialized; it is rebuilt from the AST.
+        state = self.__dict__.copy()
+        state['code'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('code', None)
+
 
 @dataclass
 class XLCell(XLType):